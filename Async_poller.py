@@ -0,0 +1,169 @@
+import asyncio
+import random
+import threading
+import time
+
+import aiohttp
+
+from Feed_cache import NOT_MODIFIED
+from Thingspeak_api import feed_url, feed_params
+
+# HTTP statuses worth retrying; anything else in 4xx is a permanent failure
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class AsyncPoller:
+    """
+    Polls every machine's ThingSpeak channel from one asyncio event loop.
+
+    The loop runs on its own thread and keeps a single pooled aiohttp session
+    open between sweeps, so connections (and TLS sessions) are reused. At most
+    `concurrency` requests are in flight at once, across overlapping sweeps
+    too; each attempt is bounded by `timeout` seconds and failed attempts
+    are retried up to `retries` times with jittered exponential backoff.
+
+    When a FeedCursorStore is given, each request only asks for entries
+    newer than the channel's cursor. With a FeedCache, requests are
+    conditional and unchanged channels come back as NOT_MODIFIED.
+    """
+
+    def __init__(self, concurrency=200, timeout=8, retries=2, backoff=0.5, base_url=None, cursor_store=None,
+                 feed_cache=None):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.base_url = base_url
+        self.cursor_store = cursor_store
+        self.feed_cache = feed_cache
+
+        self.loop = None
+        self.thread = None
+        self.session = None
+        # Shared by every sweep; created on the loop that uses it
+        self.semaphore = None
+        self.last_sweep_seconds = 0.0
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.loop = asyncio.new_event_loop()
+        self.semaphore = None
+        self.thread = threading.Thread(target=self._run_loop, name="AsyncPoller", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=5):
+        if not self.thread:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._close_session(), self.loop)
+        try:
+            future.result(timeout)
+        except Exception as e:
+            print(f"[WARN] Failed to close poller session: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+        self.thread = None
+
+    def poll(self, machines, on_result):
+        """
+        Start a sweep over `machines` (name -> info dict) without blocking.
+
+        `on_result(name, feeds, error)` is called from the poller thread once
+        per machine. Returns a concurrent.futures.Future for the whole sweep.
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self._sweep(dict(machines), on_result), self.loop)
+
+    # ------------------------------------------------------------------
+    #           Event loop side
+    # ------------------------------------------------------------------
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+        self.loop.close()
+
+    async def _get_session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self.session
+
+    async def _get_semaphore(self):
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+        return self.semaphore
+
+    async def _close_session(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def _sweep(self, machines, on_result):
+        started = time.perf_counter()
+        session = await self._get_session()
+        semaphore = await self._get_semaphore()
+
+        async def poll_one(name, info):
+            async with semaphore:
+                feeds, error = await self._fetch(session, info)
+            try:
+                on_result(name, feeds, error)
+            except Exception as e:
+                print(f"[ERROR] Result handler failed for {name}: {e}")
+
+        await asyncio.gather(*(poll_one(name, info) for name, info in machines.items()))
+        self.last_sweep_seconds = time.perf_counter() - started
+        # The scheduler hands over small batches every second; only log big ones
+        if len(machines) >= 100:
+            print(f"[POLL] Swept {len(machines)} machine(s) in {self.last_sweep_seconds:.2f}s")
+
+    async def _fetch(self, session, info):
+        """
+        Return (feeds, None) on success, (NOT_MODIFIED, None) for an unchanged
+        channel, or (None, error) after the last retry.
+        """
+        url = feed_url(info["channel_id"], self.base_url)
+        cursor_params = None
+        if self.cursor_store is not None:
+            cursor_params = self.cursor_store.request_params(info["channel_id"])
+        params = feed_params(info, cursor_params)
+        cache = self.feed_cache
+        if cache is not None and cache.cached(info["channel_id"], params):
+            return NOT_MODIFIED, None
+        error = None
+
+        for attempt in range(self.retries + 1):
+            headers = cache.request_headers(info["channel_id"], params) if cache is not None else None
+            try:
+                async with session.get(url, params=params, headers=headers) as response:
+                    if response.status in RETRY_STATUSES:
+                        raise aiohttp.ClientResponseError(
+                            response.request_info, response.history,
+                            status=response.status, message=response.reason,
+                        )
+                    if response.status != 304:
+                        response.raise_for_status()
+                    if cache is not None:
+                        body = await response.read()
+                        return cache.read_response(
+                            info["channel_id"], params, response.status, response.headers, body
+                        ), None
+                    payload = await response.json(content_type=None)
+                return (payload or {}).get("feeds", []), None
+            except aiohttp.ClientResponseError as e:
+                error = e
+                if e.status not in RETRY_STATUSES:
+                    break
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                error = e
+
+            if attempt < self.retries:
+                # Full jitter keeps retries from a degraded upstream from lining up
+                delay = self.backoff * (2 ** attempt)
+                await asyncio.sleep(random.uniform(0, delay))
+
+        return None, error
@@ -0,0 +1,122 @@
+"""
+Vectorized decoding of raw controller words for whole sweeps.
+
+Only the fields the dashboard needs for every value (fault code and genset
+signal) are pulled out here, with NumPy shifts and masks over a uint64
+array. The full per-field dict from data_decoder is built on demand, when a
+detail window shows it.
+
+The bit positions are not hard-coded: learn_layout() decodes single-bit
+words through data_decoder once to find them, then checks the result on
+random words against the scalar decoder. If data_decoder's fields are not
+plain bitfields, decode_batch() falls back to decoding value by value.
+"""
+import random
+import threading
+
+import numpy as np
+
+from Fault_decode import decode_raw_value, parse_fault_code, fault_code_of, genset_on_of
+
+_layout = None
+_layout_learned = False
+_layout_lock = threading.Lock()
+
+
+class BitLayout:
+    """Where the fault code and genset bits sit in a raw controller word."""
+
+    def __init__(self, fault_shift, fault_width, genset_bit):
+        self.fault_shift = fault_shift
+        self.fault_mask = (1 << fault_width) - 1
+        self.genset_bit = genset_bit
+        self.fault_dtype = np.uint8 if fault_width <= 8 else np.uint32
+
+    def extract(self, values):
+        fault_code = ((values >> np.uint64(self.fault_shift)) & np.uint64(self.fault_mask)).astype(self.fault_dtype)
+        genset_on = ((values >> np.uint64(self.genset_bit)) & np.uint64(1)).astype(bool)
+        return fault_code, genset_on
+
+
+def _fault_code_field(decoded):
+    return parse_fault_code(decoded.get("Fault Code", 0))
+
+
+def _genset_field(decoded):
+    return str(decoded.get("Genset Signal", "")).upper() == "ON"
+
+
+def learn_layout(samples=256):
+    """Probe data_decoder for the fault code / genset bit positions. Returns None if they are not plain bitfields."""
+    try:
+        base = decode_raw_value(0)
+        if _fault_code_field(base) != 0 or _genset_field(base):
+            return None
+
+        fault_bits, genset_bits = [], []
+        for bit in range(64):
+            decoded = decode_raw_value(1 << bit)
+            if _fault_code_field(decoded) != 0:
+                fault_bits.append(bit)
+            if _genset_field(decoded):
+                genset_bits.append(bit)
+    except Exception as e:
+        print(f"[WARN] Could not probe decoder layout: {e}")
+        return None
+
+    if len(genset_bits) != 1 or not fault_bits:
+        return None
+    if fault_bits != list(range(fault_bits[0], fault_bits[-1] + 1)):
+        return None
+    layout = BitLayout(fault_bits[0], len(fault_bits), genset_bits[0])
+
+    rng = random.Random(0)
+    words = [0, (1 << 64) - 1] + [rng.getrandbits(64) for _ in range(samples)]
+    fault_code, genset_on = layout.extract(np.array(words, dtype=np.uint64))
+    for word, code, genset in zip(words, fault_code.tolist(), genset_on.tolist()):
+        if code != fault_code_of(word) or genset != genset_on_of(word):
+            return None
+    return layout
+
+
+def get_layout():
+    global _layout, _layout_learned
+    with _layout_lock:
+        if not _layout_learned:
+            _layout = learn_layout()
+            _layout_learned = True
+            if _layout is None:
+                print("[WARN] Decoder fields are not plain bitfields, bulk decode falls back to per-value decoding")
+        return _layout
+
+
+_WORD_MASK = 0xFFFFFFFFFFFFFFFF
+_mask_word = np.frompyfunc(lambda value: int(value) & _WORD_MASK, 1, 1)
+
+
+def to_uint64_array(values):
+    """
+    Raw controller values (Python ints, nested lists) as a uint64 array.
+    Values outside 0..2**64-1 (feeds are not trusted) keep their low 64 bits.
+    """
+    try:
+        return np.asarray(values, dtype=np.uint64)
+    except OverflowError:
+        return _mask_word(np.asarray(values, dtype=object)).astype(np.uint64)
+
+
+def decode_batch(values):
+    """
+    Decode an array of raw controller values of any shape, e.g. a sweep's
+    machines x M1-M8 matrix. Returns columnar results with the same shape:
+    {"fault_code": unsigned int array, "genset_on": bool array}.
+    """
+    words = to_uint64_array(values)
+    layout = get_layout()
+    if layout is not None:
+        fault_code, genset_on = layout.extract(words)
+    else:
+        flat = [int(v) for v in words.ravel()]
+        fault_code = np.array([fault_code_of(v) for v in flat], dtype=np.uint32).reshape(words.shape)
+        genset_on = np.array([genset_on_of(v) for v in flat], dtype=bool).reshape(words.shape)
+    return {"fault_code": fault_code, "genset_on": genset_on}
@@ -0,0 +1,243 @@
+"""
+Bulk fleet import/export in Excel, CSV and Parquet, and Parquet export of
+fault_logs ranges for analysis.
+
+All fleet formats share the Excel sheet's columns (MACHINE_SHEET_COLUMNS)
+and go through Db_handler.import_machine_rows(). CSV is streamed with the
+csv module. Parquet needs pyarrow, which is only imported when a Parquet
+path is used.
+
+Fault log exports push the time/machine/controller filters down into the
+SQLite query, stream the rows in chunks, and write them sorted by time with
+zstd compression. read_fault_logs() passes the same filters to pyarrow, so
+row groups outside the range are skipped by their statistics.
+
+Usage:
+    python Bulk_io.py export-fleet fleet.parquet
+    python Bulk_io.py import-fleet fleet.csv
+    python Bulk_io.py export-logs logs.parquet --start 2026-09-01 --end 2026-10-01 --machine "RECD 12"
+"""
+import argparse
+import csv
+import os
+from datetime import datetime
+
+import numpy as np
+
+from Db_handler import (
+    MACHINE_SHEET_COLUMNS,
+    import_machine_rows,
+    import_machines_from_excel,
+    iter_fault_log_chunks,
+    iter_machine_sheet_rows,
+)
+from Machine_registry import machine_registry
+
+# Rows per fault log chunk read from SQLite and per Parquet row group
+EXPORT_CHUNK_ROWS = 100_000
+
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm")
+CSV_EXTENSIONS = (".csv",)
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet support needs pyarrow (pip install pyarrow)")
+    return pyarrow, pyarrow.parquet
+
+
+def _extension(path):
+    return os.path.splitext(path)[1].lower()
+
+
+# ----------------------------------------------------------------------
+#           Fleet import
+# ----------------------------------------------------------------------
+
+def import_machines_from_csv(path, progress=None):
+    """Stream a fleet CSV (header row first) into import_machine_rows()."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return import_machine_rows(csv.reader(f), progress)
+
+
+def _iter_parquet_rows(parquet_file, batch_rows=10_000):
+    yield parquet_file.schema_arrow.names
+    for batch in parquet_file.iter_batches(batch_size=batch_rows):
+        yield from zip(*(column.to_pylist() for column in batch.columns))
+
+
+def import_machines_from_parquet(path, progress=None):
+    _, pq = _require_pyarrow()
+    parquet_file = pq.ParquetFile(path)
+    return import_machine_rows(_iter_parquet_rows(parquet_file), progress, parquet_file.metadata.num_rows)
+
+
+def import_machines(path, progress=None):
+    """Import a fleet file, picking the reader from its extension."""
+    ext = _extension(path)
+    if ext in EXCEL_EXTENSIONS:
+        return import_machines_from_excel(path, progress)
+    if ext in CSV_EXTENSIONS:
+        return import_machines_from_csv(path, progress)
+    if ext in PARQUET_EXTENSIONS:
+        return import_machines_from_parquet(path, progress)
+    raise ValueError(f"Unsupported fleet file type: {ext or path}")
+
+
+# ----------------------------------------------------------------------
+#           Fleet export
+# ----------------------------------------------------------------------
+
+def export_machines(path):
+    """Write the fleet in the format given by the extension. Returns the number of rows."""
+    ext = _extension(path)
+    rows = iter_machine_sheet_rows()
+    count = 0
+
+    if ext in CSV_EXTENSIONS:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(MACHINE_SHEET_COLUMNS)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+
+    elif ext in PARQUET_EXTENSIONS:
+        pa, pq = _require_pyarrow()
+        columns = list(zip(*rows)) or [()] * len(MACHINE_SHEET_COLUMNS)
+        count = len(columns[0])
+        # Fields column stays text so blank controllers survive the round trip
+        table = pa.table({
+            name: pa.array([str(v) for v in values], type=pa.string())
+            for name, values in zip(MACHINE_SHEET_COLUMNS, columns)
+        })
+        pq.write_table(table, path, compression="zstd")
+
+    elif ext in EXCEL_EXTENSIONS:
+        import openpyxl
+        wb = openpyxl.Workbook(write_only=True)
+        sheet = wb.create_sheet()
+        sheet.append(MACHINE_SHEET_COLUMNS)
+        for row in rows:
+            sheet.append(row)
+            count += 1
+        wb.save(path)
+
+    else:
+        raise ValueError(f"Unsupported fleet file type: {ext or path}")
+    return count
+
+
+# ----------------------------------------------------------------------
+#           Fault log export
+# ----------------------------------------------------------------------
+
+def _fault_log_schema(pa):
+    return pa.schema([
+        ("ts", pa.timestamp("s", tz="UTC")),
+        ("machine_id", pa.int32()),
+        ("machine_name", pa.dictionary(pa.int32(), pa.string())),
+        ("controller", pa.int8()),
+        ("raw_value", pa.uint64()),
+        ("fault_code", pa.uint16()),
+    ])
+
+
+def export_fault_logs(path, start_ts, end_ts, machine_ids=None, controllers=None,
+                      chunk_rows=EXPORT_CHUNK_ROWS, progress=None):
+    """
+    Write fault_logs rows with start_ts <= ts < end_ts (optionally only some
+    machines/controllers) to a Parquet file. Returns the number of rows.
+    """
+    pa, pq = _require_pyarrow()
+    schema = _fault_log_schema(pa)
+    names_by_id = {machine_id: info["name"] for machine_id, info in machine_registry.by_id().items()}
+
+    count = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for rows in iter_fault_log_chunks(start_ts, end_ts, machine_ids, controllers, chunk_rows):
+            ts, machine_id, controller, raw_value, fault_code = (np.array(col) for col in zip(*rows))
+            ids, index = np.unique(machine_id, return_inverse=True)
+            machine_name = pa.DictionaryArray.from_arrays(
+                pa.array(index.astype(np.int32)), pa.array([names_by_id.get(int(m), "") for m in ids])
+            )
+            batch = pa.RecordBatch.from_arrays([
+                pa.array(ts.astype("datetime64[s]")).cast(schema.field("ts").type),
+                pa.array(machine_id.astype(np.int32)),
+                machine_name,
+                pa.array(controller.astype(np.int8)),
+                # Stored signed in SQLite; the same 64 bits read as unsigned
+                pa.array(raw_value.astype(np.int64).view(np.uint64)),
+                pa.array(fault_code.astype(np.uint16)),
+            ], schema=schema)
+            writer.write_batch(batch, row_group_size=chunk_rows)
+            count += len(rows)
+            if progress:
+                progress(count)
+    return count
+
+
+def read_fault_logs(path, start_ts=None, end_ts=None, machine_ids=None, columns=None):
+    """Read an exported fault log file back as a pyarrow Table, filtering by row group statistics."""
+    pa, pq = _require_pyarrow()
+    filters = []
+    if start_ts is not None:
+        filters.append(("ts", ">=", pa.scalar(start_ts, type=pa.timestamp("s", tz="UTC"))))
+    if end_ts is not None:
+        filters.append(("ts", "<", pa.scalar(end_ts, type=pa.timestamp("s", tz="UTC"))))
+    if machine_ids is not None:
+        filters.append(("machine_id", "in", list(machine_ids)))
+    return pq.read_table(path, columns=columns, filters=filters or None)
+
+
+# ----------------------------------------------------------------------
+#           Command line
+# ----------------------------------------------------------------------
+
+def _parse_date(text):
+    return int(datetime.strptime(text, "%Y-%m-%d").timestamp())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk fleet and fault log import/export")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("import-fleet", help="Import machines from .xlsx, .csv or .parquet")
+    p.add_argument("path")
+    p = sub.add_parser("export-fleet", help="Export machines to .xlsx, .csv or .parquet")
+    p.add_argument("path")
+    p = sub.add_parser("export-logs", help="Export fault_logs to Parquet")
+    p.add_argument("path")
+    p.add_argument("--start", required=True, help="First day (YYYY-MM-DD, local time)")
+    p.add_argument("--end", required=True, help="Day after the last one (YYYY-MM-DD, local time)")
+    p.add_argument("--machine", action="append", help="Machine name; repeat for several")
+    p.add_argument("--controller", type=int, action="append", help="Controller 1-8; repeat for several")
+    args = parser.parse_args()
+
+    if args.command == "import-fleet":
+        result = import_machines(args.path)
+        for error in result["errors"]:
+            print(f"[WARN] Row {error['row']} ({error['machine']}): {error['error']}")
+        print(f"[IMPORT] {result['imported']} controller row(s) for {result['machines']} machine(s), "
+              f"{len(result['errors'])} row(s) skipped.")
+    elif args.command == "export-fleet":
+        print(f"[EXPORT] {export_machines(args.path)} row(s) written to {args.path}")
+    else:
+        machine_ids = None
+        if args.machine:
+            machines = machine_registry.get_machines()
+            unknown = [name for name in args.machine if name not in machines]
+            if unknown:
+                parser.error(f"Unknown machine(s): {', '.join(unknown)}")
+            machine_ids = [machines[name]["id"] for name in args.machine]
+        count = export_fault_logs(args.path, _parse_date(args.start), _parse_date(args.end),
+                                  machine_ids, args.controller)
+        print(f"[EXPORT] {count} fault log row(s) written to {args.path} ({os.path.getsize(args.path)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
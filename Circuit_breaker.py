@@ -0,0 +1,220 @@
+"""
+Per-channel circuit breakers and a fleet-wide error-rate guard for polling.
+
+Every ThingSpeak channel has a breaker:
+
+    closed     - polled normally; failure_threshold failed polls in a row trip it
+    open       - not polled until open_until. Each trip doubles the wait, from
+                 base_open up to max_open
+    half_open  - open_until has passed and one probe poll is let through. A
+                 successful probe closes the breaker, a failed one opens it
+                 again for longer
+
+The guard tracks the share of failed polls over the last `window` seconds.
+When it reaches degraded_rate (over at least min_samples polls) the upstream
+counts as degraded and throttle() returns degraded_scale, so the whole poller
+slows down instead of piling more requests on a struggling API. It returns
+1.0 again once the rate drops under recovered_rate.
+
+Breaker rows are saved to channel_breakers through the log writer and loaded
+on start, so a restart does not hammer channels that were already open.
+"""
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from Db_connection import get_connection
+from Db_handler import DB_NAME
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ChannelBreaker:
+    def __init__(self, channel_id, state=CLOSED, failures=0, trips=0, open_until=0.0, last_error=None):
+        self.channel_id = channel_id
+        self.state = state
+        self.failures = failures
+        self.trips = trips
+        self.open_until = open_until
+        self.last_error = last_error
+        self.probe_started = None
+
+    def row(self, now):
+        return (self.channel_id, self.state, self.failures, self.trips, self.open_until, self.last_error, int(now))
+
+
+class BreakerBoard:
+    def __init__(self, db_name=DB_NAME, failure_threshold=3, base_open=60, max_open=3600, probe_timeout=60,
+                 window=60, min_samples=20, degraded_rate=0.5, recovered_rate=0.2, degraded_scale=0.25,
+                 jitter=0.1):
+        self.db_name = db_name
+        self.failure_threshold = failure_threshold
+        self.base_open = base_open
+        self.max_open = max_open
+        self.probe_timeout = probe_timeout
+        self.window = window
+        self.min_samples = min_samples
+        self.degraded_rate = degraded_rate
+        self.recovered_rate = recovered_rate
+        self.degraded_scale = degraded_scale
+        self.jitter = jitter
+
+        self.lock = threading.Lock()
+        self.breakers = {}
+        self.results = deque()
+        self.failed = 0
+        self.degraded = False
+        self.load()
+
+    def load(self):
+        try:
+            with get_connection(self.db_name) as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT channel_id, state, failures, trips, open_until, last_error
+                    FROM channel_breakers
+                """)
+                rows = cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"[WARN] Could not load circuit breakers: {e}")
+            return
+        with self.lock:
+            self.breakers = {}
+            for channel_id, state, failures, trips, open_until, last_error in rows:
+                # A probe cut short by the restart is simply sent again
+                if state == HALF_OPEN:
+                    state = OPEN
+                self.breakers[str(channel_id)] = ChannelBreaker(
+                    str(channel_id), state, failures, trips, open_until, last_error
+                )
+        tripped = sum(b.state != CLOSED for b in self.breakers.values())
+        if tripped:
+            print(f"[INIT] {tripped} channel breaker(s) restored open.")
+
+    # ------------------------------------------------------------------
+    #           Per-channel breakers
+    # ------------------------------------------------------------------
+
+    def allow(self, channel_id, now=None):
+        """
+        0 if the channel may be polled now, otherwise the seconds to wait.
+        An open breaker whose wait is over moves to half_open and lets this
+        one poll through as its probe.
+        """
+        now = now or time.time()
+        with self.lock:
+            breaker = self.breakers.get(str(channel_id))
+            if breaker is None or breaker.state == CLOSED:
+                return 0
+            if breaker.state == OPEN:
+                if now < breaker.open_until:
+                    return breaker.open_until - now
+                breaker.state = HALF_OPEN
+                breaker.probe_started = now
+                return 0
+            # Half open: one probe at a time, unless its result got lost
+            if breaker.probe_started is not None and now - breaker.probe_started < self.probe_timeout:
+                return self.probe_timeout - (now - breaker.probe_started)
+            breaker.probe_started = now
+            return 0
+
+    def record(self, channel_id, ok, error=None, now=None):
+        """
+        Feed one poll result into the channel's breaker and the guard.
+        Returns the breaker row to persist, or None when nothing changed.
+        """
+        now = now or time.time()
+        channel_id = str(channel_id)
+        with self.lock:
+            self._record_rate(ok, now)
+            breaker = self.breakers.get(channel_id)
+            if ok:
+                if breaker is None or (breaker.state == CLOSED and not breaker.failures):
+                    return None
+                if breaker.state != CLOSED:
+                    print(f"[POLL] Channel {channel_id} recovered, breaker closed")
+                breaker.state = CLOSED
+                breaker.failures = 0
+                breaker.trips = 0
+                breaker.open_until = 0.0
+                breaker.probe_started = None
+                return breaker.row(now)
+
+            if breaker is None:
+                breaker = self.breakers[channel_id] = ChannelBreaker(channel_id)
+            breaker.failures += 1
+            breaker.last_error = str(error)[:200] if error is not None else None
+            breaker.probe_started = None
+            if breaker.state == HALF_OPEN or (breaker.state == CLOSED and breaker.failures >= self.failure_threshold):
+                breaker.trips += 1
+                wait = min(self.base_open * 2 ** (breaker.trips - 1), self.max_open)
+                breaker.state = OPEN
+                breaker.open_until = now + wait * random.uniform(1 - self.jitter, 1 + self.jitter)
+                print(f"[WARN] Channel {channel_id} breaker open for ~{wait}s after "
+                      f"{breaker.failures} failure(s): {breaker.last_error}")
+            return breaker.row(now)
+
+    def tripped(self, now=None):
+        """Rows (see ChannelBreaker.row) of the breakers that are not closed, soonest retry first."""
+        now = now or time.time()
+        with self.lock:
+            rows = [b.row(now) for b in self.breakers.values() if b.state != CLOSED]
+        return sorted(rows, key=lambda row: row[4])
+
+    # ------------------------------------------------------------------
+    #           Fleet-wide error rate guard
+    # ------------------------------------------------------------------
+
+    def _record_rate(self, ok, now):
+        self.results.append((now, ok))
+        if not ok:
+            self.failed += 1
+        self._expire(now)
+
+    def _expire(self, now):
+        while self.results and now - self.results[0][0] > self.window:
+            _, ok = self.results.popleft()
+            if not ok:
+                self.failed -= 1
+
+    def error_rate(self, now=None):
+        now = now or time.time()
+        with self.lock:
+            self._expire(now)
+            return self.failed / len(self.results) if self.results else 0.0
+
+    def throttle(self, now=None):
+        """Share of the poll budget to use right now: 1.0, or degraded_scale while degraded."""
+        now = now or time.time()
+        with self.lock:
+            self._expire(now)
+            samples = len(self.results)
+            rate = self.failed / samples if samples else 0.0
+            if not self.degraded and samples >= self.min_samples and rate >= self.degraded_rate:
+                self.degraded = True
+                print(f"[WARN] Upstream degraded: {rate * 100:.0f}% of {samples} poll(s) failed "
+                      f"in {self.window}s, polling at {self.degraded_scale * 100:.0f}% of budget")
+            elif self.degraded and rate < self.recovered_rate:
+                self.degraded = False
+                print(f"[POLL] Upstream recovered ({rate * 100:.0f}% errors), polling at full budget")
+            return self.degraded_scale if self.degraded else 1.0
+
+    def get_stats(self, now=None):
+        now = now or time.time()
+        with self.lock:
+            self._expire(now)
+            states = {CLOSED: 0, OPEN: 0, HALF_OPEN: 0}
+            for breaker in self.breakers.values():
+                states[breaker.state] += 1
+            return {
+                "open": states[OPEN],
+                "half_open": states[HALF_OPEN],
+                "failing": sum(1 for b in self.breakers.values() if b.state == CLOSED and b.failures),
+                "error_rate": self.failed / len(self.results) if self.results else 0.0,
+                "samples": len(self.results),
+                "degraded": self.degraded,
+            }
@@ -0,0 +1,456 @@
+"""
+Headless collector: polls ThingSpeak, decodes, logs to fault_logs and
+publishes the live fleet state to the live_state table for the GUIs.
+
+    python Collector.py                  # run as a daemon until Ctrl+C / SIGTERM
+    python Collector.py --engine threads --budget 300
+    python Collector.py --shards 4       # one poll process per shard, see Shard_collector
+
+Only one collector runs per database. It holds a lease in collector_status
+and renews it with every publish; a second collector (or a GUI that would
+start one in-process) waits until the lease is released or runs out. GUIs
+read live_state (see Live_state), so any number of them can be open without
+adding requests to ThingSpeak.
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from Bulk_decoder import decode_batch
+from Circuit_breaker import BreakerBoard
+from Db_handler import (
+    acquire_collector_lease,
+    finish_history_migrations,
+    get_registry_version,
+    has_pending_history_migrations,
+    init_db,
+    load_collector_status,
+    load_live_state,
+    publish_live_state,
+    release_collector_lease,
+)
+from Fault_decode import DECODE_CACHE_SIZE, decode_cache
+from Feed_cache import FeedCache, NOT_MODIFIED
+from Feed_cursor import FeedCursorStore, to_epoch
+from Fleet_state import FleetState
+from Live_state import COLLECTOR_LEASE_SECONDS, decode_rows, encode_rows
+from Log_writer import FaultLogWriter
+from Machine_registry import machine_registry
+from Poll_scheduler import PollScheduler
+from Retention import RetentionManager
+from Thingspeak_api import feed_url, feed_params
+
+# Polling engine: "async" (one aiohttp session on an event loop) or
+# "threads" (requests on a ThreadPoolExecutor)
+POLL_ENGINE = "async"
+ASYNC_POLL_CONCURRENCY = 200
+
+# Days of raw fault_logs kept before they are summarized and archived
+RAW_RETENTION_DAYS = 30
+
+# ThingSpeak requests allowed per minute across the whole fleet; each
+# machine's own poll interval comes from its state (see Poll_scheduler)
+POLL_BUDGET_PER_MINUTE = 600
+POLL_TICK_SECONDS = 1.0
+
+# Live state and stats are written to the database this often
+PUBLISH_INTERVAL_SECONDS = 5
+
+# A channel fetched this recently is answered from the feed cache
+FEED_CACHE_TTL_SECONDS = 10
+
+# How often machines added/edited/deleted by other processes are picked up
+REGISTRY_CHECK_SECONDS = 10
+
+
+def parse_raw_field(raw_value):
+    """
+    Parse a ThingSpeak fieldN value into (decimal_int, raw_str, no_data).
+    decimal_int is folded into the 64-bit controller word range.
+    """
+    raw_str = str(raw_value or "").strip()
+    try:
+        if raw_str:
+            return int(raw_str) & 0xFFFFFFFFFFFFFFFF, raw_str, False
+        raise ValueError
+    except Exception:
+        try:
+            decimal_int = int(float(raw_str)) & 0xFFFFFFFFFFFFFFFF if raw_str else 0
+            return decimal_int, raw_str, not raw_str
+        except Exception:
+            return 0, raw_str, True
+
+
+class Collector:
+    def __init__(self, engine=POLL_ENGINE, budget_per_minute=POLL_BUDGET_PER_MINUTE,
+                 publish_interval=PUBLISH_INTERVAL_SECONDS):
+        self.engine = engine
+        self.publish_interval = publish_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        self.machines = {}
+        self.fleet = FleetState()
+        self.scheduler = PollScheduler(budget_per_minute=budget_per_minute)
+        # Per-channel circuit breakers plus the fleet-wide error rate guard
+        self.breakers = BreakerBoard()
+        self.cursor_store = FeedCursorStore()
+        self.feed_cache = FeedCache(ttl=FEED_CACHE_TTL_SECONDS)
+        self.last_feeds = {}
+        # Fault flag of the entry each machine currently shows, reused when nothing changed
+        self.last_faulted = {}
+        # Machines whose values changed since the last publish
+        self.dirty = set()
+        self.published_stale = set()
+        self.registry_version = None
+
+        self.log_writer = FaultLogWriter()
+        self.retention = RetentionManager(raw_days=RAW_RETENTION_DAYS)
+        self.executor = None
+        self.async_poller = None
+        self.poll_retries = 0
+
+    # ------------------------------------------------------------------
+    #           Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Take the collector lease and start polling. Returns False if another collector runs."""
+        if not acquire_collector_lease(self.owner, os.getpid(), COLLECTOR_LEASE_SECONDS):
+            return False
+
+        self.start_polling()
+        self.retention.start()
+        # Finish fault_logs / fault_events schema migrations in the background
+        if has_pending_history_migrations():
+            threading.Thread(target=finish_history_migrations, name="FaultLogMigration", daemon=True).start()
+        print(f"[COLLECTOR] Started ({self.engine} engine, {len(self.machines)} machine(s)).")
+        return True
+
+    def stop(self):
+        if not self.thread:
+            return
+        self.stop_polling()
+        self.retention.stop()
+        release_collector_lease(self.owner)
+        print("[COLLECTOR] Stopped.")
+
+    def start_polling(self):
+        """Start the poll engine, log writer and tick thread, without the lease or housekeeping."""
+        # Standalone collectors and shard workers never run the GUI's setup
+        decode_cache.resize(DECODE_CACHE_SIZE)
+        self.refresh_machines()
+        self.restore_live_state()
+
+        self.log_writer.start()
+        if self.engine == "async":
+            from Async_poller import AsyncPoller
+            self.async_poller = AsyncPoller(
+                concurrency=ASYNC_POLL_CONCURRENCY,
+                cursor_store=self.cursor_store,
+                feed_cache=self.feed_cache,
+            )
+            self.async_poller.start()
+            self.poll_retries = self.async_poller.retries
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=50)
+
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="Collector", daemon=True)
+        self.thread.start()
+
+    def stop_polling(self):
+        self.stop_event.set()
+        self.thread.join(POLL_TICK_SECONDS * 5)
+        self.thread = None
+        # Stop handing out new polls, then flush whatever the workers queued
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.async_poller is not None:
+            self.async_poller.stop()
+        self.publish()
+        self.log_writer.stop()
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def run_forever(self):
+        """Run until SIGINT/SIGTERM; for the daemon entry point."""
+        return run_until_stopped(self)
+
+    def _run(self):
+        next_publish = time.monotonic() + self.publish_interval
+        next_registry_check = time.monotonic() + REGISTRY_CHECK_SECONDS
+        while not self.stop_event.wait(POLL_TICK_SECONDS):
+            try:
+                self.poll_tick()
+                now = time.monotonic()
+                if now >= next_registry_check:
+                    next_registry_check = now + REGISTRY_CHECK_SECONDS
+                    version = get_registry_version()
+                    if version != self.registry_version:
+                        # Edits made in this process are already patched into the registry
+                        machine_registry.sync(version)
+                        self.refresh_machines()
+                if now >= next_publish:
+                    next_publish = now + self.publish_interval
+                    if not self.publish():
+                        print("[WARN] Collector lease was taken over; stopping this collector.")
+                        self.stop_event.set()
+            except Exception as e:
+                print(f"[ERROR] Collector tick failed: {e}")
+
+    # ------------------------------------------------------------------
+    #           Machines
+    # ------------------------------------------------------------------
+
+    def refresh_machines(self):
+        """Pick up machine changes; new machines are polled on the next tick."""
+        self.registry_version = get_registry_version()
+        self.machines = machine_registry.get_machines()
+        self.fleet.sync_machines(self.machines)
+        self.scheduler.sync(self.machines)
+
+    def restore_live_state(self):
+        """Start from the last published values, so a restart does not blank the GUIs."""
+        status = load_collector_status() or {}
+        self.fleet.generation = status.get("generation") or 0
+        rows = load_live_state()
+        if not rows:
+            return
+        ids, raw, fault, genset, has_data, updated, stale = decode_rows([row[:8] for row in rows])
+        self.fleet.load_rows(ids, raw, fault, genset, has_data, updated)
+        by_id = {info["id"]: name for name, info in self.machines.items()}
+        self.published_stale = {by_id[mid] for mid, s in zip(ids.tolist(), stale.tolist()) if s and mid in by_id}
+
+    # ------------------------------------------------------------------
+    #           Fetch & Decode
+    # ------------------------------------------------------------------
+
+    def poll_tick(self):
+        """Hand the machines the scheduler says are due to the poll engine."""
+        # A degraded upstream slows the whole fleet down and turns off retries
+        scale = self.breakers.throttle()
+        self.scheduler.set_budget_scale(scale)
+        if self.async_poller is not None:
+            self.async_poller.retries = self.poll_retries if scale >= 1 else 0
+
+        names = self.scheduler.take_due(gate=self.breaker_gate)
+        batch = {name: self.machines[name] for name in names if name in self.machines}
+        for name in names:
+            if name not in batch:
+                self.scheduler.record(name, "error")
+        if batch:
+            if self.async_poller is not None:
+                self.async_poller.poll(batch, self.handle_machine_result)
+            else:
+                for name, info in batch.items():
+                    self.executor.submit(self.process_machine, name, info)
+
+    def breaker_gate(self, name):
+        """Seconds to hold `name` back while its channel's breaker is open (0 to poll now)."""
+        info = self.machines.get(name)
+        return self.breakers.allow(info["channel_id"]) if info else 0
+
+    def process_machine(self, name, info):
+        """Threaded engine: fetch one machine with requests and hand off the result."""
+        try:
+            channel_id = info["channel_id"]
+            params = feed_params(info, self.cursor_store.request_params(channel_id))
+            if self.feed_cache.cached(channel_id, params):
+                feeds = NOT_MODIFIED
+            else:
+                headers = self.feed_cache.request_headers(channel_id, params)
+                response = requests.get(feed_url(channel_id), params=params, headers=headers, timeout=8)
+                if response.status_code != 304:
+                    response.raise_for_status()
+                feeds = self.feed_cache.read_response(
+                    channel_id, params, response.status_code, response.headers, response.content
+                )
+        except Exception as e:
+            self.handle_machine_result(name, None, e)
+            return
+        self.handle_machine_result(name, feeds, None)
+
+    def handle_machine_result(self, name, feeds, error):
+        """Decode and store one machine's fetch result. Called by both polling engines."""
+        outcome, faulted, changed = "error", False, False
+        try:
+            if error is not None:
+                # Keep the last known values; the machine goes stale if it stays unreachable
+                print(f"[ERROR] API fetch failed for {name}: {error}")
+            elif feeds is NOT_MODIFIED:
+                outcome, faulted = self.unchanged_result(name)
+            else:
+                latest, has_new = self.log_new_feeds(name, feeds)
+                if latest is None:
+                    print(f"[WARN] No data for machine: {name}")
+                    changed = self.mark_no_data(name)
+                    outcome = "empty"
+                elif not has_new and name in self.last_faulted:
+                    # Same entry as last time: nothing to decode or publish
+                    outcome, faulted = self.unchanged_result(name)
+                else:
+                    faulted, changed = self.apply_feed(name, latest)
+                    self.last_faulted[name] = faulted
+                    outcome = "ok"
+        except Exception as e:
+            print(f"[ERROR] Processing failed for {name}: {e}")
+        finally:
+            info = self.machines.get(name)
+            if info is not None:
+                # An empty channel still answered, so only fetch errors count against the breaker
+                breaker_row = self.breakers.record(info["channel_id"], error is None, error)
+                if breaker_row:
+                    self.log_writer.save_breaker(breaker_row)
+            self.scheduler.record(name, outcome, faulted, changed)
+            if changed:
+                with self.lock:
+                    self.dirty.add(name)
+
+    def unchanged_result(self, name):
+        """(outcome, faulted) for a channel that has nothing new since its last poll."""
+        self.feed_cache.skipped_decode()
+        if name not in self.last_faulted:
+            return "empty", False
+        return "ok", self.last_faulted[name]
+
+    def log_new_feeds(self, name, feeds):
+        """
+        Queue every entry newer than the channel's cursor for logging, oldest
+        first, and advance the cursor. Returns (entry to show in the GUI,
+        whether any entry was new).
+        """
+        info = self.machines.get(name)
+        if info is None:
+            return None, False
+        channel_id = info["channel_id"]
+
+        new_feeds = self.cursor_store.new_entries(channel_id, feeds)
+        raw_rows = [[parse_raw_field(feed.get(f"field{i}"))[0] for i in range(1, 9)] for feed in new_feeds]
+        fault_codes = decode_batch(raw_rows)["fault_code"].tolist() if raw_rows else []
+
+        for feed, raw_values, codes in zip(new_feeds, raw_rows, fault_codes):
+            ts = to_epoch(feed.get("created_at", ""))
+            for i in range(1, 9):
+                self.log_writer.log(info["id"], i, raw_values[i - 1], codes[i - 1], ts)
+
+            cursor_row = self.cursor_store.advance(channel_id, feed)
+            if cursor_row:
+                self.log_writer.save_cursor(cursor_row)
+
+        # Nothing new since the cursor: keep showing the last known entry
+        if new_feeds:
+            latest = new_feeds[-1]
+        else:
+            latest = self.last_feeds.get(name) or (feeds[-1] if feeds else None)
+        if latest is not None:
+            self.last_feeds[name] = latest
+        return latest, bool(new_feeds)
+
+    def apply_feed(self, name, feed):
+        """Store a feed entry in the fleet state. Returns (faulted, changed)."""
+        parsed = [parse_raw_field(feed.get(f"field{i}")) for i in range(1, 9)]
+        raw_values = [decimal_int for decimal_int, _, _ in parsed]
+        columns = decode_batch(raw_values)
+        has_data = [not no_data for _, _, no_data in parsed]
+        changed = self.fleet.update_machine(
+            name,
+            raw_values,
+            columns["fault_code"],
+            columns["genset_on"],
+            has_data,
+        )
+        faulted = any(code != 0 and ok for code, ok in zip(columns["fault_code"].tolist(), has_data))
+        return faulted, changed
+
+    def mark_no_data(self, name):
+        self.last_faulted.pop(name, None)
+        return self.fleet.mark_no_data(name)
+
+    # ------------------------------------------------------------------
+    #           Publish
+    # ------------------------------------------------------------------
+
+    def publish(self):
+        """
+        Write the machines whose values or stale flag changed since the last
+        publish, plus the stats, to the database. Returns False when the
+        lease has been lost.
+        """
+        snapshot, dirty, stale = self.take_changes()
+        stats = json.dumps(self.get_stats(), default=str)
+        if not publish_live_state(self.owner, encode_rows(snapshot, dirty), snapshot.generation, stats):
+            with self.lock:
+                self.dirty |= dirty
+            return False
+        self.published_stale = stale
+        return True
+
+    def take_changes(self):
+        """(snapshot, names to write, stale names) for the next publish."""
+        stale = self.scheduler.stale_names()
+        snapshot = self.fleet.publish(stale)
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+        return snapshot, dirty | (stale ^ self.published_stale), stale
+
+    def get_stats(self):
+        fetch_cycle, fetch_totals = self.feed_cache.take_cycle_stats()
+        log_stats = self.log_writer.get_stats()
+        log_stats["warn_depth"] = self.log_writer.warn_depth
+        return {
+            "engine": self.engine,
+            "machines": len(self.machines),
+            "scheduler": self.scheduler.get_stats(),
+            "breakers": self.breakers.get_stats(),
+            "fetch_cycle": fetch_cycle,
+            "fetch_totals": fetch_totals,
+            "log_writer": log_stats,
+        }
+
+
+def run_until_stopped(collector):
+    """Start `collector` and block until SIGINT/SIGTERM or until it stops itself."""
+    if not collector.start():
+        status = load_collector_status() or {}
+        print(f"[COLLECTOR] Another collector is running ({status.get('owner')}); exiting.")
+        return False
+    signal.signal(signal.SIGTERM, lambda *_: collector.stop_event.set())
+    try:
+        while not collector.stop_event.wait(1.0):
+            pass
+    except KeyboardInterrupt:
+        pass
+    collector.stop()
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless RECD collector")
+    parser.add_argument("--engine", choices=("async", "threads"), default=POLL_ENGINE)
+    parser.add_argument("--budget", type=int, default=POLL_BUDGET_PER_MINUTE, help="ThingSpeak requests per minute")
+    parser.add_argument("--shards", type=int, default=0,
+                        help="poll in this many worker processes (0 = in this process)")
+    args = parser.parse_args()
+
+    init_db()
+    if args.shards > 0:
+        from Shard_collector import ShardedCollector
+        collector = ShardedCollector(shards=args.shards, engine=args.engine, budget_per_minute=args.budget)
+    else:
+        collector = Collector(engine=args.engine, budget_per_minute=args.budget)
+    run_until_stopped(collector)
+
+
+if __name__ == "__main__":
+    main()
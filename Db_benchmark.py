@@ -0,0 +1,137 @@
+"""
+Insert and read throughput of the Db_handler functions, with a new
+connection per call in a rollback-journal database (how it used to work)
+against the shared per-thread connections in WAL mode.
+
+    python Db_benchmark.py --machines 500 --ops 5000 --threads 50
+
+Each mode runs on a fresh temporary database, so RECD.db is not touched.
+The concurrent phase runs `threads` readers against one writer and counts
+"database is locked" errors.
+"""
+import argparse
+import gc
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+import Db_connection
+import Db_handler
+from Fault_decode import fault_code_of
+
+
+def _rate(count, seconds):
+    return count / seconds if seconds > 0 else float("inf")
+
+
+def _timed(label, count, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<26} {_rate(count, elapsed):>12,.0f} /s   ({count} in {elapsed:.2f}s)")
+    return _rate(count, elapsed)
+
+
+def _fault_rows(machine_ids, count, ts):
+    rows = []
+    for i in range(count):
+        raw = random.getrandbits(64)
+        rows.append((ts + i, random.choice(machine_ids), random.randint(1, 8),
+                     Db_handler.to_signed64(raw), fault_code_of(raw)))
+    return rows
+
+
+def _setup(path, machines, pooled):
+    Db_connection.close_connections()
+    Db_connection.POOL_CONNECTIONS = pooled
+    Db_handler.DB_NAME = path
+    Db_handler.init_db()
+    if not pooled:
+        # Leaving WAL needs the only connection; init_db's is closed once collected
+        gc.collect()
+        with sqlite3.connect(path) as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")
+    Db_handler.import_machine_rows(
+        [Db_handler.MACHINE_SHEET_COLUMNS[:5]]
+        + [(f"BENCH-{i:05d}", str(100000 + i), f"{i:05d}", "KEY", 1) for i in range(machines)]
+    )
+    return [info["id"] for info in Db_handler.load_machines().values()]
+
+
+def _concurrent(machine_ids, names, threads, seconds):
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    lock = threading.Lock()
+
+    def count(key, amount=1):
+        with lock:
+            counts[key] += amount
+
+    def reader():
+        while not stop.is_set():
+            try:
+                Db_handler.value_at(random.choice(machine_ids), random.randint(1, 8), int(time.time()))
+                Db_handler.load_live_state(0)
+                Db_handler.load_machines([random.choice(names)])
+                count("reads", 3)
+            except sqlite3.OperationalError:
+                count("locked")
+
+    def writer():
+        while not stop.is_set():
+            try:
+                Db_handler.insert_fault_logs(_fault_rows(machine_ids, 100, int(time.time())))
+                count("writes", 100)
+            except sqlite3.OperationalError:
+                count("locked")
+
+    workers = [threading.Thread(target=reader) for _ in range(threads)] + [threading.Thread(target=writer)]
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    print(f"  {threads} readers + 1 writer     {_rate(counts['reads'], seconds):>12,.0f} reads/s, "
+          f"{_rate(counts['writes'], seconds):,.0f} rows/s, {counts['locked']} locked error(s)")
+
+
+def run_mode(label, pooled, machines, ops, threads, seconds):
+    print(f"[BENCH] {label}")
+    with tempfile.TemporaryDirectory() as tmp:
+        machine_ids = _setup(os.path.join(tmp, "bench.db"), machines, pooled)
+        names = [f"BENCH-{i:05d}" for i in range(machines)]
+        now = int(time.time())
+
+        _timed("single-row inserts", ops, lambda: [
+            Db_handler.insert_fault_log(random.choice(names), f"M{random.randint(1, 8)}",
+                                        f"{random.getrandbits(64):016X}")
+            for _ in range(ops)
+        ])
+        batches = [_fault_rows(machine_ids, 500, now) for _ in range(max(1, ops * 10 // 500))]
+        _timed("batched inserts (500)", 500 * len(batches),
+               lambda: [Db_handler.insert_fault_logs(batch) for batch in batches])
+        _timed("point reads (value_at)", ops, lambda: [
+            Db_handler.value_at(random.choice(machine_ids), random.randint(1, 8), now + ops)
+            for _ in range(ops)
+        ])
+        _timed("machine lookups", ops, lambda: [
+            Db_handler.load_machines([random.choice(names)]) for _ in range(ops)
+        ])
+        _concurrent(machine_ids, names, threads, seconds)
+        Db_connection.close_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SQLite throughput before/after connection reuse")
+    parser.add_argument("--machines", type=int, default=500)
+    parser.add_argument("--ops", type=int, default=5000, help="operations per single-call phase")
+    parser.add_argument("--threads", type=int, default=50, help="reader threads in the concurrent phase")
+    parser.add_argument("--seconds", type=float, default=5.0, help="length of the concurrent phase")
+    args = parser.parse_args()
+
+    run_mode("connection per call, rollback journal", False, args.machines, args.ops, args.threads, args.seconds)
+    run_mode("shared connections, WAL + tuned pragmas", True, args.machines, args.ops, args.threads, args.seconds)
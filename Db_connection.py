@@ -0,0 +1,67 @@
+"""
+Shared SQLite connections.
+
+Every thread keeps one open connection per database file instead of
+opening (and re-parsing the schema, re-preparing statements for) a new one
+on each call. Use it exactly like a fresh connection:
+
+    with get_connection(DB_NAME) as conn:
+        conn.execute(...)
+
+The with block still commits on success and rolls back on an exception; it
+does not close the connection. Each connection is set up with:
+
+  - busy_timeout      - wait for a lock instead of failing with
+                        "database is locked" right away
+  - synchronous=NORMAL - in WAL mode commits no longer fsync; a power cut
+                        can lose the last transactions but never corrupts
+  - cache_size / mmap_size - larger page cache, reads served from mmap
+  - a larger prepared-statement cache, so the repeated queries of the
+    poll and log paths are compiled once per thread
+
+WAL itself is a property of the database file and is switched on by
+init_db(). Long-running workers that own their connection (the log writer)
+use open_connection() to get the same settings.
+"""
+import sqlite3
+import threading
+
+# Set to False to open a plain connection per call (the old behaviour),
+# e.g. to compare with Db_benchmark.py
+POOL_CONNECTIONS = True
+
+BUSY_TIMEOUT_SECONDS = 15
+CACHE_SIZE_KB = 16 * 1024
+MMAP_SIZE_BYTES = 256 * 1024 * 1024
+STATEMENT_CACHE_SIZE = 256
+
+_local = threading.local()
+
+
+def open_connection(db_name):
+    """A new connection with the busy timeout, pragmas and statement cache applied."""
+    conn = sqlite3.connect(db_name, timeout=BUSY_TIMEOUT_SECONDS, cached_statements=STATEMENT_CACHE_SIZE)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE_BYTES}")
+    return conn
+
+
+def get_connection(db_name):
+    """This thread's connection to `db_name`, opened on first use."""
+    if not POOL_CONNECTIONS:
+        return sqlite3.connect(db_name)
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(db_name)
+    if conn is None:
+        conn = connections[db_name] = open_connection(db_name)
+    return conn
+
+
+def close_connections():
+    """Close this thread's cached connections, e.g. before the database file is replaced."""
+    for conn in getattr(_local, "connections", {}).values():
+        conn.close()
+    _local.connections = {}
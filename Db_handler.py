@@ -1,15 +1,55 @@
+import csv
 import sqlite3
+import time
 from datetime import datetime
+from itertools import groupby
 import openpyxl
 import os
 
+from Db_connection import get_connection
+
 DB_NAME = "RECD.db"
 
+# Bumped whenever init_db() changes the layout of an existing table.
+#   1 - original schema (fault_logs with ISO text timestamps and hex text)
+#   2 - typed fault_logs: epoch ts, machine_id, controller 1-8, INTEGER raw value
+#   3 - one machine_controllers row per (machine_id, controller)
+#   4 - fault_events derived from fault_logs
+SCHEMA_VERSION = 4
+
+# Rows staged per executemany during an Excel import
+IMPORT_BATCH_SIZE = 1000
+
+def to_signed64(value):
+    """Fold an unsigned 64-bit controller word into SQLite's signed INTEGER range."""
+    value &= 0xFFFFFFFFFFFFFFFF
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+def from_signed64(value):
+    """Inverse of to_signed64()."""
+    return value + (1 << 64) if value < 0 else value
+
+def _connect():
+    """This thread's shared connection to DB_NAME (see Db_connection)."""
+    return get_connection(DB_NAME)
+
+def _table_exists(cursor, name):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,))
+    return cursor.fetchone() is not None
+
+def _column_names(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [row[1] for row in cursor.fetchall()]
+
 def init_db():
     """Initializes the SQLite database and tables."""
-    with sqlite3.connect(DB_NAME) as conn:
+    with _connect() as conn:
         cursor = conn.cursor()
 
+        # WAL lets the GUI read live_state while the collector writes; it is
+        # a property of the database file, so this only has to happen once
+        cursor.execute("PRAGMA journal_mode=WAL")
+
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS machines (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -32,15 +72,227 @@ def init_db():
             )
         """)
 
+        cursor.execute("PRAGMA user_version")
+        version = cursor.fetchone()[0]
+
+        # A version 1 fault_logs is renamed out of the way here; its rows are
+        # copied over in chunks by migrate_legacy_fault_logs()
+        if version < 2 and _table_exists(cursor, "fault_logs") and "hex_value" in _column_names(cursor, "fault_logs"):
+            cursor.execute("DROP VIEW IF EXISTS fault_logs_view")
+            cursor.execute("ALTER TABLE fault_logs RENAME TO fault_logs_legacy")
+            print("[INIT] Old fault_logs table renamed to fault_logs_legacy for migration.")
+
+        # The Excel import upserts controllers on (machine_id, controller); keep
+        # the newest of any duplicates older versions let in
+        if version < 3:
+            cursor.execute("""
+                DELETE FROM machine_controllers WHERE id NOT IN (
+                    SELECT MAX(id) FROM machine_controllers GROUP BY machine_id, controller
+                )
+            """)
+            if cursor.rowcount > 0:
+                print(f"[INIT] Removed {cursor.rowcount} duplicate controller row(s).")
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_machine_controllers_machine_controller
+            ON machine_controllers (machine_id, controller)
+        """)
+
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS fault_logs (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT NOT NULL,
-                machine_name TEXT NOT NULL,
-                vm_field TEXT NOT NULL,
-                hex_value TEXT NOT NULL
+                ts INTEGER NOT NULL,
+                machine_id INTEGER NOT NULL,
+                controller INTEGER NOT NULL CHECK (controller BETWEEN 1 AND 8),
+                raw_value INTEGER NOT NULL,
+                fault_code INTEGER NOT NULL DEFAULT 0,
+                FOREIGN KEY(machine_id) REFERENCES machines(id) ON DELETE CASCADE
             )
         """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_fault_logs_machine_ts
+            ON fault_logs (machine_id, controller, ts)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_fault_logs_code_ts
+            ON fault_logs (fault_code, ts)
+        """)
+        # Day-range scans for retention summaries and archival
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_fault_logs_ts
+            ON fault_logs (ts)
+        """)
+
+        # One row per stretch a controller spent in a non-zero fault code,
+        # kept up to date by the log writer (see save_fault_events()). end_ts
+        # and duration stay NULL while the fault is active.
+        new_fault_events = not _table_exists(cursor, "fault_events")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS fault_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                machine_id INTEGER NOT NULL,
+                controller INTEGER NOT NULL CHECK (controller BETWEEN 1 AND 8),
+                fault_code INTEGER NOT NULL,
+                start_ts INTEGER NOT NULL,
+                end_ts INTEGER,
+                duration INTEGER
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_fault_events_machine_start
+            ON fault_events (machine_id, controller, start_ts)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_fault_events_code_start
+            ON fault_events (fault_code, start_ts)
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_fault_events_end ON fault_events (end_ts)")
+        # At most one active fault per controller
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_fault_events_open
+            ON fault_events (machine_id, controller) WHERE end_ts IS NULL
+        """)
+        # Machines whose fault_events still have to be rebuilt from fault_logs
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS fault_events_backfill (
+                machine_id INTEGER PRIMARY KEY
+            )
+        """)
+        if new_fault_events:
+            cursor.execute("INSERT OR IGNORE INTO fault_events_backfill SELECT DISTINCT machine_id FROM fault_logs")
+            if cursor.rowcount > 0:
+                print(f"[INIT] fault_events will be backfilled for {cursor.rowcount} machine(s).")
+
+        # Hourly/daily rollups written by Retention.RetentionManager
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS fault_log_summaries (
+                granularity TEXT NOT NULL CHECK (granularity IN ('hour', 'day')),
+                bucket_ts INTEGER NOT NULL,
+                machine_id INTEGER NOT NULL,
+                controller INTEGER NOT NULL,
+                fault_code INTEGER NOT NULL,
+                seconds INTEGER NOT NULL,
+                genset_on_seconds INTEGER NOT NULL,
+                transitions INTEGER NOT NULL,
+                first_transition_ts INTEGER,
+                last_transition_ts INTEGER,
+                PRIMARY KEY (granularity, machine_id, controller, bucket_ts, fault_code)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS fault_log_archives (
+                day_ts INTEGER PRIMARY KEY,
+                path TEXT NOT NULL,
+                row_count INTEGER NOT NULL,
+                created_ts INTEGER NOT NULL
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS retention_state (
+                key TEXT PRIMARY KEY,
+                value INTEGER
+            )
+        """)
+        # Value of each controller at the end of the last summarized day
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS retention_carry (
+                machine_id INTEGER NOT NULL,
+                controller INTEGER NOT NULL,
+                raw_value INTEGER NOT NULL,
+                ts INTEGER NOT NULL,
+                PRIMARY KEY (machine_id, controller)
+            )
+        """)
+
+        # Old column layout for readers written against schema version 1
+        cursor.execute("""
+            CREATE VIEW IF NOT EXISTS fault_logs_view AS
+            SELECT
+                l.id,
+                datetime(l.ts, 'unixepoch', 'localtime') AS timestamp,
+                m.name AS machine_name,
+                'M' || l.controller AS vm_field,
+                printf('%016X', l.raw_value) AS hex_value,
+                l.fault_code
+            FROM fault_logs l
+            JOIN machines m ON m.id = l.machine_id
+        """)
+
+        # Run-length state per controller for change-only logging: raw_value
+        # has been unchanged from since_ts until at least last_seen_ts
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS fault_log_state (
+                machine_id INTEGER NOT NULL,
+                controller INTEGER NOT NULL,
+                raw_value INTEGER NOT NULL,
+                since_ts INTEGER NOT NULL,
+                last_seen_ts INTEGER NOT NULL,
+                last_logged_ts INTEGER NOT NULL,
+                PRIMARY KEY (machine_id, controller)
+            )
+        """)
+
+        # Last ThingSpeak entry seen per channel, for incremental polling
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS feed_cursors (
+                channel_id TEXT PRIMARY KEY,
+                last_entry_id INTEGER NOT NULL,
+                last_created_at TEXT
+            )
+        """)
+
+        # Circuit breaker per ThingSpeak channel, so open breakers survive a restart
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS channel_breakers (
+                channel_id TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                failures INTEGER NOT NULL,
+                trips INTEGER NOT NULL,
+                open_until REAL NOT NULL,
+                last_error TEXT,
+                updated_ts INTEGER NOT NULL
+            )
+        """)
+
+        # Live fleet state published by the collector for GUIs to read.
+        # raw/fault_code hold 8 little-endian uint64/uint16 values (M1-M8),
+        # genset_on/has_data are bitmasks with bit 0 for M1
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS live_state (
+                machine_id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                raw BLOB NOT NULL,
+                fault_code BLOB NOT NULL,
+                genset_on INTEGER NOT NULL,
+                has_data INTEGER NOT NULL,
+                updated REAL NOT NULL,
+                stale INTEGER NOT NULL,
+                version INTEGER NOT NULL
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_live_state_version ON live_state(version)")
+
+        # The one running collector: its lease, heartbeat and latest stats (JSON)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS collector_status (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                owner TEXT,
+                pid INTEGER,
+                started REAL,
+                heartbeat REAL NOT NULL DEFAULT 0,
+                generation INTEGER NOT NULL DEFAULT 0,
+                stats TEXT
+            )
+        """)
+        cursor.execute("INSERT OR IGNORE INTO collector_status (id) VALUES (1)")
+
+        # Bumped on every machine change so other processes know to reload
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS registry_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL
+            )
+        """)
+        cursor.execute("INSERT OR IGNORE INTO registry_version (id, version) VALUES (1, 0)")
 
         # ✅ Admin table
         cursor.execute("""
@@ -50,12 +302,75 @@ def init_db():
                 password TEXT NOT NULL
             )
         """)
-        
+
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
         conn.commit()
     print("[INIT] Database initialized with required tables.")
 
+def has_legacy_fault_logs():
+    with _connect() as conn:
+        return _table_exists(conn.cursor(), "fault_logs_legacy")
+
+def migrate_legacy_fault_logs(chunk_size=5000, pause=0.05):
+    """
+    Copy rows from fault_logs_legacy (schema version 1) into the typed
+    fault_logs table, `chunk_size` rows per transaction, so the app can keep
+    logging while it runs. Copied rows are deleted from the legacy table, so
+    an interrupted migration resumes where it stopped. The legacy table is
+    dropped once it is empty. Returns the number of rows copied.
+    """
+    from Fault_decode import fault_code_of
+
+    copied = skipped = 0
+    while True:
+        with _connect() as conn:
+            cursor = conn.cursor()
+            if not _table_exists(cursor, "fault_logs_legacy"):
+                return copied
+
+            cursor.execute("""
+                SELECT id, timestamp, machine_name, vm_field, hex_value
+                FROM fault_logs_legacy ORDER BY id LIMIT ?
+            """, (chunk_size,))
+            rows = cursor.fetchall()
+            if not rows:
+                cursor.execute("DROP TABLE fault_logs_legacy")
+                cursor.execute("INSERT OR IGNORE INTO fault_events_backfill SELECT DISTINCT machine_id FROM fault_logs")
+                conn.commit()
+                print(f"[MIGRATE] fault_logs migration complete: {copied} row(s) copied, {skipped} skipped.")
+                return copied
+
+            cursor.execute("SELECT name, id FROM machines")
+            machine_ids = dict(cursor.fetchall())
+
+            converted = []
+            for _, timestamp, machine_name, vm_field, hex_value in rows:
+                machine_id = machine_ids.get(machine_name)
+                try:
+                    ts = int(datetime.fromisoformat(timestamp).timestamp())
+                    controller = int(str(vm_field).strip().upper().lstrip("M"))
+                    raw_value = int(hex_value, 16)
+                except (TypeError, ValueError):
+                    machine_id = None
+                # Rows for machines that no longer exist cannot be keyed
+                if machine_id is None or not 1 <= controller <= 8:
+                    skipped += 1
+                    continue
+                converted.append((ts, machine_id, controller, to_signed64(raw_value), fault_code_of(raw_value)))
+
+            cursor.executemany("""
+                INSERT INTO fault_logs (ts, machine_id, controller, raw_value, fault_code)
+                VALUES (?, ?, ?, ?, ?)
+            """, converted)
+            cursor.execute("DELETE FROM fault_logs_legacy WHERE id <= ?", (rows[-1][0],))
+            conn.commit()
+            copied += len(converted)
+
+        # Give the log writer a chance at the write lock between chunks
+        time.sleep(pause)
+
 def has_any_admin():
-    with sqlite3.connect(DB_NAME) as conn:
+    with _connect() as conn:
         cursor = conn.cursor()
         # ✅ Safe check for table existence
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='admins'")
@@ -65,19 +380,19 @@ def has_any_admin():
         return cursor.fetchone() is not None
 
 def create_admin(username, password):
-    with sqlite3.connect(DB_NAME) as conn:
+    with _connect() as conn:
         cursor = conn.cursor()
         cursor.execute("INSERT INTO admins (username, password) VALUES (?, ?)", (username, password))
         conn.commit()
 
 def get_admin(username, password):
-    with sqlite3.connect(DB_NAME) as conn:
+    with _connect() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT 1 FROM admins WHERE username=? AND password=?", (username, password))
         return cursor.fetchone() is not None
 
 def reset_admin(username, new_password):
-    with sqlite3.connect(DB_NAME) as conn:
+    with _connect() as conn:
         cursor = conn.cursor()
         cursor.execute("UPDATE admins SET password=? WHERE username=?", (new_password, username))
         if cursor.rowcount == 0:
@@ -86,14 +401,48 @@ def reset_admin(username, new_password):
         return True
 
 def list_admins():
-    with sqlite3.connect(DB_NAME) as conn:
+    with _connect() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT username FROM admins")
         return [row[0] for row in cursor.fetchall()]
 
+# Callbacks run after machines change, see add_machine_listener()
+_machine_listeners = []
+
+def add_machine_listener(callback):
+    """
+    Call `callback(names, version)` after machines are added, edited,
+    deleted or imported. `names` lists the machine names involved (old and
+    new name on a rename), or is None when any machine may have changed.
+    `version` is the registry version the change bumped to (None if the
+    bump failed).
+    """
+    _machine_listeners.append(callback)
+
+def _notify_machines_changed(names=None):
+    version = None
+    try:
+        with _connect() as conn:
+            conn.execute("UPDATE registry_version SET version = version + 1 WHERE id = 1")
+            version = conn.execute("SELECT version FROM registry_version WHERE id = 1").fetchone()[0]
+            conn.commit()
+    except sqlite3.Error as e:
+        print(f"[WARN] Could not bump registry version: {e}")
+    for callback in list(_machine_listeners):
+        try:
+            callback(names, version)
+        except Exception as e:
+            print(f"[ERROR] Machine change listener failed: {e}")
+
+def get_registry_version():
+    """Counter bumped by every machine change, in any process."""
+    with _connect() as conn:
+        row = conn.execute("SELECT version FROM registry_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
 def add_machine(name, channel_id, api_key, controller_data):
     """Add a new machine and its controller data."""
-    with sqlite3.connect(DB_NAME) as conn:
+    with _connect() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT 1 FROM machines WHERE name = ?", (name,))
         if cursor.fetchone():
@@ -119,10 +468,11 @@ def add_machine(name, channel_id, api_key, controller_data):
                 entry.get("customer_name", "N/A")
             ))
         conn.commit()
+    _notify_machines_changed([name])
 
 def update_machine_full(old_name, new_name, old_channel, new_channel, old_key, new_key, controller_updates):
     """Update machine and controller details."""
-    with sqlite3.connect(DB_NAME) as conn:
+    with _connect() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             UPDATE machines
@@ -153,11 +503,12 @@ def update_machine_full(old_name, new_name, old_channel, new_channel, old_key, n
                 """, (new_no, cust_name, machine_id, ctrl, old_no))
 
         conn.commit()
-        return True
+    _notify_machines_changed([old_name, new_name])
+    return True
 
 def delete_machine(name):
     """Delete machine and related controllers."""
-    with sqlite3.connect(DB_NAME) as conn:
+    with _connect() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT id FROM machines WHERE name = ?", (name,))
         row = cursor.fetchone()
@@ -168,161 +519,740 @@ def delete_machine(name):
         cursor.execute("DELETE FROM machine_controllers WHERE machine_id = ?", (machine_id,))
         cursor.execute("DELETE FROM machines WHERE id = ?", (machine_id,))
         conn.commit()
+    _notify_machines_changed([name])
 
 def insert_fault_log(machine_name, vm_field, hex_value):
     """Insert a fault log entry."""
-    with sqlite3.connect(DB_NAME) as conn:
+    from Fault_decode import fault_code_of
+
+    raw_value = int(hex_value, 16)
+    with _connect() as conn:
         cursor = conn.cursor()
+        cursor.execute("SELECT id FROM machines WHERE name = ?", (machine_name,))
+        row = cursor.fetchone()
+        if not row:
+            return
         cursor.execute("""
-            INSERT INTO fault_logs (timestamp, machine_name, vm_field, hex_value)
-            VALUES (?, ?, ?, ?)
-        """, (datetime.now().isoformat(), machine_name, vm_field, hex_value))
+            INSERT INTO fault_logs (ts, machine_id, controller, raw_value, fault_code)
+            VALUES (?, ?, ?, ?, ?)
+        """, (int(time.time()), row[0], int(vm_field.lstrip("M")), to_signed64(raw_value), fault_code_of(raw_value)))
         conn.commit()
 
-def load_machines():
-    """Load machines and M1 controller data as summary."""
-    with sqlite3.connect(DB_NAME) as conn:
+def insert_fault_logs(rows, conn=None):
+    """
+    Insert many fault log entries with one executemany.
+    Each row is a (ts, machine_id, controller, raw_value, fault_code) tuple,
+    with ts in epoch seconds, controller 1-8 and raw_value from to_signed64().
+    When `conn` is given the caller owns the transaction and commits it.
+    """
+    if conn is None:
+        with _connect() as conn:
+            insert_fault_logs(rows, conn)
+            conn.commit()
+        return
+    cursor = conn.cursor()
+    cursor.executemany("""
+        INSERT INTO fault_logs (ts, machine_id, controller, raw_value, fault_code)
+        VALUES (?, ?, ?, ?, ?)
+    """, rows)
+
+def save_feed_cursors(rows, conn=None):
+    """
+    Upsert feed cursors. Each row is a (channel_id, last_entry_id, last_created_at) tuple.
+    When `conn` is given the caller owns the transaction and commits it.
+    """
+    if conn is None:
+        with _connect() as conn:
+            save_feed_cursors(rows, conn)
+            conn.commit()
+        return
+    cursor = conn.cursor()
+    cursor.executemany("""
+        INSERT INTO feed_cursors (channel_id, last_entry_id, last_created_at)
+        VALUES (?, ?, ?)
+        ON CONFLICT(channel_id) DO UPDATE SET
+            last_entry_id = excluded.last_entry_id,
+            last_created_at = excluded.last_created_at
+        WHERE excluded.last_entry_id > feed_cursors.last_entry_id
+    """, rows)
+
+def save_channel_breakers(rows, conn=None):
+    """
+    Upsert circuit breaker rows (channel_id, state, failures, trips,
+    open_until, last_error, updated_ts). Closed breakers with no failures
+    are deleted instead. When `conn` is given the caller owns the transaction.
+    """
+    if conn is None:
+        with _connect() as conn:
+            save_channel_breakers(rows, conn)
+            conn.commit()
+        return
+    cursor = conn.cursor()
+    cursor.executemany("DELETE FROM channel_breakers WHERE channel_id = ?",
+                       [(row[0],) for row in rows if row[1] == "closed" and not row[2]])
+    cursor.executemany("""
+        INSERT OR REPLACE INTO channel_breakers
+            (channel_id, state, failures, trips, open_until, last_error, updated_ts)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [row for row in rows if row[1] != "closed" or row[2]])
+
+def load_tripped_breakers():
+    """Circuit breaker rows that are not closed, soonest retry first."""
+    with _connect() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT id, name, channel_id, api_key FROM machines")
-        machine_rows = cursor.fetchall()
+        cursor.execute("""
+            SELECT channel_id, state, failures, trips, open_until, last_error, updated_ts
+            FROM channel_breakers
+            WHERE state != 'closed'
+            ORDER BY open_until
+        """)
+        return cursor.fetchall()
 
-        machines = {}
-        for machine_id, name, channel_id, api_key in machine_rows:
-            cursor.execute("""
-                SELECT controller_no, mfg_date, inst_date
-                FROM machine_controllers
-                WHERE machine_id = ? AND controller = 'M1'
-                LIMIT 1
-            """, (machine_id,))
-            ctrl_data = cursor.fetchone()
-
-            if ctrl_data:
-                controller_no, mfg_date, inst_date = ctrl_data
-            else:
-                controller_no, mfg_date, inst_date = "N/A", "N/A", "N/A"
+def load_fault_log_state(db_name=DB_NAME):
+    """
+    Return the last known (machine_id, controller, raw_value, since_ts,
+    last_seen_ts, last_logged_ts) per controller. Controllers missing from
+    fault_log_state fall back to their newest fault_logs row.
+    """
+    with get_connection(db_name) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT machine_id, controller, raw_value, since_ts, last_seen_ts, last_logged_ts
+            FROM fault_log_state
+        """)
+        rows = {(r[0], r[1]): r for r in cursor.fetchall()}
 
-            machines[name] = {
+        # SQLite returns the other columns from the row holding MAX(ts)
+        cursor.execute("""
+            SELECT machine_id, controller, raw_value, MAX(ts)
+            FROM fault_logs
+            GROUP BY machine_id, controller
+        """)
+        for machine_id, controller, raw_value, ts in cursor.fetchall():
+            if (machine_id, controller) not in rows:
+                rows[(machine_id, controller)] = (machine_id, controller, raw_value, ts, ts, ts)
+
+    return [(m, c, from_signed64(raw), since, seen, logged) for m, c, raw, since, seen, logged in rows.values()]
+
+def save_fault_log_state(rows, conn=None):
+    """
+    Upsert change-only logging state. Rows are (machine_id, controller,
+    raw_value, since_ts, last_seen_ts, last_logged_ts) with an unsigned raw_value.
+    When `conn` is given the caller owns the transaction and commits it.
+    """
+    if conn is None:
+        with _connect() as conn:
+            save_fault_log_state(rows, conn)
+            conn.commit()
+        return
+    cursor = conn.cursor()
+    cursor.executemany("""
+        INSERT OR REPLACE INTO fault_log_state
+            (machine_id, controller, raw_value, since_ts, last_seen_ts, last_logged_ts)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [(m, c, to_signed64(raw), since, seen, logged) for m, c, raw, since, seen, logged in rows])
+
+def value_at(machine_id, controller, ts):
+    """
+    Rebuild the raw value a controller reported at `ts` from change-only
+    logs: the newest change or heartbeat row at or before `ts`. Returns None
+    when nothing was logged yet.
+    """
+    with _connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT raw_value FROM fault_logs
+            WHERE machine_id = ? AND controller = ? AND ts <= ?
+            ORDER BY ts DESC LIMIT 1
+        """, (machine_id, controller, ts))
+        row = cursor.fetchone()
+        return from_signed64(row[0]) if row else None
+
+def fetch_fault_history(machine_id, controller, start_ts, end_ts):
+    """
+    Return (ts, raw_value, fault_code) rows for one controller in
+    [start_ts, end_ts), oldest first. Served by idx_fault_logs_machine_ts.
+    """
+    with _connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT ts, raw_value, fault_code
+            FROM fault_logs
+            WHERE machine_id = ? AND controller = ? AND ts >= ? AND ts < ?
+            ORDER BY ts
+        """, (machine_id, controller, start_ts, end_ts))
+        return [(ts, from_signed64(raw), code) for ts, raw, code in cursor.fetchall()]
+
+def history_high_water(machine_id, controller):
+    """
+    Ids of the newest fault_logs and fault_events rows of one controller.
+    They grow with every row logged and every event backfilled for it, so
+    equal values mean its history has not changed. Served by the
+    (machine_id, controller, ...) indexes of both tables.
+    """
+    with _connect() as conn:
+        row = conn.execute("""
+            SELECT (SELECT MAX(id) FROM fault_logs WHERE machine_id = ? AND controller = ?),
+                   (SELECT MAX(id) FROM fault_events WHERE machine_id = ? AND controller = ?)
+        """, (machine_id, controller, machine_id, controller)).fetchone()
+    return row[0] or 0, row[1] or 0
+
+def load_machines(names=None):
+    """
+    Load machines with all their M1-M8 controller rows in one JOIN, keyed
+    by name. `names` limits it to those machines. The top-level
+    controller_no/mfg_date/install_date summarize M1.
+    """
+    query = """
+        SELECT m.id, m.name, m.channel_id, m.api_key,
+               mc.controller, mc.controller_no, mc.mfg_date, mc.inst_date, mc.customer_name
+        FROM machines m
+        LEFT JOIN machine_controllers mc ON mc.machine_id = m.id
+    """
+    params = ()
+    if names is not None:
+        params = list(names)
+        if not params:
+            return {}
+        query += f" WHERE m.name IN ({','.join('?' * len(params))})"
+    query += " ORDER BY m.id, mc.controller, mc.id"
+
+    with _connect() as conn:
+        rows = conn.execute(query, params).fetchall()
+
+    machines = {}
+    for machine_id, name, channel_id, api_key, controller, controller_no, mfg_date, inst_date, customer_name in rows:
+        info = machines.get(name)
+        if info is None:
+            info = machines[name] = {
+                "id": machine_id,
+                "name": name,
                 "channel_id": channel_id,
                 "api_key": api_key,
                 "field": 1,
-                "controller_no": controller_no,
-                "mfg_date": mfg_date,
-                "install_date": inst_date
+                "controller_no": "N/A",
+                "mfg_date": "N/A",
+                "install_date": "N/A",
+                "controllers": [],
             }
-        return machines
+        if controller is None:
+            continue
+        if controller == "M1" and not any(c["controller"] == "M1" for c in info["controllers"]):
+            info["controller_no"] = controller_no
+            info["mfg_date"] = mfg_date
+            info["install_date"] = inst_date
+        info["controllers"].append({
+            "controller": controller,
+            "controller_no": controller_no,
+            "mfg_date": mfg_date,
+            "inst_date": inst_date,
+            "customer_name": customer_name,
+        })
+    return machines
 
-def insert_from_excel(file_path):
-    """
-    Import data from Excel where each row corresponds to one controller of one machine.
-    Expected columns (case and space insensitive): 
-        - "Machine Name"
-        - "Channel ID"
-        - "Controller Number"
-        - "API Key"
-        - "Fields(M1 to M8)" (the number 1 to 8 indicating controller name M1 to M8)
-        - "Mfg Date"      # <-- NEW, Optional
-        - "Inst Date"     # <-- NEW, Optional
-        - "Customer Name" # <-- NEW, Optional
-    This function is Windows encoding safe and compatible.
+def _cell_text(value):
+    """Excel cell as text; whole-number floats (12345.0) lose the '.0'."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+# Header of fleet sheets, in the order exports write it; imports match any
+# order, ignoring case and spaces. The first five are required.
+MACHINE_SHEET_COLUMNS = [
+    "Machine Name", "Channel ID", "Controller Number", "API Key", "Fields(M1 to M8)",
+    "Mfg Date", "Inst Date", "Customer Name",
+]
+
+def import_machine_rows(rows, progress=None, total_rows=None, batch_size=IMPORT_BATCH_SIZE):
     """
-    if not os.path.exists(file_path):
-        print("Excel file not found:", file_path)
-        return
+    Import fleet rows, one controller of one machine per row. `rows` yields
+    the header row first, then data rows, as sequences of cell values; the
+    Excel, CSV and Parquet importers all feed this. Columns are matched on
+    MACHINE_SHEET_COLUMNS ignoring case and spaces; Mfg Date, Inst Date and
+    Customer Name are optional.
 
-    try:
-        wb = openpyxl.load_workbook(file_path)
-    except Exception as e:
-        print(f"Failed to open Excel file: {e}")
-        return
+    Rows are staged into a temp table, then applied with two set-based
+    upserts in one transaction: new machines are added (existing ones keep
+    their channel and API key) and controllers are inserted or updated, the
+    last row winning for a repeated controller. `progress(rows_read,
+    total_rows)` is called after every staged batch.
 
-    sheet = wb.active
+    Returns {"rows", "imported", "machines", "errors"} where errors is a
+    list of {"row", "machine", "error"} dicts, "row" being the 1-based
+    sheet row number (the header is row 1).
+    """
+    result = {"rows": 0, "imported": 0, "machines": 0, "errors": []}
+    errors = result["errors"]
+    rows = iter(rows)
 
-    try:
-        headers = [str(cell.value).strip() if cell.value is not None else "" for cell in next(sheet.iter_rows(min_row=1, max_row=1))]
-        header_map = {h.lower().replace(" ", ""): i for i, h in enumerate(headers)}
-    except Exception as e:
-        print(f"Error reading headers: {e}")
-        return
+    headers = [_cell_text(value) for value in next(rows, ())]
+    header_map = {h.lower().replace(" ", ""): i for i, h in enumerate(headers)}
 
     # Prepare all required headers, match ignoring case AND spaces
     def colidx(colname):
-        key = colname.lower().replace(" ", "")
-        return header_map[key] if key in header_map else None
+        return header_map.get(colname.lower().replace(" ", ""))
 
-    required_columns = [
-        "machine name", "channel id", "controller number", "api key", "fields(m1 to m8)"
-    ]
+    required_columns = [col.lower() for col in MACHINE_SHEET_COLUMNS[:5]]
     missing_cols = [col for col in required_columns if colidx(col) is None]
     if missing_cols:
-        print(f"Missing required columns in Excel: {missing_cols}")
-        print(f"Found columns: {headers}")
-        return
+        errors.append({
+            "row": 1,
+            "machine": "",
+            "error": f"Missing required columns: {missing_cols} (found: {headers})",
+        })
+        return result
 
-    machine_idx   = colidx("machine name")
-    channel_idx   = colidx("channel id")
-    ctrl_num_idx  = colidx("controller number")
-    api_idx       = colidx("api key")
-    fieldno_idx   = colidx("fields(m1 to m8)")
+    columns = [colidx(col) for col in required_columns]
+    optional = [colidx(col) for col in MACHINE_SHEET_COLUMNS[5:]]
 
-    mfg_date_idx    = colidx("mfg date")
-    inst_date_idx   = colidx("inst date")
-    customer_idx    = colidx("customer name")
-
-    with sqlite3.connect(DB_NAME) as conn:
+    with _connect() as conn:
         cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS excel_import (
+                row_no INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                channel_id TEXT NOT NULL,
+                api_key TEXT NOT NULL,
+                controller TEXT NOT NULL,
+                controller_no TEXT NOT NULL,
+                mfg_date TEXT,
+                inst_date TEXT,
+                customer_name TEXT
+            )
+        """)
+        cursor.execute("DELETE FROM excel_import")
 
-        for row in sheet.iter_rows(min_row=2, values_only=True):
+        batch = []
+        for row_no, row in enumerate(rows, start=2):
+            if not any(value is not None and str(value).strip() for value in row):
+                continue  # skip blank rows
+            result["rows"] += 1
+            values = [_cell_text(row[i]) if i < len(row) else "" for i in columns]
+            name, channel_id, controller_no, api_key, field_no = values
+            missing = [col for col, value in zip(required_columns, values) if not value]
+            if missing:
+                errors.append({"row": row_no, "machine": name, "error": f"Missing {', '.join(missing)}"})
+                continue
             try:
-                name         = str(row[machine_idx]).strip()   if row[machine_idx]   else ""
-                channel_id   = str(row[channel_idx]).strip()   if row[channel_idx]   else ""
-                controller_no= str(row[ctrl_num_idx]).strip()  if row[ctrl_num_idx]  else ""
-                api_key      = str(row[api_idx]).strip()       if row[api_idx]       else ""
-                field_no     = str(row[fieldno_idx]).strip()   if row[fieldno_idx]   else ""
+                slot = int(float(field_no))
+            except (ValueError, OverflowError):
+                slot = 0
+            if not 1 <= slot <= 8:
+                errors.append({"row": row_no, "machine": name, "error": f"Field must be 1 to 8, got {field_no!r}"})
+                continue
 
-                mfg_date     = str(row[mfg_date_idx]).strip()  if (mfg_date_idx is not None and row[mfg_date_idx])   else "N/A"
-                inst_date    = str(row[inst_date_idx]).strip() if (inst_date_idx is not None and row[inst_date_idx]) else "N/A"
-                customer_name= str(row[customer_idx]).strip()  if (customer_idx is not None and row[customer_idx])  else "N/A"
+            mfg_date, inst_date, customer_name = (
+                (_cell_text(row[i]) if i is not None and i < len(row) else "") or "N/A" for i in optional
+            )
+            batch.append((row_no, name, channel_id, api_key, f"M{slot}", controller_no,
+                          mfg_date, inst_date, customer_name))
+            if len(batch) >= batch_size:
+                cursor.executemany("INSERT INTO excel_import VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+                batch = []
+                if progress:
+                    progress(result["rows"], total_rows)
+        if batch:
+            cursor.executemany("INSERT INTO excel_import VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
 
-                if not (name and channel_id and controller_no and api_key and field_no):
-                    continue  # skip incomplete rows
+        # First row of a machine supplies its channel and API key
+        cursor.execute("""
+            INSERT INTO machines (name, channel_id, api_key)
+            SELECT name, channel_id, api_key FROM excel_import
+            WHERE row_no IN (SELECT MIN(row_no) FROM excel_import GROUP BY name)
+            ON CONFLICT(name) DO NOTHING
+        """)
+        cursor.execute("""
+            INSERT INTO machine_controllers (
+                machine_id, controller, controller_no, mfg_date, inst_date, customer_name
+            )
+            SELECT m.id, e.controller, e.controller_no, e.mfg_date, e.inst_date, e.customer_name
+            FROM excel_import e
+            JOIN machines m ON m.name = e.name
+            WHERE e.row_no IN (SELECT MAX(row_no) FROM excel_import GROUP BY name, controller)
+            ON CONFLICT(machine_id, controller) DO UPDATE SET
+                controller_no = excluded.controller_no,
+                mfg_date = excluded.mfg_date,
+                inst_date = excluded.inst_date,
+                customer_name = excluded.customer_name
+        """)
+        cursor.execute("SELECT COUNT(*), COUNT(DISTINCT name) FROM excel_import")
+        result["imported"], result["machines"] = cursor.fetchone()
+        names = [r[0] for r in cursor.execute("SELECT DISTINCT name FROM excel_import")]
+        cursor.execute("DELETE FROM excel_import")
+        conn.commit()
 
-                controller = f"M{field_no}"  # converts field_no "1" -> M1, etc.
+    if progress:
+        progress(result["rows"], total_rows)
+    _notify_machines_changed(names)
+    return result
 
-                # Insert machine if not exists
-                cursor.execute(
-                    "INSERT OR IGNORE INTO machines (name, channel_id, api_key) VALUES (?, ?, ?)",
-                    (name, channel_id, api_key)
-                )
-                cursor.execute("SELECT id FROM machines WHERE name = ?", (name,))
-                machine_row = cursor.fetchone()
-                if not machine_row:
-                    continue
-                machine_id = machine_row[0]
+def import_machines_from_excel(file_path, progress=None, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Import a fleet sheet from Excel (see import_machine_rows() for the
+    columns and result). The workbook is opened read-only and streamed.
+    """
+    if not os.path.exists(file_path):
+        return {"rows": 0, "imported": 0, "machines": 0,
+                "errors": [{"row": None, "machine": "", "error": f"Excel file not found: {file_path}"}]}
+    try:
+        wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    except Exception as e:
+        return {"rows": 0, "imported": 0, "machines": 0,
+                "errors": [{"row": None, "machine": "", "error": f"Failed to open Excel file: {e}"}]}
 
-                # Insert or update controller info
-                cursor.execute(
-                    "SELECT id FROM machine_controllers WHERE machine_id=? AND controller=?",
-                    (machine_id, controller)
-                )
-                if cursor.fetchone():
-                    cursor.execute("""
-                        UPDATE machine_controllers SET 
-                            controller_no = ?, 
-                            mfg_date = ?, 
-                            inst_date = ?, 
-                            customer_name = ?
-                        WHERE machine_id=? AND controller=?
-                        """,
-                        (controller_no, mfg_date, inst_date, customer_name, machine_id, controller)
-                    )
-                else:
-                    cursor.execute("""
-                        INSERT INTO machine_controllers (
-                            machine_id, controller, controller_no, mfg_date, inst_date, customer_name
-                        ) VALUES (?, ?, ?, ?, ?, ?)
-                    """, (machine_id, controller, controller_no, mfg_date, inst_date, customer_name))
-            except Exception as row_e:
-                print(f"Failed to process row {row}: {row_e}")
+    try:
+        sheet = wb.active
+        total_rows = sheet.max_row - 1 if sheet.max_row else None
+        return import_machine_rows(sheet.iter_rows(values_only=True), progress, total_rows, batch_size)
+    finally:
+        wb.close()
+
+def iter_machine_sheet_rows():
+    """Yield the fleet as MACHINE_SHEET_COLUMNS rows, one per controller, for the exporters."""
+    # A bare cursor, not `with conn:`: a caller stopping early must not roll
+    # back whatever else is pending on this thread's shared connection
+    cursor = _connect().cursor()
+    try:
+        cursor.execute("""
+            SELECT m.name, m.channel_id, mc.controller_no, m.api_key, mc.controller,
+                   mc.mfg_date, mc.inst_date, mc.customer_name
+            FROM machines m
+            LEFT JOIN machine_controllers mc ON mc.machine_id = m.id
+            ORDER BY m.name, mc.controller
+        """)
+        for name, channel_id, controller_no, api_key, controller, mfg_date, inst_date, customer_name in cursor:
+            field_no = int(controller[1:]) if controller and controller[1:].isdigit() else ""
+            yield (name, channel_id, controller_no or "", api_key, field_no,
+                   mfg_date or "", inst_date or "", customer_name or "")
+    finally:
+        cursor.close()
+
+def iter_fault_log_chunks(start_ts, end_ts, machine_ids=None, controllers=None, chunk_size=50000):
+    """
+    Yield lists of (ts, machine_id, controller, raw_value, fault_code) rows
+    with start_ts <= ts < end_ts, oldest first, `chunk_size` rows at a time.
+    The filters run in SQLite on the fault_logs indexes. raw_value is the
+    signed form stored by to_signed64().
+    """
+    query = """
+        SELECT ts, machine_id, controller, raw_value, fault_code
+        FROM fault_logs
+        WHERE ts >= ? AND ts < ?
+    """
+    params = [start_ts, end_ts]
+    if machine_ids is not None:
+        machine_ids = list(machine_ids)
+        query += f" AND machine_id IN ({','.join('?' * len(machine_ids))})"
+        params += machine_ids
+    if controllers is not None:
+        controllers = list(controllers)
+        query += f" AND controller IN ({','.join('?' * len(controllers))})"
+        params += controllers
+    query += " ORDER BY ts"
+
+    # Bare cursor for the same reason as iter_machine_sheet_rows()
+    cursor = _connect().cursor()
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+def write_import_error_report(errors, path):
+    """Write import errors as CSV (row, machine, error)."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["row", "machine", "error"])
+        writer.writeheader()
+        writer.writerows(errors)
+
+def insert_from_excel(file_path):
+    """Import machines from Excel and print a summary. See import_machines_from_excel()."""
+    result = import_machines_from_excel(file_path)
+    for error in result["errors"]:
+        print(f"[WARN] Excel row {error['row']} ({error['machine']}): {error['error']}")
+    print(
+        f"Excel import complete - {result['imported']} controller row(s) for "
+        f"{result['machines']} machine(s), {len(result['errors'])} row(s) skipped."
+    )
+    return result
+
+
+# ----------------------------------------------------------------------
+#           Fault events
+# ----------------------------------------------------------------------
+
+def save_fault_events(rows, conn=None):
+    """
+    Apply fault code transitions to fault_events. Rows are (ts, machine_id,
+    controller, fault_code) for logged rows whose code differs from the
+    previous row of that controller, in log order: the controller's active
+    event for another code ends at ts and, for a non-zero code, a new one
+    starts. Applying a row twice changes nothing.
+    When `conn` is given the caller owns the transaction and commits it.
+    """
+    if conn is None:
+        with _connect() as conn:
+            save_fault_events(rows, conn)
+            conn.commit()
+        return
+    for ts, machine_id, controller, fault_code in rows:
+        conn.execute("""
+            UPDATE fault_events SET end_ts = ?, duration = ? - start_ts
+            WHERE machine_id = ? AND controller = ? AND end_ts IS NULL AND fault_code != ?
+        """, (ts, ts, machine_id, controller, fault_code))
+        if fault_code:
+            conn.execute("""
+                INSERT OR IGNORE INTO fault_events (machine_id, controller, fault_code, start_ts)
+                VALUES (?, ?, ?, ?)
+            """, (machine_id, controller, fault_code, ts))
+
+def has_pending_fault_event_backfill():
+    with _connect() as conn:
+        return conn.execute("SELECT 1 FROM fault_events_backfill LIMIT 1").fetchone() is not None
+
+def queue_fault_event_backfill(machine_ids=None):
+    """Mark machines (every machine with fault logs by default) for backfill_fault_events()."""
+    with _connect() as conn:
+        if machine_ids is None:
+            conn.execute("INSERT OR IGNORE INTO fault_events_backfill SELECT DISTINCT machine_id FROM fault_logs")
+        else:
+            conn.executemany("INSERT OR IGNORE INTO fault_events_backfill (machine_id) VALUES (?)",
+                             [(machine_id,) for machine_id in machine_ids])
+        conn.commit()
+
+def _rebuild_machine_events(conn, machine_id):
+    """
+    Replace a machine's fault_events from its fault_logs rows. Events from
+    before the oldest row still in fault_logs (archived history) are kept,
+    and one still running at that row is carried on.
+    """
+    rows = conn.execute("""
+        SELECT controller, ts, fault_code FROM fault_logs
+        WHERE machine_id = ?
+        ORDER BY controller, ts, id
+    """, (machine_id,)).fetchall()
+    events = []
+    for controller, group in groupby(rows, key=lambda row: row[0]):
+        group = list(group)
+        first_ts = group[0][1]
+        carry = conn.execute("""
+            SELECT fault_code, start_ts FROM fault_events
+            WHERE machine_id = ? AND controller = ? AND start_ts < ? AND (end_ts IS NULL OR end_ts >= ?)
+            ORDER BY start_ts DESC LIMIT 1
+        """, (machine_id, controller, first_ts, first_ts)).fetchone()
+        conn.execute("""
+            DELETE FROM fault_events
+            WHERE machine_id = ? AND controller = ? AND (start_ts >= ? OR end_ts IS NULL OR end_ts >= ?)
+        """, (machine_id, controller, first_ts, first_ts))
+
+        code, since = group[0][2], first_ts
+        if carry is not None:
+            if carry[0] == code:
+                since = carry[1]
+            else:
+                events.append((machine_id, controller, carry[0], carry[1], first_ts, first_ts - carry[1]))
+        for _, ts, fault_code in group[1:]:
+            if fault_code != code:
+                if code:
+                    events.append((machine_id, controller, code, since, ts, ts - since))
+                code, since = fault_code, ts
+        if code:
+            events.append((machine_id, controller, code, since, None, None))
+
+    conn.executemany("""
+        INSERT INTO fault_events (machine_id, controller, fault_code, start_ts, end_ts, duration)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, events)
+    return len(events)
+
+def backfill_fault_events(pause=0.05):
+    """
+    Rebuild fault_events for the machines queued in fault_events_backfill,
+    one machine per transaction, from the fault_code column of fault_logs
+    (nothing is decoded). Safe to run while the log writer keeps adding
+    events, and resumes where it stopped. Returns the number of events written.
+    """
+    machines = written = 0
+    while True:
+        with _connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT machine_id FROM fault_events_backfill ORDER BY machine_id LIMIT 1").fetchone()
+            if row is None:
+                if machines:
+                    print(f"[MIGRATE] fault_events backfill complete: {written} event(s) for {machines} machine(s).")
+                return written
+            written += _rebuild_machine_events(conn, row[0])
+            conn.execute("DELETE FROM fault_events_backfill WHERE machine_id = ?", (row[0],))
+        machines += 1
+        # Give the log writer a chance at the write lock between machines
+        time.sleep(pause)
+
+def finish_history_migrations():
+    """Background work left by a schema upgrade: the legacy fault_logs copy, then the fault_events backfill."""
+    migrate_legacy_fault_logs()
+    backfill_fault_events()
+
+def has_pending_history_migrations():
+    return has_legacy_fault_logs() or has_pending_fault_event_backfill()
+
+def _event_filters(machine_ids, controllers):
+    clauses, params = "", []
+    if machine_ids is not None:
+        machine_ids = list(machine_ids)
+        clauses += f" AND machine_id IN ({','.join('?' * len(machine_ids))})"
+        params += machine_ids
+    if controllers is not None:
+        controllers = list(controllers)
+        clauses += f" AND controller IN ({','.join('?' * len(controllers))})"
+        params += controllers
+    return clauses, params
+
+def fetch_fault_events(start_ts, end_ts, machine_ids=None, controllers=None):
+    """
+    (machine_id, controller, fault_code, start_ts, end_ts, duration) events
+    overlapping [start_ts, end_ts), oldest first. end_ts and duration are
+    None for faults that are still active.
+    """
+    clauses, params = _event_filters(machine_ids, controllers)
+    with _connect() as conn:
+        return conn.execute(f"""
+            SELECT machine_id, controller, fault_code, start_ts, end_ts, duration
+            FROM fault_events
+            WHERE start_ts < ? AND (end_ts IS NULL OR end_ts > ?){clauses}
+            ORDER BY start_ts
+        """, [end_ts, start_ts] + params).fetchall()
+
+def fault_event_stats(start_ts, end_ts=None, machine_ids=None, controllers=None, now=None):
+    """
+    Fault frequency, MTTR and uptime per controller over [start_ts, end_ts)
+    (end_ts None = now), straight from fault_events. Returns
+    {(machine_id, controller): {"events", "fault_seconds", "mttr", "uptime",
+    "codes": {fault_code: {"events", "seconds", "mttr"}}}} where events counts
+    faults entered in the range, seconds is time in the fault clipped to the
+    range and mttr is the mean duration of faults that ended in the range
+    (None when none did).
+    """
+    now = int(now or time.time())
+    end_ts = min(end_ts, now) if end_ts is not None else now
+    clauses, params = _event_filters(machine_ids, controllers)
+    with _connect() as conn:
+        rows = conn.execute(f"""
+            SELECT machine_id, controller, fault_code,
+                   SUM(start_ts >= ?),
+                   SUM(MIN(COALESCE(end_ts, ?), ?) - MAX(start_ts, ?)),
+                   COALESCE(SUM(end_ts >= ? AND end_ts < ?), 0),
+                   COALESCE(SUM(CASE WHEN end_ts >= ? AND end_ts < ? THEN duration END), 0)
+            FROM fault_events
+            WHERE start_ts < ? AND (end_ts IS NULL OR end_ts > ?){clauses}
+            GROUP BY machine_id, controller, fault_code
+        """, [start_ts, now, end_ts, start_ts, start_ts, end_ts, start_ts, end_ts, end_ts, start_ts]
+             + params).fetchall()
+
+    span = max(1, end_ts - start_ts)
+    stats = {}
+    repairs = {}
+    for machine_id, controller, fault_code, events, seconds, repaired, repair_seconds in rows:
+        key = (machine_id, controller)
+        entry = stats.setdefault(key, {"events": 0, "fault_seconds": 0, "mttr": None, "uptime": 1.0, "codes": {}})
+        entry["codes"][fault_code] = {
+            "events": events, "seconds": seconds, "mttr": repair_seconds / repaired if repaired else None,
+        }
+        entry["events"] += events
+        entry["fault_seconds"] += seconds
+        total = repairs.setdefault(key, [0, 0])
+        total[0] += repaired
+        total[1] += repair_seconds
+    for key, entry in stats.items():
+        repaired, repair_seconds = repairs[key]
+        entry["mttr"] = repair_seconds / repaired if repaired else None
+        entry["uptime"] = max(0.0, 1.0 - entry["fault_seconds"] / span)
+    return stats
+
+
+# ----------------------------------------------------------------------
+#           Collector lease & live state
+# ----------------------------------------------------------------------
+
+def acquire_collector_lease(owner, pid, lease_seconds, now=None):
+    """
+    Become (or stay) the running collector. Succeeds when `owner` already
+    holds the lease or the last heartbeat is older than `lease_seconds`.
+    """
+    now = now or time.time()
+    with _connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        cursor = conn.execute("""
+            UPDATE collector_status
+            SET owner = ?, pid = ?, heartbeat = ?,
+                started = CASE WHEN owner = ? THEN started ELSE ? END
+            WHERE id = 1 AND (owner IS NULL OR owner = ? OR heartbeat < ?)
+        """, (owner, pid, now, owner, now, owner, now - lease_seconds))
+        acquired = cursor.rowcount == 1
+    return acquired
 
+def release_collector_lease(owner):
+    with _connect() as conn:
+        conn.execute("UPDATE collector_status SET owner = NULL, heartbeat = 0 WHERE id = 1 AND owner = ?", (owner,))
         conn.commit()
-    print("Excel import complete - all controllers and machines successfully imported.")
+
+def load_collector_status():
+    """The collector_status row as a dict; stats stay JSON text."""
+    with _connect() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        row = cursor.execute("SELECT * FROM collector_status WHERE id = 1").fetchone()
+    return dict(row) if row else None
+
+def publish_live_state(owner, rows, generation, stats_json, now=None):
+    """
+    Upsert live_state rows (machine_id, name, raw, fault_code, genset_on,
+    has_data, updated, stale), drop rows of deleted machines and refresh
+    the heartbeat, in one transaction. Returns False when `owner` has lost
+    the lease, in which case nothing is written.
+    """
+    now = now or time.time()
+    with _connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE collector_status SET heartbeat = ?, generation = ?, stats = ?
+            WHERE id = 1 AND owner = ?
+        """, (now, generation, stats_json, owner))
+        if cursor.rowcount != 1:
+            conn.rollback()
+            return False
+        cursor.executemany("""
+            INSERT OR REPLACE INTO live_state
+                (machine_id, name, raw, fault_code, genset_on, has_data, updated, stale, version)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [row + (generation,) for row in rows])
+        cursor.execute("DELETE FROM live_state WHERE machine_id NOT IN (SELECT id FROM machines)")
+        conn.commit()
+    return True
+
+def load_live_state(since_version=0):
+    """live_state rows written after `since_version`, with their version last."""
+    with _connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT machine_id, name, raw, fault_code, genset_on, has_data, updated, stale, version
+            FROM live_state WHERE version > ?
+        """, (since_version,))
+        return cursor.fetchall()
+
+
+if __name__ == "__main__":
+    # Run the schema migrations without starting the GUI:
+    #   python Db_handler.py                         finish pending migrations
+    #   python Db_handler.py --rebuild-fault-events  recompute fault_events for every machine
+    import sys
+
+    init_db()
+    if "--rebuild-fault-events" in sys.argv[1:]:
+        queue_fault_event_backfill()
+    finish_history_migrations()
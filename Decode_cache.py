@@ -0,0 +1,67 @@
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+
+
+class DecodeCache:
+    """
+    Bounded LRU cache of decoded controller words, keyed on the integer raw
+    value. Controllers only ever report a few hundred distinct words, so
+    nearly every decode after warm-up is a dictionary lookup.
+
+    Results are read-only mappings shared between all callers; copy one with
+    dict() before changing it. Failed decodes are not cached.
+    """
+
+    def __init__(self, decode_fn, maxsize=4096):
+        self.decode_fn = decode_fn
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, value):
+        with self.lock:
+            result = self.entries.get(value)
+            if result is not None:
+                self.entries.move_to_end(value)
+                self.hits += 1
+                return result
+            self.misses += 1
+
+        # Decode outside the lock; two threads missing on the same word just both decode it
+        result = MappingProxyType(dict(self.decode_fn(value)))
+
+        with self.lock:
+            self.entries[value] = result
+            self.entries.move_to_end(value)
+            self._evict()
+        return result
+
+    def resize(self, maxsize):
+        with self.lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _evict(self):
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,182 @@
+"""
+Per-machine detail windows (M1 to M8 decoded fields plus the report panel).
+
+The widgets of a window are built once. On every refresh only the labels
+whose text or colour actually changed are reconfigured, so keeping many
+detail windows open does not rebuild thousands of Tk widgets per sweep.
+"""
+import tkinter as tk
+
+SLOTS = 8
+
+
+class LabelBinding:
+    """A Label plus the text/fg last pushed to it; set() only touches Tk on a change."""
+
+    def __init__(self, label, text="", fg="black"):
+        self.label = label
+        self.text = text
+        self.fg = fg
+
+    def set(self, text, fg=None):
+        fg = fg or self.fg
+        if text != self.text or fg != self.fg:
+            self.label.config(text=text, fg=fg)
+            self.text = text
+            self.fg = fg
+
+
+class ControllerSection:
+    """LabelFrame for one controller, with one bound label per decoded field."""
+
+    def __init__(self, parent, title):
+        self.frame = tk.LabelFrame(
+            parent,
+            text=title,
+            font=("Arial", 10, "bold"),
+            padx=5,
+            pady=5,
+            bg="white",
+            fg="black",
+        )
+        self.frame.pack(fill="x", expand=True, padx=10, pady=5)
+        self.title = LabelBinding(self.frame, title)
+        self.no_data = tk.Label(
+            self.frame,
+            text="No data",
+            font=("Arial", 9, "italic"),
+            bg="white",
+            fg="gray",
+        )
+        self.fields = {}
+        self.decoded = None
+        self.showing_no_data = False
+
+    def update(self, title, decoded):
+        self.title.set(title)
+        # Decoded results are shared per raw value, so an unchanged controller is the same object
+        if decoded is self.decoded and self.decoded is not None:
+            return
+        self.decoded = decoded
+
+        if not decoded:
+            for binding in self.fields.values():
+                binding.label.pack_forget()
+            if not self.showing_no_data:
+                self.no_data.pack(anchor="w")
+                self.showing_no_data = True
+            return
+
+        if self.showing_no_data:
+            self.no_data.pack_forget()
+            self.showing_no_data = False
+
+        for key, binding in list(self.fields.items()):
+            if key not in decoded:
+                binding.label.destroy()
+                del self.fields[key]
+
+        for key, val in decoded.items():
+            fg_color = "red" if key == "Fault Code" else "black"
+            display_text = f"{key}: {val}"
+            binding = self.fields.get(key)
+            if binding is None:
+                label = tk.Label(
+                    self.frame,
+                    text=display_text,
+                    font=("Arial", 9),
+                    bg="white",
+                    fg=fg_color,
+                    anchor="w",
+                )
+                binding = self.fields[key] = LabelBinding(label, display_text, fg_color)
+            else:
+                binding.set(display_text, fg_color)
+            if not binding.label.winfo_manager():
+                binding.label.pack(fill="x")
+
+
+class MachineDetailWindow:
+    """
+    Toplevel showing M1 to M8 of one machine. `get_fields(name, slot)`
+    returns the decoded fields of a controller (falsy for no data) and
+    `on_report(vm_name)` opens a report for the picked controller.
+    """
+
+    def __init__(self, root, machine_name, get_fields, on_report, on_close=None):
+        self.machine_name = machine_name
+        self.get_fields = get_fields
+        self.on_close = on_close
+
+        self.win = tk.Toplevel(root)
+        self.win.title(f"Details for {machine_name}")
+        self.win.geometry("800x600")
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+
+        # Left Scrollable Frame
+        container = tk.Frame(self.win, bg="white")
+        container.pack(side="left", fill="both", expand=True)
+        canvas = tk.Canvas(container, bg="white")
+        scrollbar = tk.Scrollbar(container, orient="vertical", command=canvas.yview)
+        scrollable_frame = tk.Frame(canvas, bg="white")
+
+        scrollable_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
+        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
+        canvas.configure(yscrollcommand=scrollbar.set)
+        canvas.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        self.sections = [
+            ControllerSection(scrollable_frame, f"{machine_name} - M{vm}") for vm in range(1, SLOTS + 1)
+        ]
+
+        # Report section (right)
+        right_frame = tk.Frame(self.win, bg="white")
+        right_frame.pack(side="right", fill="y", padx=20, pady=20)
+        tk.Label(
+            right_frame,
+            text="Select the Machine",
+            font=("Arial", 11, "bold"),
+            bg="white",
+            anchor="w",
+        ).pack(pady=(0, 10))
+        selected_vm = tk.StringVar()
+        vm_options = [f"{machine_name} M{vm}" for vm in range(1, SLOTS + 1)]
+        vm_dropdown = tk.OptionMenu(right_frame, selected_vm, *vm_options)
+        vm_dropdown.config(font=("Arial", 10), bg="#e0e0e0")
+        vm_dropdown.pack(pady=(0, 20))
+
+        def on_generate_report():
+            vm_name = selected_vm.get().strip()
+            if vm_name:
+                on_report(vm_name)
+
+        tk.Button(
+            right_frame,
+            text="Generate Report",
+            font=("Arial", 10, "bold"),
+            bg="#2196F3",
+            fg="white",
+            command=on_generate_report,
+        ).pack()
+
+    def refresh(self, stale=False):
+        """Push the current decoded fields into the window, touching only changed labels."""
+        suffix = " (stale)" if stale else ""
+        for slot, section in enumerate(self.sections):
+            section.update(f"{self.machine_name} - M{slot + 1}{suffix}", self.get_fields(self.machine_name, slot))
+
+    def exists(self):
+        try:
+            return bool(self.win.winfo_exists())
+        except tk.TclError:
+            return False
+
+    def lift(self):
+        self.win.lift()
+        self.win.focus_force()
+
+    def close(self):
+        if self.on_close:
+            self.on_close(self.machine_name)
+        self.win.destroy()
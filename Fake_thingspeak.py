@@ -0,0 +1,136 @@
+"""
+Local stand-in for the ThingSpeak feeds API, for exercising the pollers
+without touching api.thingspeak.com.
+
+    python Fake_thingspeak.py --port 8765 --latency 0.2
+
+then set Thingspeak_api.THINGSPEAK_URL = "http://127.0.0.1:8765".
+Every channel id is accepted; field values are random 64-bit words. A
+request gets a new entry with probability `update_rate`, otherwise the
+channel's last response again, with an ETag that If-None-Match is checked
+against.
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeThingSpeakServer:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, failure_rate=0.0, empty_rate=0.0, update_rate=1.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.empty_rate = empty_rate
+        self.update_rate = update_rate
+        self.request_count = 0
+        self.not_modified_count = 0
+        self.channel_bodies = {}
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, so the pollers' connection reuse can be observed
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                with server.lock:
+                    server.request_count += 1
+                if server.latency:
+                    time.sleep(server.latency)
+
+                parts = self.path.split("?")[0].strip("/").split("/")
+                if len(parts) != 3 or parts[0] != "channels" or parts[2] != "feeds.json":
+                    self._send(404, {"error": "not found"})
+                    return
+                if random.random() < server.failure_rate:
+                    self._send(503, {"error": "unavailable"})
+                    return
+
+                channel = parts[1]
+                with server.lock:
+                    body = server.channel_bodies.get(channel)
+                if body is None or random.random() < server.update_rate:
+                    feeds = []
+                    if random.random() >= server.empty_rate:
+                        feed = {
+                            "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                            "entry_id": server.request_count,
+                        }
+                        for i in range(1, 9):
+                            feed[f"field{i}"] = str(random.getrandbits(64))
+                        feeds.append(feed)
+                    payload = {"channel": {"id": int(channel) if channel.isdigit() else channel}, "feeds": feeds}
+                    body = json.dumps(payload).encode("utf-8")
+                    with server.lock:
+                        server.channel_bodies[channel] = body
+
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if self.headers.get("If-None-Match") == etag:
+                    with server.lock:
+                        server.not_modified_count += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self._send(200, body=body, etag=etag)
+
+            def _send(self, status, payload=None, body=None, etag=None):
+                if body is None:
+                    body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake ThingSpeak feeds server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to delay each response")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--empty-rate", type=float, default=0.0, help="fraction of channels with no feeds")
+    parser.add_argument("--update-rate", type=float, default=1.0, help="fraction of requests that get a new entry")
+    args = parser.parse_args()
+
+    fake = FakeThingSpeakServer(args.host, args.port, args.latency, args.failure_rate, args.empty_rate,
+                                args.update_rate)
+    print(f"[FAKE] ThingSpeak feeds API on {fake.url}")
+    try:
+        fake.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fake.httpd.server_close()
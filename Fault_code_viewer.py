@@ -1,5 +1,7 @@
 import tkinter as tk
 
+from Virtual_list import VirtualListbox
+
 # Fault code to error title from Excel
 fault_code_mapping = {
     0: 'Secondary Voltage Below Desired Level',
@@ -70,6 +72,9 @@ def show_fault_detail_frame(detail_frame, category):
     if not data:
         tk.Label(detail_frame, text="No fault data found.", font=("Arial", 10), bg="white").pack()
     else:
-        for item in data:
-            text = f"Machine: {item['machine']}, Field: {item['field_no']}, Code: {item['code']}"
-            tk.Label(detail_frame, text=text, anchor="w", font=("Arial", 10), bg="white").pack(fill="x", padx=10)
+        # One canvas-backed list instead of a Label per fault row
+        fault_list = VirtualListbox(detail_frame, width=60, height=20, font=("Arial", 10))
+        fault_list.pack(fill="both", expand=True, padx=10)
+        fault_list.insert(tk.END, *(
+            f"Machine: {item['machine']}, Field: {item['field_no']}, Code: {item['code']}" for item in data
+        ))
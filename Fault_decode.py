@@ -0,0 +1,56 @@
+"""Helpers for turning raw 64-bit controller words into decoded fields."""
+from data_decoder import decode_hex_data
+from Decode_cache import DecodeCache
+
+# Distinct raw words kept decoded; resize with decode_cache.resize()
+DECODE_CACHE_SIZE = 4096
+
+
+def to_hex_word(value):
+    """Format a raw controller value as the 16-digit hex word data_decoder expects."""
+    return hex(value & 0xFFFFFFFFFFFFFFFF)[2:].zfill(16).upper()
+
+
+def parse_fault_code(code_val):
+    """Fault Code comes back from data_decoder as '0b...' text or a number."""
+    try:
+        return int(code_val, 2) if str(code_val).startswith("0b") else int(code_val)
+    except Exception:
+        return 0
+
+
+def _decode_uncached(value):
+    return decode_hex_data(to_hex_word(value))
+
+
+decode_cache = DecodeCache(_decode_uncached, DECODE_CACHE_SIZE)
+
+
+def decode_raw_value(value):
+    """
+    Decode a raw controller value into data_decoder's fields. The result is
+    a shared read-only mapping from decode_cache.
+    """
+    return decode_cache.get(value & 0xFFFFFFFFFFFFFFFF)
+
+
+def fault_code_of(value):
+    """Return just the fault code of a raw controller value."""
+    try:
+        return parse_fault_code(decode_raw_value(value).get("Fault Code", 0))
+    except Exception:
+        return 0
+
+
+def genset_on_of(value):
+    """True when a raw controller value reports the genset ON signal."""
+    try:
+        return str(decode_raw_value(value).get("Genset Signal", "")).upper() == "ON"
+    except Exception:
+        return False
+
+
+def decode_history(rows):
+    """Decode (ts, raw_value, ...) history rows into (ts, fields) pairs through the cache."""
+    for row in rows:
+        yield row[0], decode_raw_value(row[1])
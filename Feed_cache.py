@@ -0,0 +1,150 @@
+"""
+Per-channel response validators and a short-lived response cache, so an
+unchanged channel is neither downloaded nor parsed again.
+
+After each successful fetch the channel keeps the query it answered, its
+ETag and Last-Modified headers, the body size and a digest of the body:
+
+  - a channel fetched less than `ttl` seconds ago is not requested at all
+  - otherwise the validators go out as If-None-Match / If-Modified-Since,
+    and a 304 costs no body
+  - a 200 whose body is byte-for-byte the last one is not JSON-parsed
+
+In all three cases the poll engine hands NOT_MODIFIED to the result handler
+instead of a feeds list, and decoding, logging and UI updates are skipped.
+Validators only apply to the same query; a moved feed cursor is a new query.
+
+ThingSpeak has no endpoint that reads several channels in one request, so
+channels are still fetched one by one (over pooled connections).
+"""
+import hashlib
+import json
+import threading
+import time
+
+# Passed to on_result() in place of a feeds list when a channel has not changed
+NOT_MODIFIED = object()
+
+
+def _params_key(params):
+    return tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+
+
+class ChannelValidators:
+    def __init__(self, params_key):
+        self.params_key = params_key
+        self.etag = None
+        self.last_modified = None
+        self.digest = None
+        self.body_bytes = 0
+        self.fetched_at = 0.0
+
+
+class FeedCache:
+    def __init__(self, ttl=10):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.channels = {}
+        self.cycle = self._empty_stats()
+        self.totals = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats():
+        return {
+            "requests": 0,
+            "not_modified": 0,
+            "same_body": 0,
+            "ttl_hits": 0,
+            "bytes_received": 0,
+            "bytes_saved": 0,
+            "skipped_decodes": 0,
+        }
+
+    def _count(self, key, amount=1):
+        self.cycle[key] += amount
+        self.totals[key] += amount
+
+    # ------------------------------------------------------------------
+    #           Request side
+    # ------------------------------------------------------------------
+
+    def cached(self, channel_id, params, now=None):
+        """True when the same query for this channel was answered within ttl seconds."""
+        now = now or time.monotonic()
+        with self.lock:
+            v = self.channels.get(str(channel_id))
+            if v is None or v.params_key != _params_key(params) or now - v.fetched_at >= self.ttl:
+                return False
+            self._count("ttl_hits")
+            self._count("bytes_saved", v.body_bytes)
+            return True
+
+    def request_headers(self, channel_id, params):
+        """Conditional request headers for the channel's last response to the same query."""
+        with self.lock:
+            self._count("requests")
+            v = self.channels.get(str(channel_id))
+            if v is None or v.params_key != _params_key(params):
+                return {}
+            headers = {}
+            if v.etag:
+                headers["If-None-Match"] = v.etag
+            if v.last_modified:
+                headers["If-Modified-Since"] = v.last_modified
+            return headers
+
+    # ------------------------------------------------------------------
+    #           Response side
+    # ------------------------------------------------------------------
+
+    def read_response(self, channel_id, params, status, headers, body, now=None):
+        """
+        Feeds list of a 200 or 304 response, or NOT_MODIFIED when the channel
+        has not changed since its last response to the same query. Raises
+        ValueError for a body that is not JSON.
+        """
+        now = now or time.monotonic()
+        channel_id = str(channel_id)
+        key = _params_key(params)
+        with self.lock:
+            v = self.channels.get(channel_id)
+            if status == 304:
+                if v is not None:
+                    v.fetched_at = now
+                    self._count("bytes_saved", v.body_bytes)
+                self._count("not_modified")
+                return NOT_MODIFIED
+
+            self._count("bytes_received", len(body))
+            digest = hashlib.blake2b(body, digest_size=16).digest()
+            if v is not None and v.params_key == key and v.digest == digest:
+                v.fetched_at = now
+                self._count("same_body")
+                return NOT_MODIFIED
+
+        payload = json.loads(body) if body else {}
+        feeds = (payload or {}).get("feeds", [])
+
+        with self.lock:
+            v = self.channels[channel_id] = ChannelValidators(key)
+            v.etag = headers.get("ETag")
+            v.last_modified = headers.get("Last-Modified")
+            v.digest = digest
+            v.body_bytes = len(body)
+            v.fetched_at = now
+        return feeds
+
+    def skipped_decode(self):
+        """Count a poll whose result needed no decoding, logging or UI update."""
+        with self.lock:
+            self._count("skipped_decodes")
+
+    # ------------------------------------------------------------------
+    #           Status
+    # ------------------------------------------------------------------
+
+    def take_cycle_stats(self):
+        """Counters since the previous call, plus the running totals."""
+        with self.lock:
+            cycle, self.cycle = self.cycle, self._empty_stats()
+            return cycle, dict(self.totals)
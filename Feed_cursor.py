@@ -0,0 +1,94 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+from Db_connection import get_connection
+from Db_handler import DB_NAME
+
+# ThingSpeak caps a feeds.json response at 8000 entries
+MAX_RESULTS = 8000
+
+
+def parse_created_at(created_at):
+    """Parse ThingSpeak's UTC 'created_at' (e.g. 2024-05-01T10:15:00Z) into an aware datetime."""
+    return datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+
+
+def to_epoch(created_at):
+    """Convert a feed 'created_at' to the epoch seconds stored in fault_logs.ts."""
+    try:
+        return int(parse_created_at(created_at).timestamp())
+    except Exception:
+        return int(time.time())
+
+
+class FeedCursorStore:
+    """
+    Remembers the last entry_id/created_at seen on each ThingSpeak channel so
+    every poll only asks for entries newer than that.
+
+    Cursors are kept in memory and advanced as soon as a feed is accepted;
+    they are persisted to the feed_cursors table by the log writer in the
+    same transaction as the fault log rows they cover.
+    """
+
+    def __init__(self, db_name=DB_NAME):
+        self.db_name = db_name
+        self.lock = threading.Lock()
+        self.cursors = {}
+        self.load()
+
+    def load(self):
+        with get_connection(self.db_name) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT channel_id, last_entry_id, last_created_at FROM feed_cursors")
+            rows = cursor.fetchall()
+        with self.lock:
+            self.cursors = {str(channel_id): (entry_id, created_at) for channel_id, entry_id, created_at in rows}
+
+    def get(self, channel_id):
+        with self.lock:
+            return self.cursors.get(str(channel_id))
+
+    def request_params(self, channel_id):
+        """
+        Query parameters that limit a feeds.json request to entries after the
+        cursor. A channel without a cursor only fetches its latest entry.
+        """
+        current = self.get(channel_id)
+        if not current or not current[1]:
+            return {"results": 1}
+        # 'start' is inclusive and second-granular, so the last seen entry comes
+        # back again and is dropped by new_entries()
+        start = parse_created_at(current[1]).astimezone(timezone.utc)
+        return {
+            "start": start.strftime("%Y-%m-%d %H:%M:%S"),
+            "timezone": "Etc/UTC",
+            "results": MAX_RESULTS,
+        }
+
+    def new_entries(self, channel_id, feeds):
+        """Return the feeds newer than the cursor, oldest first."""
+        current = self.get(channel_id)
+        last_entry_id = current[0] if current else None
+        fresh = []
+        for feed in feeds or []:
+            try:
+                entry_id = int(feed.get("entry_id"))
+            except (TypeError, ValueError):
+                continue
+            if last_entry_id is None or entry_id > last_entry_id:
+                fresh.append(feed)
+        fresh.sort(key=lambda f: int(f["entry_id"]))
+        return fresh
+
+    def advance(self, channel_id, feed):
+        """Move the in-memory cursor to `feed` and return the row to persist."""
+        entry_id = int(feed["entry_id"])
+        created_at = feed.get("created_at")
+        with self.lock:
+            current = self.cursors.get(str(channel_id))
+            if current and current[0] is not None and current[0] >= entry_id:
+                return None
+            self.cursors[str(channel_id)] = (entry_id, created_at)
+        return (str(channel_id), entry_id, created_at)
@@ -0,0 +1,207 @@
+import threading
+import time
+
+import numpy as np
+
+# Controllers per machine (M1-M8)
+SLOTS = 8
+
+
+class FleetSnapshot:
+    """
+    Read-only copy of the fleet state for the UI. Row i of every array
+    belongs to names[i]; column s to controller M{s+1}. stale[i] is True when
+    machine i was overdue when the snapshot was published, so its values
+    are the last known ones. `generation` counts publishes.
+    """
+
+    def __init__(self, names, machine_ids, raw, fault_code, genset_on, has_data, updated,
+                 stale=None, generation=0):
+        self.names = names
+        self.machine_ids = machine_ids
+        self.index_by_name = {name: i for i, name in enumerate(names)}
+        self.raw = raw
+        self.fault_code = fault_code
+        self.genset_on = genset_on
+        self.has_data = has_data
+        self.updated = updated
+        self.stale = stale if stale is not None else np.ones(len(names), dtype=bool)
+        self.generation = generation
+
+    def __len__(self):
+        return len(self.names)
+
+    def machines_with_code(self, code):
+        """Sorted names of machines with at least one reporting controller on `code`."""
+        rows = ((self.fault_code == code) & self.has_data).any(axis=1)
+        return sorted(self.names[i] for i in np.flatnonzero(rows))
+
+    def machines_by_fault_code(self, codes):
+        return {code: self.machines_with_code(code) for code in codes}
+
+    def faulted_machines(self):
+        """Sorted names of machines with any controller reporting a non-zero fault code."""
+        rows = ((self.fault_code != 0) & self.has_data).any(axis=1)
+        return sorted(self.names[i] for i in np.flatnonzero(rows))
+
+    def genset_counts(self):
+        """(on, off) counts over controllers that have ever reported, using last known values for stale machines."""
+        reported = self.updated > 0
+        on = int((self.genset_on & self.has_data & reported).sum())
+        return on, int(reported.sum()) - on
+
+    def is_stale(self, name):
+        i = self.index_by_name.get(name)
+        return True if i is None else bool(self.stale[i])
+
+    def stale_count(self):
+        return int(self.stale.sum())
+
+    def stale_machines(self):
+        return {self.names[i] for i in np.flatnonzero(self.stale)}
+
+    def controller(self, name, slot):
+        """(has_data, raw_value, fault_code) of controller M{slot+1}, or None for unknown machines."""
+        i = self.index_by_name.get(name)
+        if i is None:
+            return None
+        return bool(self.has_data[i, slot]), int(self.raw[i, slot]), int(self.fault_code[i, slot])
+
+
+class FleetState:
+    """
+    Live state of every controller in the fleet, stored as fixed 8-slot
+    NumPy arrays indexed by machine row instead of per-"name - Mx" dicts.
+
+    Rows are looked up in O(1) by machine name or machine id. The state is
+    double-buffered: poll workers write into the back arrays as results come
+    in, while the UI only ever reads the FleetSnapshot made by the last
+    publish(). Machines keep their last known values until they report
+    again; publish() is told which of them are stale.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.names = []
+        self.machine_ids = np.zeros(0, dtype=np.int64)
+        self.index_by_name = {}
+        self.index_by_id = {}
+        self.generation = 0
+        self._allocate(0)
+        self.published = self._make_snapshot(None)
+
+    def _allocate(self, rows):
+        self.raw = np.zeros((rows, SLOTS), dtype=np.uint64)
+        self.fault_code = np.zeros((rows, SLOTS), dtype=np.uint16)
+        self.genset_on = np.zeros((rows, SLOTS), dtype=bool)
+        self.has_data = np.zeros((rows, SLOTS), dtype=bool)
+        self.updated = np.zeros((rows, SLOTS), dtype=np.float64)
+
+    def _arrays(self):
+        return (self.raw, self.fault_code, self.genset_on, self.has_data, self.updated)
+
+    def sync_machines(self, machines):
+        """
+        Match the rows to `machines` (name -> info with "id"). Machines that
+        are still present keep their current values.
+        """
+        names = list(machines)
+        with self.lock:
+            if names == self.names:
+                return
+            old_index = self.index_by_name
+            old = self._arrays()
+
+            self._allocate(len(names))
+            self.names = names
+            self.machine_ids = np.array([machines[n].get("id", -1) for n in names], dtype=np.int64)
+            self.index_by_name = {name: i for i, name in enumerate(names)}
+            self.index_by_id = {int(mid): i for i, mid in enumerate(self.machine_ids) if mid >= 0}
+
+            keep = [(i, old_index[name]) for i, name in enumerate(names) if name in old_index]
+            if keep:
+                new_rows, old_rows = (list(x) for x in zip(*keep))
+                for new_arr, old_arr in zip(self._arrays(), old):
+                    new_arr[new_rows] = old_arr[old_rows]
+
+    def index_of(self, name):
+        return self.index_by_name.get(name)
+
+    def index_of_id(self, machine_id):
+        return self.index_by_id.get(machine_id)
+
+    # ------------------------------------------------------------------
+    #           Writer side (poll workers)
+    # ------------------------------------------------------------------
+
+    def update_machine(self, name, raw_values, fault_codes, genset_on, has_data, ts=None):
+        """
+        Store all 8 controllers of one machine from a decoded feed. Returns
+        True when a raw value or the has-data flags changed.
+        """
+        ts = ts or time.time()
+        with self.lock:
+            i = self.index_by_name.get(name)
+            if i is None:
+                return False
+            changed = not (np.array_equal(self.raw[i], np.asarray(raw_values, dtype=np.uint64))
+                           and np.array_equal(self.has_data[i], np.asarray(has_data, dtype=bool)))
+            self.raw[i] = raw_values
+            self.fault_code[i] = fault_codes
+            self.genset_on[i] = genset_on
+            self.has_data[i] = has_data
+            self.updated[i] = ts
+            return changed
+
+    def mark_no_data(self, name, ts=None):
+        return self.update_machine(name, 0, 0, False, False, ts)
+
+    def load_rows(self, machine_ids, raw, fault_code, genset_on, has_data, updated):
+        """
+        Overwrite the rows of many machines at once, by machine id, from
+        (n, 8) arrays and an (n,) updated array. Unknown ids are skipped.
+        """
+        with self.lock:
+            pairs = [(k, self.index_by_id.get(int(mid))) for k, mid in enumerate(machine_ids)]
+            pairs = [(k, i) for k, i in pairs if i is not None]
+            if not pairs:
+                return 0
+            src, dst = (list(x) for x in zip(*pairs))
+            self.raw[dst] = raw[src]
+            self.fault_code[dst] = fault_code[src]
+            self.genset_on[dst] = genset_on[src]
+            self.has_data[dst] = has_data[src]
+            self.updated[dst] = np.asarray(updated, dtype=np.float64)[src][:, None]
+            return len(dst)
+
+    # ------------------------------------------------------------------
+    #           Reader side (UI)
+    # ------------------------------------------------------------------
+
+    def _make_snapshot(self, stale_names):
+        if stale_names is None:
+            stale = ~(self.updated > 0).any(axis=1)
+        else:
+            stale = np.zeros(len(self.names), dtype=bool)
+            rows = [self.index_by_name[name] for name in stale_names if name in self.index_by_name]
+            stale[rows] = True
+        return FleetSnapshot(
+            tuple(self.names), self.machine_ids.copy(), self.raw.copy(), self.fault_code.copy(),
+            self.genset_on.copy(), self.has_data.copy(), self.updated.copy(),
+            stale, self.generation,
+        )
+
+    def publish(self, stale_names=None):
+        """
+        Copy the back arrays into a new published snapshot, swapped in
+        atomically. Machines in `stale_names` are flagged stale; without it,
+        only machines that never reported are.
+        """
+        with self.lock:
+            self.generation += 1
+            self.published = self._make_snapshot(stale_names)
+            return self.published
+
+    def snapshot(self):
+        """The last published snapshot. Never half-written by the poll workers."""
+        return self.published
@@ -0,0 +1,81 @@
+"""
+Differential rendering of sorted machine lists into Tk Listboxes.
+
+Rebuilding a Listbox with thousands of rows every sweep blocks the Tk main
+loop. SortedListRenderer keeps a mirror of what the widget shows and, given
+the new set of names, only deletes and inserts the rows that changed, at
+their sorted position. Widget work is proportional to the number of changes,
+not to the number of machines.
+"""
+from bisect import bisect_left
+import tkinter as tk
+
+STALE_FG = "gray"
+FOOTER_SEPARATOR = "-" * 30
+
+
+class SortedListRenderer:
+    """
+    Keeps `listbox` showing a sorted list of names, optionally followed by a
+    "Total: N machine(s)" footer that is updated in place.
+    """
+
+    def __init__(self, listbox, footer=False, fg="black"):
+        self.listbox = listbox
+        self.footer = footer
+        self.fg = fg
+        self.items = []
+        self.stale = set()
+        self.footer_count = None
+        if footer:
+            self.listbox.insert(tk.END, FOOTER_SEPARATOR)
+            self._set_footer(0)
+
+    def render(self, names, stale=()):
+        """
+        Show `names` (any iterable of unique strings). Names in `stale` are
+        drawn grayed out. Returns the number of rows inserted or removed.
+        """
+        new = set(names)
+        old = set(self.items)
+        removed = old - new
+        added = new - old
+
+        # Delete from the bottom up so earlier indexes stay valid
+        for name in sorted(removed, reverse=True):
+            i = bisect_left(self.items, name)
+            del self.items[i]
+            self.listbox.delete(i)
+        self.stale -= removed
+
+        stale_now = new & set(stale)
+        for name in sorted(added):
+            i = bisect_left(self.items, name)
+            self.items.insert(i, name)
+            self.listbox.insert(i, name)
+            if name in stale_now:
+                self.listbox.itemconfig(i, {'fg': STALE_FG})
+
+        # Rows that stayed but went stale or fresh since the last render
+        for name in (stale_now ^ self.stale) - added:
+            i = bisect_left(self.items, name)
+            self.listbox.itemconfig(i, {'fg': STALE_FG if name in stale_now else self.fg})
+        self.stale = stale_now
+
+        if self.footer:
+            self._set_footer(len(self.items))
+        return len(removed) + len(added)
+
+    def _set_footer(self, count):
+        if count == self.footer_count:
+            return
+        last_idx = self.listbox.size() - 1
+        if self.footer_count is not None:
+            self.listbox.delete(last_idx)
+        else:
+            last_idx += 1
+        self.listbox.insert(last_idx, f"Total: {count} machine(s)")
+        # 'Total' टेक्स्ट highlight करा
+        color = 'blue' if count > 0 else 'gray'
+        self.listbox.itemconfig(last_idx, {'fg': color, 'font': ("Arial", 9, "bold")})
+        self.footer_count = count
@@ -0,0 +1,124 @@
+"""
+Live fleet state shared between the collector and any number of GUIs
+through the live_state table.
+
+The collector writes one row per machine whose values or stale flag
+changed since its last publish, stamped with the publish generation. A
+reader keeps its own FleetState and only fetches rows newer than the last
+generation it has seen, so an idle fleet costs one indexed query per
+refresh. When the collector's heartbeat is older than the lease, every
+machine is shown as stale.
+"""
+import json
+import time
+
+import numpy as np
+
+from Db_handler import load_live_state, load_collector_status
+from Fleet_state import FleetState, SLOTS
+
+# A collector that has not published for this long is considered gone
+COLLECTOR_LEASE_SECONDS = 30
+
+_BITS = 1 << np.arange(SLOTS, dtype=np.int64)
+
+
+def encode_rows(snapshot, names):
+    """live_state rows (without version) for `names` from a FleetSnapshot."""
+    rows = []
+    for name in names:
+        i = snapshot.index_by_name.get(name)
+        if i is None or snapshot.machine_ids[i] < 0:
+            continue
+        rows.append((
+            int(snapshot.machine_ids[i]),
+            name,
+            snapshot.raw[i].astype("<u8").tobytes(),
+            snapshot.fault_code[i].astype("<u2").tobytes(),
+            int(_BITS[snapshot.genset_on[i]].sum()),
+            int(_BITS[snapshot.has_data[i]].sum()),
+            float(snapshot.updated[i].max()),
+            int(snapshot.stale[i]),
+        ))
+    return rows
+
+
+def decode_rows(rows):
+    """Column arrays (ids, raw, fault_code, genset_on, has_data, updated, stale) from non-empty live_state rows."""
+    n = len(rows)
+    ids, _, raw, fault, genset, has_data, updated, stale = (list(col) for col in zip(*rows))
+    return (
+        np.array(ids, dtype=np.int64),
+        np.frombuffer(b"".join(raw), dtype="<u8").reshape(n, SLOTS).astype(np.uint64),
+        np.frombuffer(b"".join(fault), dtype="<u2").reshape(n, SLOTS).astype(np.uint16),
+        (np.array(genset, dtype=np.int64)[:, None] & _BITS) != 0,
+        (np.array(has_data, dtype=np.int64)[:, None] & _BITS) != 0,
+        np.array(updated, dtype=np.float64),
+        np.array(stale, dtype=bool),
+    )
+
+
+def collector_alive(status, now=None):
+    now = now or time.time()
+    return bool(status and status.get("owner")) and now - (status.get("heartbeat") or 0) < COLLECTOR_LEASE_SECONDS
+
+
+class LiveStateReader:
+    """GUI side: follows live_state into a local FleetState."""
+
+    def __init__(self):
+        self.fleet = FleetState()
+        self.version = 0
+        self.stale_ids = set()
+        self.seen_ids = set()
+        self.status = None
+        self.stats = {}
+        self.alive = False
+
+    def poll(self, machines):
+        """
+        Pull new rows and the collector status. `machines` is the current
+        registry (name -> info). Returns a new FleetSnapshot when anything
+        changed, else None.
+        """
+        self.fleet.sync_machines(machines)
+        self.status = load_collector_status()
+        alive = collector_alive(self.status)
+        generation = (self.status or {}).get("generation") or 0
+        if generation < self.version:
+            # The database was reset under us; start over
+            self.version = 0
+            self.stale_ids = set()
+            self.seen_ids = set()
+
+        rows = load_live_state(self.version) if generation > self.version else []
+        if rows:
+            ids, raw, fault, genset, has_data, updated, stale = decode_rows([row[:8] for row in rows])
+            self.fleet.load_rows(ids, raw, fault, genset, has_data, updated)
+            self.seen_ids.update(ids.tolist())
+            for machine_id, is_stale in zip(ids.tolist(), stale.tolist()):
+                if is_stale:
+                    self.stale_ids.add(machine_id)
+                else:
+                    self.stale_ids.discard(machine_id)
+        # Rows up to the status generation were committed with it, so none can be missed
+        self.version = max([generation, self.version] + [row[8] for row in rows])
+        if self.status and self.status.get("stats"):
+            try:
+                self.stats = json.loads(self.status["stats"])
+            except ValueError:
+                self.stats = {}
+
+        if not rows and alive == self.alive and self.fleet.published.names == tuple(machines):
+            return None
+        self.alive = alive
+        return self.fleet.publish(self.stale_names(machines))
+
+    def stale_names(self, machines):
+        """Stale per the collector or never published; everything when no collector runs."""
+        if not self.alive:
+            return set(machines)
+        return {
+            name for name, info in machines.items()
+            if info["id"] in self.stale_ids or info["id"] not in self.seen_ids
+        }
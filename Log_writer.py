@@ -0,0 +1,281 @@
+import queue
+import threading
+import time
+from datetime import datetime
+
+from Db_connection import open_connection
+from Db_handler import (
+    DB_NAME, insert_fault_logs, save_feed_cursors, to_signed64,
+    load_fault_log_state, save_fault_log_state, save_channel_breakers, save_fault_events,
+)
+
+# Marker put on the queue to tell the writer thread to drain and exit
+_STOP = object()
+
+
+class LastValueCache:
+    """
+    Last logged raw value per (machine_id, controller), used to log only
+    state changes plus a periodic heartbeat.
+
+    Each entry is [raw_value, since_ts, last_seen_ts, last_logged_ts]: the
+    value has been unchanged from since_ts until at least last_seen_ts.
+    Together with the change/heartbeat rows in fault_logs this is enough to
+    rebuild the value at any point in time.
+    """
+
+    def __init__(self, heartbeat_interval=3600):
+        self.heartbeat_interval = heartbeat_interval
+        self.lock = threading.Lock()
+        self.values = {}
+        self.dirty = set()
+
+    def seed(self, db_name=DB_NAME):
+        rows = load_fault_log_state(db_name)
+        with self.lock:
+            for machine_id, controller, raw_value, since_ts, last_seen_ts, last_logged_ts in rows:
+                self.values[(machine_id, controller)] = [raw_value, since_ts, last_seen_ts, last_logged_ts]
+        print(f"[LOG] Seeded last-value cache with {len(rows)} controller state(s)")
+
+    def record(self, machine_id, controller, raw_value, ts):
+        """Note a polled value. Returns True when it should be written to fault_logs."""
+        key = (machine_id, controller)
+        with self.lock:
+            self.dirty.add(key)
+            state = self.values.get(key)
+            if state is None or state[0] != raw_value:
+                self.values[key] = [raw_value, ts, ts, ts]
+                return True
+            state[2] = max(state[2], ts)
+            if ts - state[3] >= self.heartbeat_interval:
+                state[3] = ts
+                return True
+            return False
+
+    def take_state_rows(self, keys=None):
+        """
+        Pop dirty entries as (machine_id, controller, raw_value, since_ts,
+        last_seen_ts, last_logged_ts) rows. Only `keys` are taken when given.
+        """
+        with self.lock:
+            taken = set(self.dirty) if keys is None else (self.dirty & set(keys))
+            self.dirty -= taken
+            return [(key[0], key[1], *self.values[key]) for key in taken]
+
+    def restore_dirty(self, rows):
+        with self.lock:
+            self.dirty.update((row[0], row[1]) for row in rows if (row[0], row[1]) in self.values)
+
+    def forget(self, keys):
+        """
+        Drop the cached values of `keys`, e.g. after their rows failed to be
+        written, so the next poll of each logs its value again.
+        """
+        with self.lock:
+            for key in keys:
+                self.values.pop(key, None)
+                self.dirty.discard(key)
+
+
+class FaultLogWriter:
+    """
+    Collects fault log rows from the poll workers on a queue and writes them
+    from a single thread over one persistent connection.
+
+    A batch is flushed when it reaches `batch_size` rows or when
+    `flush_interval` seconds have passed since the last flush, whichever
+    comes first. `stop()` flushes whatever is still queued.
+
+    Feed cursor updates travel on the same queue so they are committed in
+    the same transaction as the log rows they cover. Circuit breaker changes
+    ride along too, so the poll workers never write to the database.
+
+    Every logged row whose fault code differs from the previous row of its
+    controller also opens/closes a fault_events row in the same transaction.
+
+    With `change_only` set, a value is only written when it differs from the
+    last one logged for that controller, or when `heartbeat_interval`
+    seconds have passed since the last row. Run-length bookkeeping lives in
+    fault_log_state and is saved with every changed controller, and for all
+    controllers every `state_save_interval` seconds.
+    """
+
+    def __init__(self, db_name=DB_NAME, batch_size=1000, flush_interval=2.0, warn_depth=5000,
+                 change_only=True, heartbeat_interval=3600, state_save_interval=60):
+        self.db_name = db_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.warn_depth = warn_depth
+        self.change_only = change_only
+        self.state_save_interval = state_save_interval
+        self.last_values = LastValueCache(heartbeat_interval) if change_only else None
+        self.next_state_save = 0.0
+        # Fault code of the last row written per (machine_id, controller)
+        self.event_codes = {}
+
+        self.queue = queue.Queue()
+        self.thread = None
+        self.stats_lock = threading.Lock()
+
+        self.rows_written = 0
+        self.rows_skipped = 0
+        self.flush_count = 0
+        self.failed_rows = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.last_flush_at = None
+
+    # ------------------------------------------------------------------
+    #           Producer side (poll workers)
+    # ------------------------------------------------------------------
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        if self.last_values is not None and not self.last_values.values:
+            self.last_values.seed(self.db_name)
+        self.next_state_save = time.monotonic() + self.state_save_interval
+        self.thread = threading.Thread(target=self._run, name="FaultLogWriter", daemon=True)
+        self.thread.start()
+
+    def log(self, machine_id, controller, raw_value, fault_code, ts=None):
+        """
+        Queue one fault log row for controller 1-8 of a machine. `ts` is in
+        epoch seconds and defaults to now. Safe to call from any thread.
+        Returns False when change-only logging skipped an unchanged value.
+        """
+        if ts is None:
+            ts = int(time.time())
+        if self.last_values is not None and not self.last_values.record(machine_id, controller, raw_value, ts):
+            with self.stats_lock:
+                self.rows_skipped += 1
+            return False
+        self.queue.put(("log", (ts, machine_id, controller, to_signed64(raw_value), fault_code)))
+        return True
+
+    def save_cursor(self, cursor_row):
+        """Queue a (channel_id, last_entry_id, last_created_at) feed cursor update."""
+        self.queue.put(("cursor", cursor_row))
+
+    def save_breaker(self, breaker_row):
+        """Queue a circuit breaker row (see Circuit_breaker.ChannelBreaker.row)."""
+        self.queue.put(("breaker", breaker_row))
+
+    def stop(self, timeout=10):
+        """Flush everything still queued and stop the writer thread."""
+        if not self.thread:
+            return
+        self.queue.put(_STOP)
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            print(f"[WARN] Log writer did not finish within {timeout}s, {self.queue.qsize()} row(s) pending")
+        self.thread = None
+
+    def get_stats(self):
+        with self.stats_lock:
+            return {
+                "queue_depth": self.queue.qsize(),
+                "rows_written": self.rows_written,
+                "rows_skipped": self.rows_skipped,
+                "failed_rows": self.failed_rows,
+                "flush_count": self.flush_count,
+                "last_flush_ms": self.last_flush_ms,
+                "max_flush_ms": self.max_flush_ms,
+                "last_flush_at": self.last_flush_at,
+            }
+
+    # ------------------------------------------------------------------
+    #           Writer thread
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        conn = open_connection(self.db_name)
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        try:
+            while True:
+                wait = max(0.0, deadline - time.monotonic())
+                try:
+                    item = self.queue.get(timeout=wait)
+                except queue.Empty:
+                    item = None
+
+                if item is _STOP:
+                    break
+                if item is not None:
+                    batch.append(item)
+
+                if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                    self._flush(conn, batch, save_all_states=time.monotonic() >= self.next_state_save)
+                    batch = []
+                    deadline = time.monotonic() + self.flush_interval
+
+            # Drain anything that arrived before the stop marker was seen
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    batch.append(item)
+            self._flush(conn, batch, save_all_states=True)
+        finally:
+            conn.close()
+
+    def _flush(self, conn, batch, save_all_states=False):
+        log_rows = [row for kind, row in batch if kind == "log"]
+        cursor_rows = [row for kind, row in batch if kind == "cursor"]
+        # Only the newest row per channel matters
+        breaker_rows = list({row[0]: row for kind, row in batch if kind == "breaker"}.values())
+
+        state_rows = []
+        if self.last_values is not None:
+            if save_all_states:
+                state_rows = self.last_values.take_state_rows()
+                self.next_state_save = time.monotonic() + self.state_save_interval
+            elif log_rows:
+                state_rows = self.last_values.take_state_rows({(row[1], row[2]) for row in log_rows})
+        if not batch and not state_rows:
+            return
+
+        codes = {}
+        event_rows = []
+        for ts, machine_id, controller, _, fault_code in log_rows:
+            key = (machine_id, controller)
+            # Unknown after a restart; save_fault_events() is a no-op when nothing changed
+            if fault_code != codes.get(key, self.event_codes.get(key)):
+                event_rows.append((ts, machine_id, controller, fault_code))
+            codes[key] = fault_code
+
+        started = time.perf_counter()
+        try:
+            insert_fault_logs(log_rows, conn)
+            save_fault_events(event_rows, conn)
+            save_feed_cursors(cursor_rows, conn)
+            save_fault_log_state(state_rows, conn)
+            save_channel_breakers(breaker_rows, conn)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            if self.last_values is not None:
+                self.last_values.restore_dirty(state_rows)
+                # The cache already holds the values of the lost rows
+                self.last_values.forget({(row[1], row[2]) for row in log_rows})
+            print(f"[ERROR] Log writer failed to flush {len(log_rows)} row(s): {e}")
+            with self.stats_lock:
+                self.failed_rows += len(log_rows)
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.event_codes.update(codes)
+
+        with self.stats_lock:
+            self.rows_written += len(log_rows)
+            self.flush_count += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.last_flush_at = datetime.now()
+
+        depth = self.queue.qsize()
+        print(f"[LOG] Flushed {len(log_rows)} row(s) in {elapsed_ms:.1f} ms, queue depth {depth}")
+        if depth >= self.warn_depth:
+            print(f"[WARN] Log writer is falling behind: {depth} row(s) queued")
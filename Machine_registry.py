@@ -0,0 +1,74 @@
+"""
+In-process cache of the machine registry (machines plus their M1-M8
+controller rows).
+
+The registry is loaded once with a single JOIN. Db_handler reports every
+add, edit, delete and Excel import through add_machine_listener(), and
+the cache reloads just the machines named in the change. Callers read
+from memory instead of querying SQLite on every refresh cycle.
+
+The cache also remembers the registry_version it reflects. A version bump
+made by this process's own edits is already patched in, so sync() only
+drops the cache for changes made by other processes.
+"""
+import threading
+
+from Db_handler import load_machines, add_machine_listener, get_registry_version
+
+
+class MachineRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.machines = None
+        self.version = 0
+        # registry_version the cached machines reflect (None: unknown)
+        self.registry_version = None
+        add_machine_listener(self.on_machines_changed)
+
+    def get_machines(self):
+        """name -> machine info, loaded on first use. The dict is a copy; the infos are shared."""
+        with self.lock:
+            if self.machines is None:
+                # Read first: a change landing in between only causes one more reload
+                self.registry_version = get_registry_version()
+                self.machines = load_machines()
+                self.version += 1
+            return dict(self.machines)
+
+    def get(self, name):
+        return self.get_machines().get(name)
+
+    def by_id(self):
+        return {info["id"]: info for info in self.get_machines().values()}
+
+    def invalidate(self):
+        """Drop the cache; the next read reloads everything."""
+        with self.lock:
+            self.machines = None
+            self.registry_version = None
+
+    def sync(self, version):
+        """Drop the cache unless it already reflects registry `version`."""
+        with self.lock:
+            if version != self.registry_version:
+                self.machines = None
+                self.registry_version = None
+
+    def on_machines_changed(self, names, version=None):
+        if names is None:
+            self.invalidate()
+            return
+        fresh = load_machines(names)
+        with self.lock:
+            if self.machines is None:
+                return
+            for name in names:
+                self.machines.pop(name, None)
+            self.machines.update(fresh)
+            self.version += 1
+            # Only our own bump: anything another process did in between still needs a reload
+            if version is not None and self.registry_version is not None and version == self.registry_version + 1:
+                self.registry_version = version
+
+
+machine_registry = MachineRegistry()
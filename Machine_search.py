@@ -0,0 +1,186 @@
+"""
+In-memory search index over every machine, healthy or not.
+
+Machines are indexed by name, ThingSpeak channel id and, from
+machine_controllers, controller numbers and customer names. Lookups go
+through a prefix trie of the lower-cased terms first and fall back to
+trigram similarity for typos, so a search never touches Tk or the
+database. sync() takes fresh records from the database and reindexes only
+the machines that were added, changed or removed.
+"""
+import heapq
+import re
+import threading
+
+# Trigram (Jaccard) similarity a term needs to count as a fuzzy match
+FUZZY_THRESHOLD = 0.3
+
+_SPLIT = re.compile(r"[^0-9a-z]+")
+
+
+def _terms(text):
+    """The whole lower-cased value plus its words, e.g. 'Acme Ltd' -> acme ltd, acme, ltd."""
+    text = str(text or "").strip().lower()
+    if not text or text == "n/a":
+        return set()
+    return {text} | {word for word in _SPLIT.split(text) if word}
+
+
+def _trigrams(term):
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def record_terms(record):
+    """All searchable terms of one machine info dict from the machine registry."""
+    terms = _terms(record["name"]) | _terms(record["channel_id"])
+    for controller in record["controllers"]:
+        terms |= _terms(controller.get("controller_no"))
+        terms |= _terms(controller.get("customer_name"))
+    return terms
+
+
+class MachineSearchIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records = {}
+        self.terms_of = {}
+        # Trie nodes: [children, {machine_id: number of its terms below this node}]
+        self.trie = [{}, {}]
+        self.term_ids = {}
+        self.term_trigrams = {}
+        self.trigram_terms = {}
+
+    # ------------------------------------------------------------------
+    #           Updates
+    # ------------------------------------------------------------------
+
+    def sync(self, records):
+        """
+        Bring the index in line with `records` (machine_id -> machine info).
+        Returns the number of machines that were (re)indexed or removed.
+        """
+        with self.lock:
+            changed = 0
+            for machine_id in list(self.records):
+                if machine_id not in records:
+                    self._remove(machine_id)
+                    changed += 1
+            for machine_id, record in records.items():
+                if self.records.get(machine_id) != record:
+                    self._remove(machine_id)
+                    self._add(machine_id, record)
+                    changed += 1
+            return changed
+
+    def upsert(self, record):
+        with self.lock:
+            self._remove(record["id"])
+            self._add(record["id"], record)
+
+    def remove(self, machine_id):
+        with self.lock:
+            self._remove(machine_id)
+
+    def _add(self, machine_id, record):
+        terms = record_terms(record)
+        self.records[machine_id] = record
+        self.terms_of[machine_id] = terms
+        for term in terms:
+            node = self.trie
+            for ch in term:
+                node = node[0].setdefault(ch, [{}, {}])
+                node[1][machine_id] = node[1].get(machine_id, 0) + 1
+
+            ids = self.term_ids.setdefault(term, set())
+            if not ids:
+                tris = _trigrams(term)
+                self.term_trigrams[term] = len(tris)
+                for tri in tris:
+                    self.trigram_terms.setdefault(tri, set()).add(term)
+            ids.add(machine_id)
+
+    def _remove(self, machine_id):
+        terms = self.terms_of.pop(machine_id, None)
+        self.records.pop(machine_id, None)
+        if not terms:
+            return
+        for term in terms:
+            path = [self.trie]
+            for ch in term:
+                path.append(path[-1][0][ch])
+            for node in path[1:]:
+                count = node[1][machine_id] - 1
+                if count:
+                    node[1][machine_id] = count
+                else:
+                    del node[1][machine_id]
+            # Prune branches no machine uses any more
+            for parent, ch, node in zip(reversed(path[:-1]), reversed(term), reversed(path[1:])):
+                if node[1]:
+                    break
+                del parent[0][ch]
+
+            ids = self.term_ids[term]
+            ids.discard(machine_id)
+            if not ids:
+                del self.term_ids[term]
+                del self.term_trigrams[term]
+                for tri in _trigrams(term):
+                    tri_terms = self.trigram_terms[tri]
+                    tri_terms.discard(term)
+                    if not tri_terms:
+                        del self.trigram_terms[tri]
+
+    # ------------------------------------------------------------------
+    #           Lookups
+    # ------------------------------------------------------------------
+
+    def prefix_ids(self, prefix):
+        node = self.trie
+        for ch in prefix:
+            node = node[0].get(ch)
+            if node is None:
+                return set()
+        return set(node[1])
+
+    def fuzzy_ids(self, query, threshold=FUZZY_THRESHOLD):
+        """machine_id -> best trigram similarity of any of its terms to `query`."""
+        query_tris = _trigrams(query)
+        shared = {}
+        for tri in query_tris:
+            for term in self.trigram_terms.get(tri, ()):
+                shared[term] = shared.get(term, 0) + 1
+
+        scores = {}
+        for term, common in shared.items():
+            score = common / (len(query_tris) + self.term_trigrams[term] - common)
+            if score < threshold:
+                continue
+            for machine_id in self.term_ids[term]:
+                if score > scores.get(machine_id, 0):
+                    scores[machine_id] = score
+        return scores
+
+    def search(self, query, limit=50):
+        """
+        Machine records matching `query`, best first: exact name, then name
+        prefix, then any other prefix match. Without any prefix match, the
+        most similar machines by trigrams.
+        """
+        query = str(query or "").strip().lower()
+        if not query:
+            return []
+        with self.lock:
+            ranked = {}
+            for machine_id in self.prefix_ids(query):
+                name = self.records[machine_id]["name"].lower()
+                rank = 0 if name == query else 1 if name.startswith(query) else 2
+                ranked[machine_id] = (rank, 0.0)
+            # Typo tolerance only when nothing starts with the query
+            if not ranked:
+                for machine_id, score in self.fuzzy_ids(query).items():
+                    ranked[machine_id] = (3, -score)
+
+            best = heapq.nsmallest(limit, ranked, key=lambda i: (ranked[i], self.records[i]["name"].lower()))
+            return [self.records[i] for i in best]
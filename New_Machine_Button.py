@@ -1,9 +1,20 @@
 import tkinter as tk
-from tkinter import messagebox, filedialog
+from tkinter import messagebox, filedialog, ttk
 from tkcalendar import DateEntry
 import openpyxl
+import os
+import queue
 import sqlite3
-from Db_handler import add_machine, update_machine_full, insert_from_excel
+import threading
+from Db_handler import add_machine, update_machine_full, write_import_error_report
+from Bulk_io import import_machines, export_machines
+
+FLEET_FILE_TYPES = [
+    ("Excel files", "*.xlsx"),
+    ("CSV files", "*.csv"),
+    ("Parquet files", "*.parquet"),
+    ("All fleet files", "*.xlsx *.csv *.parquet"),
+]
 
 def open_add_machine_window(app):
     window = tk.Toplevel(app.root)
@@ -95,20 +106,27 @@ def open_add_machine_window(app):
     tk.Button(window, text="Save", command=save).grid(row=14, column=0, columnspan=5, pady=10)
 
     def attach_excel():
-        file_path = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsx")])
+        file_path = filedialog.askopenfilename(filetypes=FLEET_FILE_TYPES)
         if not file_path:
             return
 
+        run_fleet_import(app, file_path, parent=window)
+
+    def export_fleet():
+        file_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=FLEET_FILE_TYPES[:3])
+        if not file_path:
+            return
         try:
-            insert_from_excel(file_path)
-            messagebox.showinfo("Success", "Excel data imported successfully.")
-            app.refresh_data()
+            count = export_machines(file_path)
         except Exception as e:
-            messagebox.showerror("Error", f"Excel import failed: {e}")
+            messagebox.showerror("Error", f"Export failed: {e}")
+            return
+        messagebox.showinfo("Success", f"Exported {count} controller row(s) to {file_path}.")
 
     tk.Button(window, text="Save", command=save).grid(row=14, column=0, columnspan=5, pady=10)
-    tk.Button(window, text="📎 Attach Excel File", command=attach_excel).grid(row=15, column=0, columnspan=5, pady=10)
+    tk.Button(window, text="📎 Attach Excel / CSV / Parquet File", command=attach_excel).grid(row=15, column=0, columnspan=5, pady=10)
     tk.Button(window, text="Change Machine Details", command=lambda: open_change_window(app)).grid(row=16, column=0, columnspan=5, pady=10)
+    tk.Button(window, text="Export Fleet", command=export_fleet).grid(row=17, column=0, columnspan=5, pady=10)
 
 
 def open_change_window(app):
@@ -191,3 +209,86 @@ def open_change_window(app):
             app.refresh_data()
         else:
             messagebox.showerror("Error", "Old machine details not found or incorrect.")
+
+
+def run_fleet_import(app, file_path, parent=None):
+    """
+    Import a fleet file (Excel, CSV or Parquet) on a worker thread with a
+    progress window. The Tk thread only polls the worker's queue, so the UI
+    keeps responding.
+    """
+    progress_win = tk.Toplevel(parent or app.root)
+    progress_win.title("Importing Machines")
+    progress_win.resizable(False, False)
+    status = tk.Label(progress_win, text=f"Reading {os.path.basename(file_path)}...", anchor="w")
+    status.pack(fill="x", padx=10, pady=(10, 5))
+    bar = ttk.Progressbar(progress_win, length=300, mode="indeterminate")
+    bar.pack(padx=10, pady=(0, 10))
+    bar.start(10)
+
+    updates = queue.Queue()
+
+    def worker():
+        try:
+            result = import_machines(
+                file_path, progress=lambda done, total: updates.put(("progress", done, total))
+            )
+            updates.put(("done", result, None))
+        except Exception as e:
+            updates.put(("failed", e, None))
+
+    threading.Thread(target=worker, name="ExcelImport", daemon=True).start()
+
+    def poll():
+        try:
+            while True:
+                kind, a, b = updates.get_nowait()
+                if kind == "progress":
+                    done, total = a, b
+                    if total:
+                        if str(bar["mode"]) != "determinate":
+                            bar.stop()
+                            bar.config(mode="determinate", maximum=total)
+                        bar["value"] = min(done, total)
+                        status.config(text=f"Staged {done} of {total} row(s)...")
+                    else:
+                        status.config(text=f"Staged {done} row(s)...")
+                else:
+                    progress_win.destroy()
+                    if kind == "failed":
+                        messagebox.showerror("Error", f"Import failed: {a}")
+                    else:
+                        show_import_result(file_path, a)
+                        app.refresh_data()
+                    return
+        except queue.Empty:
+            pass
+        progress_win.after(100, poll)
+
+    poll()
+
+
+def show_import_result(file_path, result):
+    errors = result["errors"]
+    summary = (
+        f"Imported {result['imported']} controller row(s) for {result['machines']} machine(s)"
+        f" out of {result['rows']} row(s)."
+    )
+    if not errors:
+        messagebox.showinfo("Success", summary)
+        return
+
+    report_path = os.path.splitext(file_path)[0] + "_import_errors.csv"
+    try:
+        write_import_error_report(errors, report_path)
+        report_note = f"Full error report: {report_path}"
+    except OSError as e:
+        report_note = f"Could not write the error report: {e}"
+    shown = "\n".join(
+        f"Row {error['row']}: {error['error']}" if error["row"] else error["error"] for error in errors[:10]
+    )
+    more = f"\n... and {len(errors) - 10} more" if len(errors) > 10 else ""
+    messagebox.showwarning(
+        "Imported with errors",
+        f"{summary}\n{len(errors)} row(s) skipped:\n{shown}{more}\n\n{report_note}",
+    )
@@ -0,0 +1,230 @@
+"""
+Adaptive per-machine poll scheduling under a global request budget.
+
+Every machine gets its own next-poll time, set from its state after each
+poll:
+
+    fault    - an active fault code                      -> fault_interval
+    recent   - a value changed within recent_window      -> recent_interval
+    healthy  - steady and fault free                     -> healthy_interval
+    retry    - the last poll failed or came back empty   -> retry_interval
+    dead     - dead_after failures/empties in a row      -> dead_base doubling up to dead_max
+
+Intervals get +/- jitter so machines drift apart instead of lining up.
+take_due() hands out due machines at most at budget_per_minute, using a
+token bucket that allows burst_seconds of budget at once. When more
+machines are due than the budget allows, faults go first and dead
+channels go last. A `gate` passed to take_due() can hold machines back
+(e.g. behind an open circuit breaker) without spending budget on them, and
+set_budget_scale() slows the whole fleet down while the upstream struggles.
+"""
+import heapq
+import random
+import threading
+import time
+from collections import deque
+
+# Lower polls first when the budget is short
+PRIORITY = {"new": 0, "fault": 1, "recent": 2, "retry": 3, "healthy": 4, "dead": 5}
+
+
+class MachineSchedule:
+    def __init__(self, name, due):
+        self.name = name
+        self.due = due
+        self.state = "new"
+        self.interval = 0.0
+        self.in_flight = False
+        self.failures = 0
+        self.last_answer = None
+        self.last_change = None
+
+
+class PollScheduler:
+    def __init__(self, budget_per_minute=600, burst_seconds=10, fault_interval=30, recent_interval=60,
+                 healthy_interval=300, retry_interval=60, dead_after=3, dead_base=900, dead_max=6 * 3600,
+                 recent_window=900, in_flight_timeout=120, jitter=0.1):
+        self.full_rate = budget_per_minute / 60.0
+        self.full_capacity = max(self.full_rate * burst_seconds, 1.0)
+        self.rate = self.full_rate
+        self.capacity = self.full_capacity
+        self.fault_interval = fault_interval
+        self.recent_interval = recent_interval
+        self.healthy_interval = healthy_interval
+        self.retry_interval = retry_interval
+        self.dead_after = dead_after
+        self.dead_base = dead_base
+        self.dead_max = dead_max
+        self.recent_window = recent_window
+        self.in_flight_timeout = in_flight_timeout
+        self.jitter = jitter
+
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.heap = []
+        self.seq = 0
+        self.tokens = self.capacity
+        self.refilled_at = time.monotonic()
+        self.dispatched = deque()
+
+    # ------------------------------------------------------------------
+    #           Machines
+    # ------------------------------------------------------------------
+
+    def sync(self, names, now=None):
+        """Track exactly `names`. New machines are due straight away."""
+        now = now or time.monotonic()
+        names = set(names)
+        with self.lock:
+            for name in list(self.entries):
+                if name not in names:
+                    del self.entries[name]
+            for name in names:
+                if name not in self.entries:
+                    entry = self.entries[name] = MachineSchedule(name, now)
+                    self._push(entry)
+
+    def _push(self, entry):
+        self.seq += 1
+        heapq.heappush(self.heap, (entry.due, self.seq, entry.name))
+
+    def _valid(self, due, name):
+        entry = self.entries.get(name)
+        return entry is not None and entry.due == due
+
+    # ------------------------------------------------------------------
+    #           Dispatch
+    # ------------------------------------------------------------------
+
+    def set_budget_scale(self, scale):
+        """Use only `scale` (0-1] of budget_per_minute until called again."""
+        with self.lock:
+            self.rate = self.full_rate * scale
+            self.capacity = max(self.full_capacity * scale, 1.0)
+            self.tokens = min(self.tokens, self.capacity)
+
+    def take_due(self, now=None, limit=None, gate=None):
+        """
+        Names of machines to poll now, highest priority first, within the
+        request budget. They count as in flight until record() is called
+        for them, or in_flight_timeout passes.
+
+        `gate(name)` returns 0 to let a machine through, or the seconds to
+        hold it back; held machines are pushed back without using budget.
+        """
+        now = now or time.monotonic()
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + (now - self.refilled_at) * self.rate)
+            self.refilled_at = now
+            available = int(self.tokens)
+            if limit is not None:
+                available = min(available, limit)
+            if available <= 0:
+                return []
+
+            due = []
+            while self.heap and self.heap[0][0] <= now:
+                item = heapq.heappop(self.heap)
+                if self._valid(item[0], item[2]):
+                    due.append(item)
+            if not due:
+                return []
+
+            def priority(item):
+                entry = self.entries[item[2]]
+                # An in-flight entry that timed out lost its result; retry it first
+                return (PRIORITY["retry"] if entry.in_flight else PRIORITY[entry.state], item[0])
+
+            due.sort(key=priority)
+            names = []
+            for item in due:
+                if len(names) >= available:
+                    heapq.heappush(self.heap, item)
+                    continue
+                name = item[2]
+                entry = self.entries[name]
+                wait = gate(name) if gate else 0
+                if wait > 0:
+                    entry.in_flight = False
+                    entry.due = now + wait
+                    self._push(entry)
+                    continue
+                entry.in_flight = True
+                entry.due = now + self.in_flight_timeout
+                self._push(entry)
+                names.append(name)
+                self.dispatched.append(now)
+            self.tokens -= len(names)
+            return names
+
+    def record(self, name, outcome, faulted=False, changed=False, now=None):
+        """
+        Reschedule `name` after a poll. `outcome` is "ok" (got data),
+        "empty" (channel answered without entries) or "error".
+        """
+        now = now or time.monotonic()
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is None:
+                return
+            entry.in_flight = False
+            if outcome != "error":
+                entry.last_answer = now
+            if outcome == "ok":
+                entry.failures = 0
+                if changed:
+                    entry.last_change = now
+            else:
+                entry.failures += 1
+
+            if entry.failures >= self.dead_after:
+                entry.state = "dead"
+                entry.interval = min(self.dead_base * 2 ** (entry.failures - self.dead_after), self.dead_max)
+            elif entry.failures:
+                entry.state = "retry"
+                entry.interval = self.retry_interval
+            elif faulted:
+                entry.state = "fault"
+                entry.interval = self.fault_interval
+            elif entry.last_change is not None and now - entry.last_change < self.recent_window:
+                entry.state = "recent"
+                entry.interval = self.recent_interval
+            else:
+                entry.state = "healthy"
+                entry.interval = self.healthy_interval
+
+            entry.due = now + entry.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+            self._push(entry)
+
+    # ------------------------------------------------------------------
+    #           Status
+    # ------------------------------------------------------------------
+
+    def stale_names(self, now=None, grace=30):
+        """Machines that have not answered within twice their interval (or never)."""
+        now = now or time.monotonic()
+        with self.lock:
+            return {
+                name for name, entry in self.entries.items()
+                if entry.last_answer is None or now - entry.last_answer > 2 * entry.interval + grace
+            }
+
+    def get_stats(self, now=None):
+        now = now or time.monotonic()
+        with self.lock:
+            while self.dispatched and now - self.dispatched[0] > 60:
+                self.dispatched.popleft()
+            states = dict.fromkeys(PRIORITY, 0)
+            backlog = 0
+            for entry in self.entries.values():
+                states[entry.state] += 1
+                if entry.due <= now and not entry.in_flight:
+                    backlog += 1
+            return {
+                "machines": len(self.entries),
+                "states": states,
+                "in_flight": sum(entry.in_flight for entry in self.entries.values()),
+                "backlog": backlog,
+                "requests_last_minute": len(self.dispatched),
+                "budget_per_minute": round(self.rate * 60),
+            }
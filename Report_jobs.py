@@ -0,0 +1,216 @@
+"""
+Controller reports built in the background.
+
+A report covers one controller over [start_ts, end_ts) (end_ts None means
+"up to now"): its archived and live fault_logs rows plus fault frequency,
+time in fault, MTTR and uptime per fault code from fault_events. Jobs run
+on a small worker pool and read the history in chunks, so neither the Tk
+thread nor the other jobs wait on a long scan. Each job posts its progress to `job.updates`, which the UI
+polls, and can be cancelled between chunks.
+
+Finished reports are cached under (machine, controller, range, the
+controller's history high-water mark). Opening the same report again before
+anything new was logged for that controller returns the cached result
+without reading its history; rows logged for other controllers do not
+invalidate it.
+"""
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from Db_handler import fault_event_stats, history_high_water, iter_fault_log_chunks
+from Retention import read_archived_logs
+
+# Worker threads running report jobs
+REPORT_WORKERS = 2
+# fault_logs rows read per chunk; progress and cancellation are checked between chunks
+REPORT_CHUNK_ROWS = 20_000
+# Finished reports kept in memory
+REPORT_CACHE_SIZE = 16
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+CANCELLED = "cancelled"
+FAILED = "failed"
+
+
+class ReportCancelled(Exception):
+    pass
+
+
+class ReportResult:
+    """
+    History and summary of one controller. ts, raw_value and fault_code are
+    NumPy arrays, oldest first; `events` is its fault_event_stats() entry.
+    """
+
+    def __init__(self, machine_name, controller, start_ts, end_ts, ts, raw_value, fault_code, events):
+        self.machine_name = machine_name
+        self.controller = controller
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+        self.ts = ts
+        self.raw_value = raw_value
+        self.fault_code = fault_code
+        self.rows = len(ts)
+        self.first_ts = int(ts[0]) if self.rows else None
+        self.last_ts = int(ts[-1]) if self.rows else None
+
+        changed = np.ones(self.rows, dtype=bool)
+        changed[1:] = raw_value[1:] != raw_value[:-1]
+        self.changes = int(changed[1:].sum())
+
+        events = events or {"events": 0, "fault_seconds": 0, "mttr": None, "uptime": 1.0, "codes": {}}
+        self.fault_events = events["events"]
+        self.fault_seconds = events["fault_seconds"]
+        self.mttr = events["mttr"]
+        self.uptime = events["uptime"]
+        # fault_code -> {"events", "seconds", "mttr"}
+        self.fault_codes = events["codes"]
+
+
+class ReportJob:
+    def __init__(self, key, machine_name, machine_id, controller, start_ts, end_ts):
+        self.key = key
+        self.machine_name = machine_name
+        self.machine_id = machine_id
+        self.controller = controller
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+        self.state = PENDING
+        self.result = None
+        self.error = None
+        self.from_cache = False
+        # ("progress", rows_read, fraction), then one of ("done", result, None),
+        # ("cancelled", None, None) or ("failed", error, None)
+        self.updates = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    def cancel(self):
+        """Stop the job at its next chunk. A job that has not started yet never runs."""
+        self.cancel_event.set()
+        if self.future is not None and self.future.cancel():
+            self._finish(CANCELLED)
+
+    def _check(self):
+        if self.cancel_event.is_set():
+            raise ReportCancelled()
+
+    def _finish(self, state, result=None, error=None):
+        self.state = state
+        self.result = result
+        self.error = error
+        self.updates.put((state, result if state == DONE else error, None))
+
+
+class ReportJobManager:
+    def __init__(self, workers=REPORT_WORKERS, chunk_rows=REPORT_CHUNK_ROWS, cache_size=REPORT_CACHE_SIZE):
+        self.chunk_rows = chunk_rows
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.executor = None
+        self.workers = workers
+
+    def submit(self, machine_name, machine_id, controller, start_ts, end_ts=None):
+        """Start (or answer from the cache) a report job. Returns the ReportJob."""
+        key = (machine_id, controller, start_ts, end_ts, history_high_water(machine_id, controller))
+        job = ReportJob(key, machine_name, machine_id, controller, start_ts, end_ts)
+        with self.lock:
+            result = self.cache.get(key)
+            if result is not None:
+                self.cache.move_to_end(key)
+                job.from_cache = True
+            elif self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="Report")
+        if result is not None:
+            job._finish(DONE, result)
+            return job
+        job.future = self.executor.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        if job.cancel_event.is_set():
+            job._finish(CANCELLED)
+            return
+        job.state = RUNNING
+        try:
+            result = self._build(job)
+        except ReportCancelled:
+            job._finish(CANCELLED)
+            return
+        except Exception as e:
+            print(f"[ERROR] Report for {job.machine_name} M{job.controller} failed: {e}")
+            job._finish(FAILED, error=e)
+            return
+        with self.lock:
+            self.cache[job.key] = result
+            self.cache.move_to_end(job.key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        job._finish(DONE, result)
+
+    def _build(self, job):
+        end_ts = job.end_ts or int(time.time()) + 1
+        span = max(1, end_ts - job.start_ts)
+        ts, raw, codes = [], [], []
+        read = 0
+
+        def add(chunk_ts, chunk_raw, chunk_codes):
+            nonlocal read
+            read += len(chunk_ts)
+            ts.append(np.array(chunk_ts, dtype=np.int64))
+            raw.append(chunk_raw)
+            codes.append(np.array(chunk_codes, dtype=np.uint16))
+            job.updates.put(("progress", read, min(1.0, max(0.0, (chunk_ts[-1] - job.start_ts) / span))))
+
+        # Archived days first; they are older than anything still in fault_logs
+        archived = []
+        for row in read_archived_logs(job.machine_id, job.controller, job.start_ts, end_ts):
+            archived.append(row)
+            if len(archived) >= self.chunk_rows:
+                job._check()
+                add(*self._columns(archived))
+                archived = []
+        if archived:
+            add(*self._columns(archived))
+
+        for rows in iter_fault_log_chunks(job.start_ts, end_ts, [job.machine_id], [job.controller],
+                                          self.chunk_rows):
+            job._check()
+            chunk_ts, _, _, chunk_raw, chunk_codes = zip(*rows)
+            # Stored signed in SQLite; the same 64 bits read as unsigned
+            add(chunk_ts, np.array(chunk_raw, dtype=np.int64).view(np.uint64), chunk_codes)
+        job._check()
+
+        if ts:
+            ts, raw, codes = np.concatenate(ts), np.concatenate(raw), np.concatenate(codes)
+            order = np.argsort(ts, kind="stable")
+            ts, raw, codes = ts[order], raw[order], codes[order]
+        else:
+            ts = np.zeros(0, dtype=np.int64)
+            raw = np.zeros(0, dtype=np.uint64)
+            codes = np.zeros(0, dtype=np.uint16)
+        events = fault_event_stats(job.start_ts, job.end_ts, [job.machine_id], [job.controller])
+        return ReportResult(job.machine_name, job.controller, job.start_ts, job.end_ts, ts, raw, codes,
+                            events.get((job.machine_id, job.controller)))
+
+    @staticmethod
+    def _columns(archived):
+        chunk_ts, chunk_raw, chunk_codes = zip(*archived)
+        return chunk_ts, np.array(chunk_raw, dtype=np.uint64), chunk_codes
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+report_jobs = ReportJobManager()
@@ -0,0 +1,167 @@
+"""
+Report window opened by "Generate Report" in a detail window.
+
+The report itself is built by a Report_jobs job on a worker thread; this
+window only polls the job's updates, so the dashboard keeps refreshing
+while a long history is read and the report can be cancelled. Relative
+ranges start on the hour, so reopening a report within the hour (with
+nothing new logged) comes straight from the report cache.
+"""
+import queue
+import time
+import tkinter as tk
+from datetime import datetime
+from tkinter import ttk
+
+from Machine_registry import machine_registry
+from Report_jobs import report_jobs, DONE, CANCELLED
+
+# Range choices: label -> seconds back from now (None = everything kept)
+REPORT_RANGES = {
+    "Last 24 hours": 24 * 3600,
+    "Last 7 days": 7 * 24 * 3600,
+    "Last 30 days": 30 * 24 * 3600,
+    "All history": None,
+}
+# Newest history rows listed under the summary
+RECENT_ROWS_SHOWN = 200
+
+
+def _format_ts(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S") if ts else "-"
+
+
+def _format_duration(seconds):
+    hours, rest = divmod(int(seconds), 3600)
+    return f"{hours}:{rest // 60:02d}:{rest % 60:02d}"
+
+
+def _range_start(seconds_back, now=None):
+    if seconds_back is None:
+        return 0
+    now = int(now or time.time())
+    return now - now % 3600 - seconds_back
+
+
+class ReportWindow:
+    def __init__(self, root, machine_name, machine_id, controller):
+        self.machine_name = machine_name
+        self.machine_id = machine_id
+        self.controller = controller
+        self.job = None
+
+        self.win = tk.Toplevel(root)
+        self.win.title(f"Report for {machine_name} M{controller}")
+        self.win.geometry("640x520")
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+
+        controls = tk.Frame(self.win)
+        controls.pack(fill="x", padx=10, pady=10)
+        self.range_var = tk.StringVar(value=next(iter(REPORT_RANGES)))
+        tk.OptionMenu(controls, self.range_var, *REPORT_RANGES).pack(side="left")
+        tk.Button(controls, text="Generate", command=self.generate).pack(side="left", padx=(10, 0))
+        self.cancel_button = tk.Button(controls, text="Cancel", command=self.cancel, state="disabled")
+        self.cancel_button.pack(side="left", padx=(5, 0))
+
+        self.status = tk.Label(self.win, text="", anchor="w")
+        self.status.pack(fill="x", padx=10)
+        self.bar = ttk.Progressbar(self.win, length=300, mode="determinate", maximum=100)
+        self.bar.pack(fill="x", padx=10, pady=(0, 10))
+
+        self.summary = tk.Label(self.win, text="", anchor="w", justify="left", font=("Arial", 10))
+        self.summary.pack(fill="x", padx=10)
+
+        self.codes = ttk.Treeview(self.win, columns=("code", "entered", "time", "mttr"), show="headings", height=6)
+        for column, heading, width in (("code", "Fault code", 100), ("entered", "Times entered", 110),
+                                       ("time", "Time in fault", 130), ("mttr", "MTTR", 130)):
+            self.codes.heading(column, text=heading)
+            self.codes.column(column, width=width, anchor="w")
+        self.codes.pack(fill="x", padx=10, pady=(10, 0))
+
+        self.history = ttk.Treeview(self.win, columns=("ts", "raw", "code"), show="headings")
+        for column, heading, width in (("ts", "Time", 180), ("raw", "Raw value", 200), ("code", "Fault code", 100)):
+            self.history.heading(column, text=heading)
+            self.history.column(column, width=width, anchor="w")
+        self.history.pack(fill="both", expand=True, padx=10, pady=10)
+
+        self.generate()
+
+    def generate(self):
+        if self.job is not None:
+            self.job.cancel()
+        start_ts = _range_start(REPORT_RANGES[self.range_var.get()])
+        self.job = report_jobs.submit(self.machine_name, self.machine_id, self.controller, start_ts)
+        self.bar["value"] = 0
+        self.status.config(text="Reading history...")
+        self.cancel_button.config(state="normal")
+        self.poll(self.job)
+
+    def cancel(self):
+        if self.job is not None:
+            self.job.cancel()
+
+    def poll(self, job):
+        if job is not self.job or not self.exists():
+            return
+        try:
+            while True:
+                kind, value, fraction = job.updates.get_nowait()
+                if kind == "progress":
+                    self.bar["value"] = fraction * 100
+                    self.status.config(text=f"Read {value:,} row(s)...")
+                    continue
+                self.cancel_button.config(state="disabled")
+                if kind == DONE:
+                    self.bar["value"] = 100
+                    self.show(value, job.from_cache)
+                elif kind == CANCELLED:
+                    self.status.config(text="Cancelled.")
+                else:
+                    self.status.config(text=f"Report failed: {value}")
+                return
+        except queue.Empty:
+            pass
+        self.win.after(100, self.poll, job)
+
+    def show(self, result, from_cache):
+        source = " (cached)" if from_cache else ""
+        self.status.config(text=f"{result.rows:,} row(s){source}")
+        self.summary.config(text=(
+            f"From: {_format_ts(result.start_ts)}    To: {_format_ts(result.end_ts) if result.end_ts else 'now'}\n"
+            f"First row: {_format_ts(result.first_ts)}    Last row: {_format_ts(result.last_ts)}\n"
+            f"Value changes: {result.changes:,}    Faults: {result.fault_events:,}    "
+            f"Time in fault: {_format_duration(result.fault_seconds)}\n"
+            f"MTTR: {_format_duration(result.mttr) if result.mttr is not None else '-'}    "
+            f"Uptime: {result.uptime * 100:.1f}%"
+        ))
+        self.codes.delete(*self.codes.get_children())
+        for code, stats in sorted(result.fault_codes.items()):
+            mttr = _format_duration(stats["mttr"]) if stats["mttr"] is not None else "-"
+            self.codes.insert("", "end", values=(code, stats["events"], _format_duration(stats["seconds"]), mttr))
+        self.history.delete(*self.history.get_children())
+        newest = range(result.rows - 1, max(-1, result.rows - 1 - RECENT_ROWS_SHOWN), -1)
+        for i in newest:
+            self.history.insert("", "end", values=(
+                _format_ts(int(result.ts[i])), f"{int(result.raw_value[i]):016X}", int(result.fault_code[i])
+            ))
+
+    def exists(self):
+        try:
+            return bool(self.win.winfo_exists())
+        except tk.TclError:
+            return False
+
+    def close(self):
+        self.cancel()
+        self.job = None
+        self.win.destroy()
+
+
+def open_report_window(root, vm_name):
+    """Open a report for `vm_name` ("<machine> M<n>", as listed in the detail window)."""
+    machine_name, _, slot = vm_name.rpartition(" ")
+    info = machine_registry.get(machine_name)
+    if info is None or not slot[1:].isdigit():
+        print(f"[WARN] Cannot open a report for unknown controller {vm_name!r}")
+        return None
+    return ReportWindow(root, machine_name, info["id"], int(slot[1:]))
@@ -0,0 +1,309 @@
+import csv
+import gzip
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from Db_connection import get_connection
+from Db_handler import DB_NAME, from_signed64, to_signed64
+from Bulk_decoder import decode_batch
+
+ARCHIVE_DIR = "archive"
+# How long a finished day stays open before it is summarized. A channel that
+# was unreachable catches up from its feed cursor when it comes back, and
+# those rows land in the days it missed; they must arrive before the day is
+# rolled up (and, later, archived).
+SETTLE_SECONDS = 24 * 3600
+
+
+def local_day_start(ts):
+    """Epoch seconds of local midnight on the day containing `ts`."""
+    day = datetime.fromtimestamp(ts).replace(hour=0, minute=0, second=0, microsecond=0)
+    return int(day.timestamp())
+
+
+def local_hour_starts(day_ts):
+    """Local hour boundaries of the day starting at `day_ts`, plus the next midnight."""
+    day = datetime.fromtimestamp(day_ts)
+    bounds = [int((day + timedelta(hours=h)).timestamp()) for h in range(24)]
+    next_day = (day + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    bounds.append(int(next_day.timestamp()))
+    return bounds
+
+
+class RetentionManager:
+    """
+    Background housekeeping for fault_logs.
+
+    Each completed local day is rolled up into per-hour and per-day rows in
+    fault_log_summaries, per machine/controller/fault code: seconds spent in
+    the code, seconds with the genset ON, number of transitions into the code
+    and the first/last transition time. Days older than `raw_days` are then
+    written to a gzip CSV under `archive_dir` and deleted from fault_logs in
+    small chunks, so the log writer is never locked out for long.
+
+    Progress is kept in retention_state, so the work is incremental and
+    resumes after a restart. A value is assumed to hold until the next row
+    for at most `max_hold` seconds (two heartbeats by default); longer gaps
+    count as no data. A day is only summarized `settle` seconds after it
+    ended, so rows fetched late by a catching-up feed are still included.
+    """
+
+    def __init__(self, db_name=DB_NAME, raw_days=30, archive_dir=ARCHIVE_DIR,
+                 interval=300, max_hold=7200, delete_chunk=2000, pause=0.05, settle=SETTLE_SECONDS):
+        self.db_name = db_name
+        self.raw_days = raw_days
+        self.archive_dir = archive_dir
+        self.settle = settle
+        self.interval = interval
+        self.max_hold = max_hold
+        self.delete_chunk = delete_chunk
+        self.pause = pause
+
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="Retention", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=5):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                # Catch up one day at a time until there is nothing left to do
+                while not self.stop_event.is_set() and self.run_once():
+                    self.stop_event.wait(self.pause)
+            except Exception as e:
+                print(f"[ERROR] Retention pass failed: {e}")
+            self.stop_event.wait(self.interval)
+
+    def run_once(self, now=None):
+        """Summarize or archive at most one day. Returns True if it did any work."""
+        now = int(now if now is not None else time.time())
+        with get_connection(self.db_name) as conn:
+            if self._summarize_next_day(conn, now):
+                return True
+            return self._archive_next_day(conn, now)
+
+    # ------------------------------------------------------------------
+    #           Progress bookkeeping
+    # ------------------------------------------------------------------
+
+    def _get_state(self, conn, key):
+        row = conn.execute("SELECT value FROM retention_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, conn, key, value):
+        conn.execute("INSERT OR REPLACE INTO retention_state (key, value) VALUES (?, ?)", (key, value))
+
+    def _first_day(self, conn):
+        row = conn.execute("SELECT MIN(ts) FROM fault_logs").fetchone()
+        return local_day_start(row[0]) if row and row[0] is not None else None
+
+    # ------------------------------------------------------------------
+    #           Summaries
+    # ------------------------------------------------------------------
+
+    def _summarize_next_day(self, conn, now):
+        day_ts = self._get_state(conn, "summarized_until") or self._first_day(conn)
+        if day_ts is None:
+            return False
+        bounds = local_hour_starts(day_ts)
+        day_end = bounds[-1]
+        if day_end > local_day_start(now - self.settle):
+            return False  # day not complete yet, or late rows may still arrive
+
+        # Value of every controller at the start of the day, carried over from the previous day
+        carry = {
+            (m, c): (from_signed64(raw), ts)
+            for m, c, raw, ts in conn.execute("SELECT machine_id, controller, raw_value, ts FROM retention_carry")
+        }
+        rows = conn.execute("""
+            SELECT machine_id, controller, ts, raw_value, fault_code
+            FROM fault_logs
+            WHERE ts >= ? AND ts < ?
+            ORDER BY machine_id, controller, ts
+        """, (day_ts, day_end)).fetchall()
+
+        per_key = {}
+        for machine_id, controller, ts, raw_value, fault_code in rows:
+            per_key.setdefault((machine_id, controller), []).append((ts, from_signed64(raw_value), fault_code))
+
+        # Decode each distinct raw value of the day once, in one vectorized pass
+        distinct = sorted({raw for raw, _ in carry.values()} | {row[1] for key_rows in per_key.values() for row in key_rows})
+        columns = decode_batch(distinct) if distinct else {"fault_code": [], "genset_on": []}
+        decoded = dict(zip(distinct, zip(list(columns["fault_code"]), list(columns["genset_on"]))))
+
+        hourly, daily = {}, {}
+        new_carry = dict(carry)
+        for key in set(carry) | set(per_key):
+            points = []
+            prev = carry.get(key)
+            if prev is not None and day_ts - prev[1] <= self.max_hold:
+                points.append((day_ts, prev[0], None, False, prev[1]))
+            prev_code = int(decoded[prev[0]][0]) if prev is not None else None
+            for ts, raw_value, fault_code in per_key.get(key, []):
+                points.append((ts, raw_value, fault_code, fault_code != prev_code, ts))
+                prev_code = fault_code
+            if per_key.get(key):
+                last_ts, last_raw, _ = per_key[key][-1]
+                new_carry[key] = (last_raw, last_ts)
+            self._accumulate(key, points, bounds, decoded, hourly, daily)
+
+        summary_rows = [("hour", *k, *v) for k, v in hourly.items()] + [("day", *k, *v) for k, v in daily.items()]
+        conn.executemany("""
+            INSERT OR REPLACE INTO fault_log_summaries (
+                granularity, bucket_ts, machine_id, controller, fault_code,
+                seconds, genset_on_seconds, transitions, first_transition_ts, last_transition_ts
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, summary_rows)
+        conn.execute("DELETE FROM retention_carry")
+        conn.executemany(
+            "INSERT INTO retention_carry (machine_id, controller, raw_value, ts) VALUES (?, ?, ?, ?)",
+            [(m, c, to_signed64(raw), ts) for (m, c), (raw, ts) in new_carry.items()],
+        )
+        self._set_state(conn, "summarized_until", day_end)
+        conn.commit()
+        print(f"[RETENTION] Summarized {datetime.fromtimestamp(day_ts):%Y-%m-%d}: "
+              f"{len(rows)} row(s) into {len(summary_rows)} summary row(s)")
+        return True
+
+    def _accumulate(self, key, points, bounds, decoded, hourly, daily):
+        machine_id, controller = key
+        day_ts, day_end = bounds[0], bounds[-1]
+
+        for i, (ts, raw_value, fault_code, is_transition, logged_ts) in enumerate(points):
+            if fault_code is None:
+                fault_code = int(decoded[raw_value][0])
+            next_ts = points[i + 1][0] if i + 1 < len(points) else day_end
+            end = min(next_ts, logged_ts + self.max_hold, day_end)
+            genset_on = bool(decoded[raw_value][1])
+
+            day_entry = daily.setdefault((day_ts, machine_id, controller, fault_code), [0, 0, 0, None, None])
+            if is_transition:
+                self._note_transition(day_entry, ts)
+
+            for h in range(len(bounds) - 1):
+                h_start, h_end = bounds[h], bounds[h + 1]
+                if h_end <= ts or h_start >= end:
+                    continue
+                seconds = min(end, h_end) - max(ts, h_start)
+                entry = hourly.setdefault((h_start, machine_id, controller, fault_code), [0, 0, 0, None, None])
+                entry[0] += seconds
+                if genset_on:
+                    entry[1] += seconds
+                if is_transition and h_start <= ts < h_end:
+                    self._note_transition(entry, ts)
+                day_entry[0] += seconds
+                if genset_on:
+                    day_entry[1] += seconds
+
+    @staticmethod
+    def _note_transition(entry, ts):
+        entry[2] += 1
+        entry[3] = ts if entry[3] is None else min(entry[3], ts)
+        entry[4] = ts if entry[4] is None else max(entry[4], ts)
+
+    # ------------------------------------------------------------------
+    #           Archival
+    # ------------------------------------------------------------------
+
+    def _archive_next_day(self, conn, now):
+        if self.raw_days is None:
+            return False
+        day_ts = self._get_state(conn, "archived_until") or self._first_day(conn)
+        summarized_until = self._get_state(conn, "summarized_until")
+        if day_ts is None or summarized_until is None:
+            return False
+        day_end = local_hour_starts(day_ts)[-1]
+        cutoff = local_day_start(now - self.raw_days * 86400)
+        # Only archive days that are past retention and already summarized
+        if day_end > cutoff or day_end > summarized_until:
+            return False
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(self.archive_dir, f"fault_logs_{datetime.fromtimestamp(day_ts):%Y-%m-%d}.csv.gz")
+        tmp_path = path + ".tmp"
+        count = 0
+        with gzip.open(tmp_path, "wt", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["ts", "machine_id", "controller", "raw_value", "fault_code"])
+            cursor = conn.execute("""
+                SELECT ts, machine_id, controller, raw_value, fault_code
+                FROM fault_logs
+                WHERE ts >= ? AND ts < ?
+                ORDER BY machine_id, controller, ts
+            """, (day_ts, day_end))
+            for ts, machine_id, controller, raw_value, fault_code in cursor:
+                writer.writerow([ts, machine_id, controller, from_signed64(raw_value), fault_code])
+                count += 1
+        os.replace(tmp_path, path)
+
+        conn.execute("""
+            INSERT OR REPLACE INTO fault_log_archives (day_ts, path, row_count, created_ts)
+            VALUES (?, ?, ?, ?)
+        """, (day_ts, path, count, now))
+        conn.commit()
+
+        # Delete in small transactions so the log writer is not held off
+        while True:
+            deleted = conn.execute("""
+                DELETE FROM fault_logs WHERE id IN (
+                    SELECT id FROM fault_logs WHERE ts >= ? AND ts < ? LIMIT ?
+                )
+            """, (day_ts, day_end, self.delete_chunk)).rowcount
+            conn.commit()
+            if deleted < self.delete_chunk:
+                break
+            time.sleep(self.pause)
+
+        self._set_state(conn, "archived_until", day_end)
+        conn.commit()
+        print(f"[RETENTION] Archived {count} row(s) to {path}")
+        return True
+
+
+def read_archived_logs(machine_id, controller, start_ts, end_ts, db_name=DB_NAME):
+    """Yield archived (ts, raw_value, fault_code) rows for one controller in [start_ts, end_ts)."""
+    with get_connection(db_name) as conn:
+        archives = conn.execute("""
+            SELECT day_ts, path FROM fault_log_archives
+            WHERE day_ts < ? AND day_ts >= ?
+            ORDER BY day_ts
+        """, (end_ts, local_day_start(start_ts))).fetchall()
+
+    for _, path in archives:
+        if not os.path.exists(path):
+            print(f"[WARN] Archive file missing: {path}")
+            continue
+        with gzip.open(path, "rt", newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if int(row["machine_id"]) != machine_id or int(row["controller"]) != controller:
+                    continue
+                ts = int(row["ts"])
+                if start_ts <= ts < end_ts:
+                    yield ts, int(row["raw_value"]), int(row["fault_code"])
+
+
+def fetch_full_history(machine_id, controller, start_ts, end_ts, db_name=DB_NAME):
+    """Archived plus live (ts, raw_value, fault_code) rows for one controller, oldest first."""
+    rows = list(read_archived_logs(machine_id, controller, start_ts, end_ts, db_name))
+    with get_connection(db_name) as conn:
+        live = conn.execute("""
+            SELECT ts, raw_value, fault_code FROM fault_logs
+            WHERE machine_id = ? AND controller = ? AND ts >= ? AND ts < ?
+            ORDER BY ts
+        """, (machine_id, controller, start_ts, end_ts)).fetchall()
+    rows.extend((ts, from_signed64(raw), code) for ts, raw, code in live)
+    rows.sort(key=lambda r: r[0])
+    return rows
@@ -0,0 +1,336 @@
+"""
+Sharded collector for fleets too large for one process.
+
+    python Collector.py --shards 4
+
+The machines are split across `shards` worker processes by consistent
+hashing of the machine id (HashRing, `vnodes` points per shard). Each worker
+is a Collector limited to its shard: it runs its own poll engine, feed cache,
+circuit breakers and scheduler (with 1/shards of the request budget), and
+does the JSON parsing and decoding. Instead of writing to the database it
+sends its log rows, cursor/breaker updates and changed live_state rows to
+the coordinator over a queue.
+
+The coordinator holds the collector lease, runs the single log writer and
+retention, and publishes the merged live state and stats, so GUIs cannot
+tell it apart from a single Collector. Workers pick up added and deleted
+machines from registry_version like any collector; with a fixed number of
+shards a new machine only ever lands on one worker, and changing the
+number of shards moves about 1/shards of the fleet. A worker that dies is
+started again.
+"""
+import bisect
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from Collector import Collector, POLL_ENGINE, POLL_BUDGET_PER_MINUTE, PUBLISH_INTERVAL_SECONDS
+from Db_handler import (
+    acquire_collector_lease,
+    finish_history_migrations,
+    has_pending_history_migrations,
+    load_collector_status,
+    publish_live_state,
+    release_collector_lease,
+)
+from Live_state import COLLECTOR_LEASE_SECONDS, encode_rows
+from Log_writer import FaultLogWriter
+from Retention import RetentionManager
+
+# Rows a worker buffers before sending them without waiting for its next tick
+SINK_BATCH_ROWS = 2000
+
+
+def _hash(text):
+    return int.from_bytes(hashlib.md5(text.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hash ring mapping machine ids to shards 0..shards-1."""
+
+    def __init__(self, shards, vnodes=64):
+        points = sorted((_hash(f"shard-{shard}-{v}"), shard) for shard in range(shards) for v in range(vnodes))
+        self.keys = [key for key, _ in points]
+        self.shards = [shard for _, shard in points]
+
+    def shard_of(self, machine_id):
+        i = bisect.bisect(self.keys, _hash(str(machine_id))) % len(self.keys)
+        return self.shards[i]
+
+
+# ----------------------------------------------------------------------
+#           Worker side
+# ----------------------------------------------------------------------
+
+class ShardSink:
+    """
+    Stands in for the FaultLogWriter inside a worker: log rows and cursor/
+    breaker updates are buffered in order and sent to the coordinator, whose
+    real writer applies change-only logging and commits them.
+    """
+
+    def __init__(self, out_queue, shard):
+        self.out_queue = out_queue
+        self.shard = shard
+        self.lock = threading.Lock()
+        self.items = []
+
+    def start(self):
+        pass
+
+    def log(self, machine_id, controller, raw_value, fault_code, ts=None):
+        self._put(("log", (machine_id, controller, raw_value, fault_code, ts or int(time.time()))))
+        return True
+
+    def save_cursor(self, cursor_row):
+        self._put(("cursor", cursor_row))
+
+    def save_breaker(self, breaker_row):
+        self._put(("breaker", breaker_row))
+
+    def _put(self, item):
+        with self.lock:
+            self.items.append(item)
+            full = len(self.items) >= SINK_BATCH_ROWS
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            items, self.items = self.items, []
+        if items:
+            self.out_queue.put(("items", self.shard, items))
+
+    def stop(self):
+        self.flush()
+
+
+class ShardWorker(Collector):
+    """A Collector that polls only its shard and reports to the coordinator."""
+
+    def __init__(self, shard, shards, out_queue, vnodes=64, **kwargs):
+        super().__init__(**kwargs)
+        self.shard = shard
+        self.ring = HashRing(shards, vnodes)
+        self.out_queue = out_queue
+        self.log_writer = ShardSink(out_queue, shard)
+
+    def refresh_machines(self):
+        super().refresh_machines()
+        mine = {name: info for name, info in self.machines.items() if self.ring.shard_of(info["id"]) == self.shard}
+        if len(mine) != len(self.fleet.names):
+            print(f"[SHARD] Worker {self.shard} now polls {len(mine)} of {len(self.machines)} machine(s)")
+        self.machines = mine
+        self.fleet.sync_machines(mine)
+        self.scheduler.sync(mine)
+
+    def poll_tick(self):
+        super().poll_tick()
+        self.log_writer.flush()
+
+    def publish(self):
+        snapshot, dirty, stale = self.take_changes()
+        self.log_writer.flush()
+        # Log rows go first, so the coordinator never shows values it has not queued for logging
+        self.out_queue.put(("publish", self.shard, (encode_rows(snapshot, dirty), self.get_stats())))
+        self.published_stale = stale
+        return True
+
+    def get_stats(self):
+        fetch_cycle, fetch_totals = self.feed_cache.take_cycle_stats()
+        return {
+            "machines": len(self.machines),
+            "scheduler": self.scheduler.get_stats(),
+            "breakers": self.breakers.get_stats(),
+            "fetch_cycle": fetch_cycle,
+            "fetch_totals": fetch_totals,
+        }
+
+
+def _worker_main(shard, shards, vnodes, engine, budget_per_minute, publish_interval, out_queue, stop_event):
+    worker = ShardWorker(
+        shard, shards, out_queue, vnodes,
+        engine=engine, budget_per_minute=budget_per_minute, publish_interval=publish_interval,
+    )
+    worker.start_polling()
+    try:
+        while not stop_event.wait(1.0):
+            pass
+    except KeyboardInterrupt:
+        pass
+    worker.stop_polling()
+    out_queue.put(("stopped", shard, None))
+
+
+# ----------------------------------------------------------------------
+#           Coordinator
+# ----------------------------------------------------------------------
+
+def _merge_stats(parts):
+    """Add up the workers' stats into the shape a single Collector reports."""
+    merged = {"machines": 0, "scheduler": {}, "breakers": {}, "fetch_cycle": {}, "fetch_totals": {}}
+    samples = errors = 0
+    for part in parts:
+        merged["machines"] += part["machines"]
+        for key in ("scheduler", "fetch_cycle", "fetch_totals"):
+            for name, value in part[key].items():
+                if isinstance(value, dict):
+                    target = merged[key].setdefault(name, {})
+                    for k, v in value.items():
+                        target[k] = target.get(k, 0) + v
+                else:
+                    merged[key][name] = merged[key].get(name, 0) + value
+        b = part["breakers"]
+        for key in ("open", "half_open", "failing"):
+            merged["breakers"][key] = merged["breakers"].get(key, 0) + b[key]
+        merged["breakers"]["degraded"] = merged["breakers"].get("degraded", False) or b["degraded"]
+        samples += b["samples"]
+        errors += b["error_rate"] * b["samples"]
+    merged["breakers"]["samples"] = samples
+    merged["breakers"]["error_rate"] = errors / samples if samples else 0.0
+    return merged
+
+
+class ShardedCollector:
+    def __init__(self, shards=None, engine=POLL_ENGINE, budget_per_minute=POLL_BUDGET_PER_MINUTE,
+                 publish_interval=PUBLISH_INTERVAL_SECONDS, vnodes=64):
+        self.shards = shards or os.cpu_count() or 1
+        self.engine = engine
+        self.budget_per_minute = budget_per_minute
+        self.publish_interval = publish_interval
+        self.vnodes = vnodes
+        self.owner = f"sharded:{os.getpid()}:{id(self):x}"
+
+        # Spawned, not forked: the coordinator already runs threads
+        self.mp = multiprocessing.get_context("spawn")
+        self.out_queue = self.mp.Queue()
+        self.worker_stop = self.mp.Event()
+        self.workers = {}
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.pending_rows = {}
+        self.worker_stats = {}
+        self.generation = 0
+        self.drain_thread = None
+        self.thread = None
+
+        self.log_writer = FaultLogWriter()
+        self.retention = RetentionManager()
+
+    def start(self):
+        if not acquire_collector_lease(self.owner, os.getpid(), COLLECTOR_LEASE_SECONDS):
+            return False
+        self.generation = (load_collector_status() or {}).get("generation") or 0
+
+        self.log_writer.start()
+        self.retention.start()
+        if has_pending_history_migrations():
+            threading.Thread(target=finish_history_migrations, name="FaultLogMigration", daemon=True).start()
+
+        self.worker_stop.clear()
+        for shard in range(self.shards):
+            self._spawn(shard)
+        self.stop_event.clear()
+        self.drain_thread = threading.Thread(target=self._drain, name="ShardDrain", daemon=True)
+        self.drain_thread.start()
+        self.thread = threading.Thread(target=self._run, name="ShardCoordinator", daemon=True)
+        self.thread.start()
+        print(f"[COLLECTOR] Started {self.shards} shard worker(s) ({self.engine} engine).")
+        return True
+
+    def _spawn(self, shard):
+        process = self.mp.Process(
+            target=_worker_main,
+            args=(shard, self.shards, self.vnodes, self.engine, self.budget_per_minute / self.shards,
+                  self.publish_interval, self.out_queue, self.worker_stop),
+            name=f"ShardWorker-{shard}",
+            daemon=True,
+        )
+        process.start()
+        self.workers[shard] = process
+
+    def stop(self):
+        if not self.thread:
+            return
+        self.stop_event.set()
+        self.thread.join(self.publish_interval * 2)
+        self.thread = None
+
+        # Workers flush and say "stopped"; the drain thread keeps applying until they all have
+        self.worker_stop.set()
+        for process in self.workers.values():
+            process.join(30)
+            if process.is_alive():
+                print(f"[WARN] {process.name} did not stop; terminating it")
+                process.terminate()
+        self.drain_thread.join(10)
+        self.publish()
+        self.log_writer.stop()
+        self.retention.stop()
+        release_collector_lease(self.owner)
+        print("[COLLECTOR] Stopped.")
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def _drain(self):
+        """Apply worker messages in arrival order until every worker has stopped."""
+        running = set(range(self.shards))
+        while running:
+            try:
+                kind, shard, payload = self.out_queue.get(timeout=0.5)
+            except queue.Empty:
+                if self.worker_stop.is_set() and not any(p.is_alive() for p in self.workers.values()):
+                    break
+                continue
+            if kind == "items":
+                for item_kind, row in payload:
+                    if item_kind == "log":
+                        self.log_writer.log(*row)
+                    elif item_kind == "cursor":
+                        self.log_writer.save_cursor(row)
+                    else:
+                        self.log_writer.save_breaker(row)
+            elif kind == "publish":
+                rows, stats = payload
+                with self.lock:
+                    for row in rows:
+                        self.pending_rows[row[0]] = row
+                    self.worker_stats[shard] = stats
+            elif kind == "stopped" and self.worker_stop.is_set():
+                running.discard(shard)
+
+    def _run(self):
+        while not self.stop_event.wait(self.publish_interval):
+            for shard, process in list(self.workers.items()):
+                if not process.is_alive():
+                    print(f"[WARN] Shard worker {shard} exited ({process.exitcode}); restarting it")
+                    self._spawn(shard)
+            if not self.publish():
+                print("[WARN] Collector lease was taken over; stopping this collector.")
+                self.stop_event.set()
+
+    def publish(self):
+        with self.lock:
+            rows, self.pending_rows = list(self.pending_rows.values()), {}
+            parts = list(self.worker_stats.values())
+        stats = {}
+        if parts:
+            stats = _merge_stats(parts)
+            stats["engine"] = f"{self.engine} x{self.shards} shards"
+            log_stats = self.log_writer.get_stats()
+            log_stats["warn_depth"] = self.log_writer.warn_depth
+            stats["log_writer"] = log_stats
+            stats["workers"] = {shard: part["machines"] for shard, part in self.worker_stats.items()}
+
+        self.generation += 1
+        if not publish_live_state(self.owner, rows, self.generation, json.dumps(stats, default=str)):
+            with self.lock:
+                for row in rows:
+                    self.pending_rows.setdefault(row[0], row)
+            return False
+        return True
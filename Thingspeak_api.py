@@ -0,0 +1,20 @@
+"""Helpers shared by the polling engines for talking to ThingSpeak."""
+
+# Point this at a local fake server (see Fake_thingspeak.py) for testing
+THINGSPEAK_URL = "https://api.thingspeak.com"
+
+
+def feed_url(channel_id, base_url=None):
+    """Return the feeds.json URL for a channel."""
+    return f"{base_url or THINGSPEAK_URL}/channels/{channel_id}/feeds.json"
+
+
+def feed_params(info, cursor_params=None):
+    """
+    Return the query parameters for a machine's feeds request. Without
+    `cursor_params` (see Feed_cursor) only the latest entry is fetched.
+    """
+    params = {"api_key": info["api_key"], "results": 1}
+    if cursor_params:
+        params.update(cursor_params)
+    return params
@@ -0,0 +1,259 @@
+"""
+Canvas-backed list widget that only draws the rows in view.
+
+VirtualListbox keeps its items in a Python list and recycles a fixed pool
+of canvas text items for the visible rows, so the Tk cost of showing or
+refreshing a list does not grow with the number of machines in it. It
+implements the subset of the tk.Listbox API the dashboard uses (insert,
+delete, get, size, itemconfig, curselection, selection_set/clear, see,
+yview, <<ListboxSelect>>), so it can stand in for a Listbox.
+
+Keyboard: Up/Down/PageUp/PageDown/Home/End move the selection, typing
+jumps to the next row starting with the typed text, and Return fires
+<<ListboxSelect>> for the selected row. A mouse click selects and fires
+straight away, like a Listbox in browse mode.
+"""
+import time
+import tkinter as tk
+import tkinter.font as tkfont
+
+# Keystrokes closer together than this extend the type-ahead prefix
+TYPEAHEAD_TIMEOUT = 1.0
+
+
+class VirtualListbox(tk.Frame):
+    def __init__(self, master, width=20, height=10, font=("Arial", 10), bg="white", fg="black",
+                 selectbackground="#0078D7", selectforeground="white", yscrollcommand=None):
+        super().__init__(master, bg=bg)
+        self.font = tkfont.Font(root=self, font=font)
+        self.row_height = self.font.metrics("linespace") + 2
+        self.fg = fg
+        self.selectbackground = selectbackground
+        self.selectforeground = selectforeground
+
+        self.items = []
+        self.styles = []
+        self.selected = None
+        self.top = 0
+        self.pool = []
+        self.redraw_pending = False
+        self.typeahead = ""
+        self.typeahead_at = 0.0
+
+        self.canvas = tk.Canvas(
+            self,
+            width=self.font.measure("0") * width,
+            height=self.row_height * height,
+            bg=bg,
+            highlightthickness=0,
+            takefocus=1,
+        )
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.external_scroll = yscrollcommand
+        if yscrollcommand is None:
+            self.scrollbar = tk.Scrollbar(self, orient="vertical", command=self.yview)
+            self.scrollbar.pack(side="right", fill="y")
+        else:
+            self.scrollbar = None
+
+        self.canvas.bind("<Configure>", lambda e: self._schedule_redraw())
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<MouseWheel>", lambda e: self.yview("scroll", -1 if e.delta > 0 else 1, "units"))
+        self.canvas.bind("<Button-4>", lambda e: self.yview("scroll", -1, "units"))
+        self.canvas.bind("<Button-5>", lambda e: self.yview("scroll", 1, "units"))
+        self.canvas.bind("<Key>", self._on_key)
+
+    # ------------------------------------------------------------------
+    #           Listbox-compatible model API
+    # ------------------------------------------------------------------
+
+    def _index(self, index, end_offset=0):
+        if index == tk.END:
+            return len(self.items) - 1 + end_offset
+        return int(index)
+
+    def size(self):
+        return len(self.items)
+
+    def get(self, index):
+        return self.items[self._index(index)]
+
+    def insert(self, index, *texts):
+        i = self._index(index, end_offset=1)
+        self.items[i:i] = texts
+        self.styles[i:i] = [None] * len(texts)
+        if self.selected is not None and i <= self.selected:
+            self.selected += len(texts)
+        self._schedule_redraw()
+
+    def delete(self, first, last=None):
+        first = self._index(first)
+        last = first if last is None else self._index(last)
+        if last < first:
+            return
+        del self.items[first:last + 1]
+        del self.styles[first:last + 1]
+        if self.selected is not None:
+            if first <= self.selected <= last:
+                self.selected = None
+            elif self.selected > last:
+                self.selected -= last - first + 1
+        self._schedule_redraw()
+
+    def itemconfig(self, index, cnf=None, **kw):
+        i = self._index(index)
+        style = dict(self.styles[i] or {})
+        style.update(cnf or {}, **kw)
+        self.styles[i] = style
+        self._schedule_redraw()
+
+    itemconfigure = itemconfig
+
+    def curselection(self):
+        return () if self.selected is None else (self.selected,)
+
+    def selection_clear(self, first=0, last=None):
+        self.selected = None
+        self._schedule_redraw()
+
+    def selection_set(self, index):
+        i = self._index(index)
+        self.selected = i if 0 <= i < len(self.items) else None
+        self._schedule_redraw()
+
+    def see(self, index):
+        i = self._index(index)
+        view = self.canvas.winfo_height() or int(self.canvas["height"])
+        row_top = i * self.row_height
+        if row_top < self.top:
+            self._scroll_to(row_top)
+        elif row_top + self.row_height > self.top + view:
+            self._scroll_to(row_top + self.row_height - view)
+
+    # ------------------------------------------------------------------
+    #           Scrolling
+    # ------------------------------------------------------------------
+
+    def yview(self, *args):
+        view = self.canvas.winfo_height() or int(self.canvas["height"])
+        total = max(len(self.items) * self.row_height, 1)
+        if not args:
+            return self.top / total, min((self.top + view) / total, 1.0)
+        if args[0] == "moveto":
+            self._scroll_to(float(args[1]) * total)
+        elif args[0] == "scroll":
+            step = self.row_height if args[2] == "units" else max(view - self.row_height, self.row_height)
+            self._scroll_to(self.top + int(args[1]) * step)
+
+    def _scroll_to(self, top):
+        view = self.canvas.winfo_height() or int(self.canvas["height"])
+        max_top = max(len(self.items) * self.row_height - view, 0)
+        self.top = int(min(max(top, 0), max_top))
+        self._schedule_redraw()
+
+    # ------------------------------------------------------------------
+    #           Drawing
+    # ------------------------------------------------------------------
+
+    def _schedule_redraw(self):
+        # Coalesce any number of model changes into one redraw per idle cycle
+        if not self.redraw_pending:
+            self.redraw_pending = True
+            self.after_idle(self._redraw)
+
+    def _redraw(self):
+        self.redraw_pending = False
+        if not self.winfo_exists():
+            return
+        view = self.canvas.winfo_height() or int(self.canvas["height"])
+        width = self.canvas.winfo_width() or int(self.canvas["width"])
+        max_top = max(len(self.items) * self.row_height - view, 0)
+        self.top = min(self.top, max_top)
+
+        rows = view // self.row_height + 2
+        while len(self.pool) < rows:
+            rect = self.canvas.create_rectangle(0, 0, 0, 0, width=0, fill="")
+            text = self.canvas.create_text(4, 0, anchor="nw", font=self.font, text="")
+            self.pool.append((rect, text))
+
+        first = self.top // self.row_height
+        offset = first * self.row_height - self.top
+        for k, (rect, text) in enumerate(self.pool):
+            i = first + k
+            if k >= rows or i >= len(self.items):
+                self.canvas.itemconfigure(rect, fill="")
+                self.canvas.itemconfigure(text, text="")
+                continue
+            y = offset + k * self.row_height
+            style = self.styles[i] or {}
+            selected = i == self.selected
+            self.canvas.coords(rect, 0, y, width, y + self.row_height)
+            self.canvas.itemconfigure(rect, fill=self.selectbackground if selected else "")
+            self.canvas.coords(text, 4, y + 1)
+            self.canvas.itemconfigure(
+                text,
+                text=self.items[i],
+                fill=self.selectforeground if selected else style.get("fg", self.fg),
+                font=style.get("font", self.font),
+            )
+
+        total = max(len(self.items) * self.row_height, 1)
+        first_frac, last_frac = self.top / total, min((self.top + view) / total, 1.0)
+        if self.scrollbar is not None:
+            self.scrollbar.set(first_frac, last_frac)
+        if self.external_scroll is not None:
+            self.external_scroll(first_frac, last_frac)
+
+    # ------------------------------------------------------------------
+    #           Mouse & Keyboard
+    # ------------------------------------------------------------------
+
+    def _select(self, i, fire):
+        if not self.items:
+            return
+        i = min(max(i, 0), len(self.items) - 1)
+        self.selection_set(i)
+        self.see(i)
+        if fire:
+            self.event_generate("<<ListboxSelect>>")
+
+    def _on_click(self, event):
+        self.canvas.focus_set()
+        i = (self.top + event.y) // self.row_height
+        if i < len(self.items):
+            self._select(i, fire=True)
+
+    def _on_key(self, event):
+        current = self.selected if self.selected is not None else -1
+        page = max((self.canvas.winfo_height() // self.row_height) - 1, 1)
+        moves = {"Up": current - 1, "Down": current + 1, "Prior": current - page,
+                 "Next": current + page, "Home": 0, "End": len(self.items) - 1}
+        if event.keysym in moves:
+            self._select(moves[event.keysym], fire=False)
+        elif event.keysym == "Return":
+            if self.selected is not None:
+                self.event_generate("<<ListboxSelect>>")
+        elif event.char and event.char.isprintable():
+            self._type_ahead(event.char)
+
+    def _type_ahead(self, char):
+        now = time.monotonic()
+        if now - self.typeahead_at > TYPEAHEAD_TIMEOUT:
+            self.typeahead = ""
+        self.typeahead_at = now
+        self.typeahead += char.lower()
+
+        # Repeating one letter cycles through its matches; a longer prefix may
+        # still match the current row
+        prefix = self.typeahead
+        start = self.selected if self.selected is not None else -1
+        if len(set(prefix)) == 1:
+            prefix = prefix[0]
+        else:
+            start -= 1
+        n = len(self.items)
+        for step in range(1, n + 1):
+            i = (start + step) % n
+            if self.items[i].lower().startswith(prefix):
+                self._select(i, fire=False)
+                return
@@ -1,29 +1,51 @@
 from tkinter import ttk
 import tkinter as tk
-from Db_handler import init_db, load_machines
-import requests
-import threading
-from concurrent.futures import ThreadPoolExecutor
+from Db_handler import init_db
+import time
 from tkinter import messagebox
 from New_Machine_Button import open_add_machine_window
-from data_decoder import decode_hex_data
-from Report_Button import open_report_window
+from Report_window import open_report_window
+from Report_jobs import report_jobs
 from datetime import datetime
-from Db_handler import insert_fault_log
+from Fault_decode import DECODE_CACHE_SIZE, decode_raw_value, decode_cache
+from List_renderer import SortedListRenderer
+from Detail_window import MachineDetailWindow
+from Virtual_list import VirtualListbox
+from Machine_search import MachineSearchIndex
+from Machine_registry import machine_registry
+from Db_handler import get_registry_version, load_tripped_breakers
+from Collector import Collector
+from Live_state import LiveStateReader, collector_alive
+
+# Polling, decoding and logging run in Collector.py. When no collector is
+# running (`python Collector.py`), the app starts one in-process so it
+# still works on its own; other open apps then just read its live state.
+EMBEDDED_COLLECTOR = True
+
+# How often the live state published by the collector is read
+REFRESH_MS = 2000
 
 
 class MachineDataViewerApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Advanced RECD Monitor")
-        self.executor = ThreadPoolExecutor(max_workers=50)
         self.genset_on_count = 0
         self.genset_off_count = 0
-        self.machines = load_machines()
-        self.lock = threading.Lock()
-        self.fault_data = {}
-        self.decoded_data_store = {}
+        self.machines = machine_registry.get_machines()
+        self.registry_version = get_registry_version()
+        # Thin reader: the fleet state comes from whichever collector is running
+        self.live = LiveStateReader()
+        self.snapshot = self.live.fleet.snapshot()
+        self.collector = None
+        self.breaker_win = None
         self.open_detail_windows = {}
+        self.search_index = MachineSearchIndex()
+        self.search_index.sync(machine_registry.by_id())
+        self.search_results_win = None
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        decode_cache.resize(DECODE_CACHE_SIZE)
 
         # Updated fault_code_mapping to include 'No Error'
         self.fault_code_mapping = {
@@ -44,8 +66,7 @@ class MachineDataViewerApp:
         }
 
         self.setup_ui()
-        self.fetch_all_machine_data()
-        self.schedule_refresh()
+        self.refresh_tick()
 
     def setup_ui(self):
         screen_width = self.root.winfo_screenwidth()
@@ -83,6 +104,7 @@ class MachineDataViewerApp:
         category_frame.pack()
 
         self.category_boxes = {}
+        self.category_renderers = {}
         rows, cols = 5, 3
         row, col = 0, 0
 
@@ -105,7 +127,7 @@ class MachineDataViewerApp:
             scrollbar = tk.Scrollbar(list_frame)
             scrollbar.pack(side="right", fill="y")
 
-            listbox = tk.Listbox(
+            listbox = VirtualListbox(
                 list_frame,
                 yscrollcommand=scrollbar.set,
                 bg="white",
@@ -116,6 +138,7 @@ class MachineDataViewerApp:
             scrollbar.config(command=listbox.yview)
 
             self.category_boxes[code] = listbox
+            self.category_renderers[code] = SortedListRenderer(listbox, footer=True)
 
             listbox.bind("<<ListboxSelect>>", self.on_category_machine_click)
 
@@ -166,10 +189,11 @@ class MachineDataViewerApp:
         )
         search_button.pack(side="left")
 
-        self.error_machine_listbox = tk.Listbox(
-        self.fault_box, width=30, height=40, font=("Arial", 10)
+        self.error_machine_listbox = VirtualListbox(
+            self.fault_box, width=30, height=40, font=("Arial", 10)
         )
         self.error_machine_listbox.pack()
+        self.error_viewer_renderer = SortedListRenderer(self.error_machine_listbox)
         self.error_machine_listbox.bind("<<ListboxSelect>>", self.show_fault_details)
 
         # -------------------- Right Panel - RECD Status --------------------
@@ -247,60 +271,117 @@ class MachineDataViewerApp:
         )
         self.offline_label.pack(pady=(0, 10))
 
+        self.log_writer_label = tk.Label(
+            self.gauge_frame,
+            text="Log queue: 0 | Last flush: - ms",
+            font=("Arial", 9),
+            bg="white",
+            fg="gray",
+        )
+        self.log_writer_label.pack()
+
+        self.decode_cache_label = tk.Label(
+            self.gauge_frame,
+            text="Decode cache: 0 hit(s), 0 miss(es)",
+            font=("Arial", 9),
+            bg="white",
+            fg="gray",
+        )
+        self.decode_cache_label.pack()
+
+        self.stale_label = tk.Label(
+            self.gauge_frame,
+            text="Stale: 0",
+            font=("Arial", 9),
+            bg="white",
+            fg="gray",
+        )
+        self.stale_label.pack()
+
+        self.poll_label = tk.Label(
+            self.gauge_frame,
+            text="Polls: 0 per min",
+            font=("Arial", 9),
+            bg="white",
+            fg="gray",
+        )
+        self.poll_label.pack()
+
+        self.breaker_label = tk.Label(
+            self.gauge_frame,
+            text="Breakers: 0 open",
+            font=("Arial", 9),
+            bg="white",
+            fg="gray",
+            cursor="hand2",
+        )
+        self.breaker_label.pack()
+        self.breaker_label.bind("<Button-1>", lambda e: self.show_breaker_window())
+
+        self.fetch_label = tk.Label(
+            self.gauge_frame,
+            text="Fetch: 0 request(s)",
+            font=("Arial", 9),
+            bg="white",
+            fg="gray",
+        )
+        self.fetch_label.pack()
+
+        self.collector_label = tk.Label(
+            self.gauge_frame,
+            text="Collector: starting",
+            font=("Arial", 9),
+            bg="white",
+            fg="gray",
+        )
+        self.collector_label.pack(pady=(0, 10))
+
     def search_and_open_machine(self):
         query = self.search_var.get().strip()
         if not query:
             return
-        for idx in range(self.error_machine_listbox.size()):
-            item_text = self.error_machine_listbox.get(idx)
-            if item_text.lower() == query.lower():
-                self.error_machine_listbox.selection_clear(0, tk.END)
-                self.error_machine_listbox.selection_set(idx)
-                self.error_machine_listbox.event_generate("<<ListboxSelect>>")
-                return
-        messagebox.showwarning(
-            "Not Found", f"No machine named '{query}' found in the Error Viewer."
-        )
+        # Searches every machine (healthy ones too) by name, channel, controller no. and customer
+        results = self.search_index.search(query)
+        if not results:
+            messagebox.showwarning("Not Found", f"No machine matching '{query}' found.")
+            return
+        if len(results) == 1 or results[0]["name"].lower() == query.lower():
+            self.open_detail_window(results[0]["name"])
+            return
+        self.show_search_results(query, results)
 
-    def update_error_category_box(self):
-        # सर्व listbox clear करा
-        for lb in self.category_boxes.values():
-            lb.delete(0, tk.END)
+    def show_search_results(self, query, results):
+        if self.search_results_win is not None and self.search_results_win.winfo_exists():
+            self.search_results_win.destroy()
+        win = tk.Toplevel(self.root)
+        win.title(f"Search: {query}")
+        self.search_results_win = win
+
+        names = [record["name"] for record in results]
+        result_list = VirtualListbox(win, width=60, height=min(len(results), 20), font=("Arial", 10))
+        result_list.pack(fill="both", expand=True, padx=10, pady=10)
+        for record in results:
+            customers = sorted({c["customer_name"] for c in record["controllers"] if c.get("customer_name")})
+            text = f"{record['name']}  |  Channel {record['channel_id']}"
+            if customers:
+                text += f"  |  {', '.join(customers)}"
+            result_list.insert(tk.END, text)
+
+        def on_result_click(event):
+            sel = result_list.curselection()
+            if sel:
+                self.open_detail_window(names[sel[0]])
+
+        result_list.bind("<<ListboxSelect>>", on_result_click)
 
+    def update_error_category_box(self):
         # प्रत्येक fault code साठी unique मशीन नावे track करा
-        shown = {k: set() for k in self.fault_code_mapping.keys()}
-
-        for full_vm, decoded in self.decoded_data_store.items():
-            if full_vm not in self.fault_data or decoded.get("No Data"):
-                continue
-
-            fault_code = self.fault_data[full_vm]
-            base_machine_name = full_vm.split(' - ')[0]
-
-            if fault_code in self.fault_code_mapping:
-                if base_machine_name not in shown[fault_code]:
-                    self.category_boxes[fault_code].insert(tk.END, base_machine_name)
-                    shown[fault_code].add(base_machine_name)
-
-        # प्रत्येक ListBox मध्ये Total Count जोडा
-        for code, lb in self.category_boxes.items():
-            lb.insert(tk.END, "-" * 30)
-            count = len(shown[code])
-            total_text = f"Total: {count} machine(s)"
-            lb.insert(tk.END, total_text)
-
-        for code, lb in self.category_boxes.items():
-            lb.insert(tk.END, "-" * 30)
-            count = len(shown[code])
-            total_text = f"Total: {count} machine(s)"
-            lb.insert(tk.END, total_text)
-
-            # 'Total' टेक्स्ट highlight करा
-            last_idx = lb.size() - 1
-            if count > 0:
-                lb.itemconfig(last_idx, {'fg': 'blue', 'font': ("Arial", 9, "bold")})
-            else:
-                lb.itemconfig(last_idx, {'fg': 'gray', 'font': ("Arial", 9, "bold")})
+        shown = self.snapshot.machines_by_fault_code(self.fault_code_mapping.keys())
+        stale = self.snapshot.stale_machines()
+
+        # Only the rows that changed since the last publish are touched; totals update in place
+        for code, renderer in self.category_renderers.items():
+            renderer.render(shown[code], stale)
 
     def on_category_machine_click(self, event):
         listbox = event.widget
@@ -315,112 +396,11 @@ class MachineDataViewerApp:
             return
 
         # Open new detail window with all M1 to M8
-        if selected_machine in self.open_detail_windows:
-            win = self.open_detail_windows[selected_machine]
-            win.lift()
-            win.focus_force()
-            return
-
-        win = tk.Toplevel(self.root)
-        win.title(f"Details for {selected_machine}")
-        win.geometry("800x600")
-        self.open_detail_windows[selected_machine] = win
-        win.protocol("WM_DELETE_WINDOW", lambda: (self.open_detail_windows.pop(selected_machine, None), win.destroy()))
-        self.rebuild_fault_detail_window(selected_machine, win)
-
-        # Left Scrollable Frame
-        container = tk.Frame(win, bg="white")
-        container.pack(side="left", fill="both", expand=True)
-        canvas = tk.Canvas(container, bg="white")
-        scrollbar = tk.Scrollbar(container, orient="vertical", command=canvas.yview)
-        scrollable_frame = tk.Frame(canvas, bg="white")
-
-        scrollable_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-
-        # Display all M1 to M8 data for selected VM
-        for vm in range(1, 9):
-            full_vm_name = f"{selected_machine} - M{vm}"
-            decoded = self.decoded_data_store.get(full_vm_name)
-            fault_code = self.fault_data.get(full_vm_name, None)
-
-            section = tk.LabelFrame(
-                scrollable_frame,
-                text=full_vm_name,
-                font=("Arial", 10, "bold"),
-                padx=5,
-                pady=5,
-                bg="white",
-                fg="black",
-            )
-            section.pack(fill="x", expand=True, padx=10, pady=5)
-
-            if not decoded or decoded.get("No Data"):
-                tk.Label(
-                    section,
-                    text="No data",
-                    font=("Arial", 9, "italic"),
-                    bg="white",
-                    fg="gray",
-                ).pack(anchor="w")
-                continue
-
-            for key, val in decoded.items():
-                if key in ("No Data", "Raw Value"):
-                    continue
-                fg_color = "red" if key == "Fault Code" else "black"
-                display_text = f"{key}: {val}"
-                tk.Label(
-                    section,
-                    text=display_text,
-                    font=("Arial", 9),
-                    bg="white",
-                    fg=fg_color,
-                    anchor="w",
-                ).pack(fill="x")
-
-        # Report section (right)
-        right_frame = tk.Frame(win, bg="white")
-        right_frame.pack(side="right", fill="y", padx=20, pady=20)
-
-        tk.Label(
-            right_frame,
-            text="Select the Machine",
-            font=("Arial", 11, "bold"),
-            bg="white",
-            anchor="w",
-        ).pack(pady=(0, 10))
-
-        selected_vm = tk.StringVar()
-        vm_options = [f"{selected_machine} M{vm}" for vm in range(1, 9)]
-        vm_dropdown = tk.OptionMenu(right_frame, selected_vm, *vm_options)
-        vm_dropdown.config(font=("Arial", 10), bg="#e0e0e0")
-        vm_dropdown.pack(pady=(0, 20))
-
-        def on_generate_report():
-            machine_name = selected_vm.get().strip()
-            if machine_name:
-                open_report_window(machine_name)
-
-        tk.Button(
-            right_frame,
-            text="Generate Report",
-            font=("Arial", 10, "bold"),
-            bg="#2196F3",
-            fg="white",
-            command=on_generate_report,
-        ).pack()
-
+        self.open_detail_window(selected_machine)
 
     def refresh_fault_viewer(self):
-        self.error_machine_listbox.delete(0, tk.END)
         # Only show machines that have an actual fault (fault_code != 0)
-        machine_names_with_faults = set(full.split(" - ")[0] for full, code in self.fault_data.items() if code != 0)
-        for name in sorted(machine_names_with_faults):
-            self.error_machine_listbox.insert(tk.END, name)
+        self.error_viewer_renderer.render(self.snapshot.faulted_machines(), self.snapshot.stale_machines())
 
     # ------------------------------------------------------------------
     #           Detail Window Management
@@ -430,218 +410,90 @@ class MachineDataViewerApp:
         sel = self.error_machine_listbox.curselection()
         if not sel:
             return
-        machine = self.error_machine_listbox.get(sel[0])
-        if machine in self.open_detail_windows:
-            win = self.open_detail_windows[machine]
+        self.open_detail_window(self.error_machine_listbox.get(sel[0]))
+
+    def open_detail_window(self, machine):
+        """Bring an already open detail window to the front, or build a new one."""
+        win = self.open_detail_windows.get(machine)
+        if win is not None and win.exists():
             win.lift()
-            win.focus_force()
             return
-        win = tk.Toplevel(self.root)
+        win = MachineDetailWindow(
+            self.root,
+            machine,
+            self.get_detail_fields,
+            lambda vm_name: open_report_window(self.root, vm_name),
+            on_close=lambda name: self.open_detail_windows.pop(name, None),
+        )
         self.open_detail_windows[machine] = win
-        win.protocol(
-            "WM_DELETE_WINDOW", lambda: (self.open_detail_windows.pop(machine, None), win.destroy())
-        )
-        self.rebuild_fault_detail_window(machine, win)
-
-    def rebuild_fault_detail_window(self, selected_machine, detail_win):
-        for widget in detail_win.winfo_children():
-            widget.destroy()
-        detail_win.title(f"Details for {selected_machine}")
-        detail_win.geometry("800x600")
-
-        container = tk.Frame(detail_win, bg="white")
-        container.pack(side="left", fill="both", expand=True)
-        canvas = tk.Canvas(container, bg="white")
-        scrollbar = tk.Scrollbar(container, orient="vertical", command=canvas.yview)
-        scrollable_frame = tk.Frame(canvas, bg="white")
-
-        scrollable_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-
-        for vm in range(1, 9):
-            full_name = f"{selected_machine} - M{vm}"
-            decoded = self.decoded_data_store.get(full_name)
-            fault_code = self.fault_data.get(full_name, None)
-
-            section = tk.LabelFrame(
-                scrollable_frame,
-                text=full_name,
-                font=("Arial", 10, "bold"),
-                padx=5,
-                pady=5,
-                bg="white",
-                fg="black",
-            )
-            section.pack(fill="x", expand=True, padx=10, pady=5)
-
-            if not decoded or decoded.get("No Data"):
-                tk.Label(
-                    section,
-                    text="No data",
-                    font=("Arial", 9, "italic"),
-                    bg="white",
-                    fg="gray",
-                ).pack(anchor="w")
-                continue
-
-            for key, val in decoded.items():
-                if key in ("No Data", "Raw Value"):
-                    continue
-                fg_color = "red" if key == "Fault Code" else "black"
-                display_text = f"{key}: {val}"
-                tk.Label(
-                    section,
-                    text=display_text,
-                    font=("Arial", 9),
-                    bg="white",
-                    fg=fg_color,
-                    anchor="w",
-                ).pack(fill="x")
-
-        # Report section (right side)
-        right_frame = tk.Frame(detail_win, bg="white")
-        right_frame.pack(side="right", fill="y", padx=20, pady=20)
-        tk.Label(
-            right_frame,
-            text="Select the Machine",
-            font=("Arial", 11, "bold"),
-            bg="white",
-            anchor="w",
-        ).pack(pady=(0, 10))
-        selected_vm = tk.StringVar()
-        vm_options = [f"{selected_machine} M{vm}" for vm in range(1, 9)]
-        vm_dropdown = tk.OptionMenu(right_frame, selected_vm, *vm_options)
-        vm_dropdown.config(font=("Arial", 10), bg="#e0e0e0")
-        vm_dropdown.pack(pady=(0, 20))
-
-        def on_generate_report():
-            machine_name = selected_vm.get().strip()
-            if machine_name:
-                open_report_window(machine_name)
-
-        tk.Button(
-            right_frame,
-            text="Generate Report",
-            font=("Arial", 10, "bold"),
-            bg="#2196F3",
-            fg="white",
-            command=on_generate_report,
-        ).pack()
-
+        win.refresh(self.snapshot.is_stale(machine))
 
     # ------------------------------------------------------------------
-    #           Data Fetch & Decode
+    #           Live State
     # ------------------------------------------------------------------
 
-    def clear_display(self):
-        self.fault_data.clear()
-        self.decoded_data_store.clear()
-        self.genset_on_count = 0
-        self.genset_off_count = 0
-
-    def fetch_all_machine_data(self):
-        self.clear_display()
-        self.completed_count = 0
-        self.total_machines_to_process = len(self.machines)
-        for name, info in self.machines.items():
-            self.executor.submit(self.process_machine, name, info)
-
-    def process_machine(self, name, info):
-        url = (
-            f"https://api.thingspeak.com/channels/{info['channel_id']}/feeds.json?api_key="
-            f"{info['api_key']}&results=1"
-        )
+    def refresh_tick(self):
+        """
+        Runs on the Tk thread every REFRESH_MS: makes sure some collector is
+        running, picks up machine changes from any process and swaps in the
+        live state when the collector has published something new.
+        """
+        if self.collector is not None and not self.collector.is_running():
+            self.collector.stop()
+            self.collector = None
+        if EMBEDDED_COLLECTOR and self.collector is None and not collector_alive(self.live.status):
+            collector = Collector()
+            if collector.start():
+                self.collector = collector
+
+        version = get_registry_version()
+        if version != self.registry_version:
+            self.registry_version = version
+            # Edits made in this process are already patched into the registry
+            machine_registry.sync(version)
+            self.refresh_data()
+
+        snapshot = self.live.poll(self.machines)
+        if snapshot is not None:
+            self.snapshot = snapshot
+            self.publish_snapshot()
+        else:
+            self.update_collector_labels()
+        self.root.after(REFRESH_MS, self.refresh_tick)
+
+    def publish_snapshot(self):
+        """Swap the UI over to the newest live state. Runs on the Tk thread."""
+        self.genset_on_count, self.genset_off_count = self.snapshot.genset_counts()
+        total = len(self.snapshot) * 8
+        self.update_gauges()
+        self.update_status_labels(total, self.genset_on_count + self.genset_off_count)
+        self.update_collector_labels()
+        self.update_stale_label()
+        self.refresh_fault_viewer()
+        self.update_error_category_box()
+        self.refresh_open_detail_windows()
+
+    def update_collector_labels(self):
+        stats = self.live.stats
+        self.update_decode_cache_label()
+        self.update_collector_label()
+        if not stats:
+            return
+        self.update_log_writer_label(stats["log_writer"])
+        self.update_poll_label(stats["scheduler"])
+        self.update_breaker_label(stats["breakers"])
+        self.update_fetch_label(stats["fetch_cycle"], stats["fetch_totals"])
+
+    def get_detail_fields(self, machine_name, slot):
+        """Decode every field of controller M{slot+1}, only when a detail window shows it."""
+        controller = self.snapshot.controller(machine_name, slot)
+        if not controller or not controller[0]:
+            return None
         try:
-            response = requests.get(url, timeout=8)
-            response.raise_for_status()
-            feeds = response.json().get("feeds", [])
-
-            # ✅ Even if no feeds, still show machine in GUI
-            if not feeds:
-                print(f"[WARN] No data for machine: {name}")
-                with self.lock:
-                    for i in range(1, 9):
-                        virtual_machine_name = f"{name} - M{i}"
-                        self.decoded_data_store[virtual_machine_name] = {"No Data": True}
-                        self.fault_data[virtual_machine_name] = 0
-                        self.genset_off_count += 1
-                return
-
-            feed = feeds[0]
-            for i in range(1, 9):
-                virtual_machine_name = f"{name} - M{i}"
-                raw_value = feed.get(f"field{i}", "") or ""
-                raw_str = str(raw_value).strip()
-
-                try:
-                    if raw_str:
-                        decimal_int = int(raw_str)
-                        no_data = False
-                    else:
-                        raise ValueError
-                except Exception:
-                    try:
-                        decimal_int = int(float(raw_str)) if raw_str else 0
-                        no_data = False if raw_str else True
-                    except Exception:
-                        decimal_int = 0
-                        no_data = True
-
-                hex_str = hex(decimal_int)[2:].zfill(16).upper()
-
-                # ✅ Save hex to DB
-                try:
-                    insert_fault_log(name, f"M{i}", hex_str)
-                    print(f"[LOG] Inserted {name} - M{i} → {hex_str}")
-                except Exception as e:
-                    print(f"[ERROR] Insert failed for {name} - M{i}: {e}")
-
-                # Decode
-                try:
-                    decoded = decode_hex_data(hex_str)
-                except Exception as e:
-                    print(f"[ERROR] Decode failed for {name} - M{i}: {e}")
-                    decoded = {}
-
-                decoded["Raw Value"] = raw_str if raw_str else "No Data"
-                decoded["No Data"] = no_data
-                signal = decoded.get("Genset Signal", "").upper()
-
-                with self.lock:
-                    self.decoded_data_store[virtual_machine_name] = decoded
-                    if signal == "ON":
-                        self.genset_on_count += 1
-                    else:
-                        self.genset_off_count += 1
-
-                    code_val = decoded.get("Fault Code", 0)
-                    try:
-                        fault_code = int(code_val, 2) if str(code_val).startswith("0b") else int(code_val)
-                    except Exception:
-                        fault_code = 0
-                    self.fault_data[virtual_machine_name] = fault_code
-
+            return decode_raw_value(controller[1])
         except Exception as e:
-            print(f"[ERROR] API fetch failed for {name}: {e}")
-            with self.lock:
-                for i in range(1, 9):
-                    virtual_machine_name = f"{name} - M{i}"
-                    self.decoded_data_store[virtual_machine_name] = {"No Data": True}
-                    self.fault_data[virtual_machine_name] = 0
-                    self.genset_off_count += 1
-        finally:
-            with self.lock:
-                self.completed_count += 1
-                if self.completed_count >= self.total_machines_to_process:
-                    total = len(self.machines) * 8
-                    self.root.after(0, self.update_gauges)
-                    self.root.after(0, self.update_status_labels, total, self.genset_on_count + self.genset_off_count)
-                    self.root.after(0, self.refresh_fault_viewer)
-                    self.root.after(0, self.update_error_category_box)
-                    self.root.after(0, self.refresh_open_detail_windows)
+            print(f"[ERROR] Decode failed for {machine_name} - M{slot + 1}: {e}")
+            return {}
 
     # ------------------------------------------------------------------
     #           Gauges & Status Labels
@@ -709,24 +561,144 @@ class MachineDataViewerApp:
         self.online_label.config(text=f"Online: {online_count}")
         self.offline_label.config(text=f"Offline: {total_virtual_machines - online_count}")
 
+    def update_log_writer_label(self, stats):
+        color = "#F44336" if stats["queue_depth"] >= stats["warn_depth"] else "gray"
+        self.log_writer_label.config(
+            text=(
+                f"Log queue: {stats['queue_depth']} | Last flush: {stats['last_flush_ms']:.0f} ms"
+                f" | Unchanged skipped: {stats['rows_skipped']}"
+            ),
+            fg=color,
+        )
+
+    def update_decode_cache_label(self):
+        stats = decode_cache.get_stats()
+        self.decode_cache_label.config(
+            text=(
+                f"Decode cache: {stats['size']}/{stats['maxsize']} | {stats['hit_ratio'] * 100:.0f}% hits"
+                f" | {stats['evictions']} evicted"
+            )
+        )
+
+    def update_poll_label(self, stats):
+        states = stats["states"]
+        self.poll_label.config(
+            text=(
+                f"Polls: {stats['requests_last_minute']}/{stats['budget_per_minute']} per min"
+                f" | Backlog: {stats['backlog']}\n"
+                f"Fault {states['fault']} | Recent {states['recent']} | Healthy {states['healthy']}"
+                f" | Retry {states['retry']} | Dead {states['dead']}"
+            ),
+            fg="#F44336" if stats["backlog"] else "gray",
+        )
+
+    def update_breaker_label(self, stats):
+        upstream = "DEGRADED" if stats["degraded"] else "OK"
+        self.breaker_label.config(
+            text=(
+                f"Breakers: {stats['open']} open | {stats['half_open']} probing | {stats['failing']} failing"
+                f" | Upstream {upstream} ({stats['error_rate'] * 100:.0f}% errors)"
+            ),
+            fg="#F44336" if stats["degraded"] else "#FF9800" if stats["open"] or stats["half_open"] else "gray",
+        )
+        if self.breaker_win is not None and self.breaker_win.winfo_exists():
+            self.fill_breaker_list()
+
+    def show_breaker_window(self):
+        """List every channel whose breaker is open or probing."""
+        if self.breaker_win is not None and self.breaker_win.winfo_exists():
+            self.breaker_win.lift()
+            return
+        win = tk.Toplevel(self.root)
+        win.title("Open Circuit Breakers")
+        self.breaker_win = win
+        self.breaker_list = VirtualListbox(win, width=110, height=20, font=("Arial", 10))
+        self.breaker_list.pack(fill="both", expand=True, padx=10, pady=10)
+        self.breaker_names = []
+        self.fill_breaker_list()
+
+        def on_breaker_click(event):
+            sel = self.breaker_list.curselection()
+            if sel and self.breaker_names[sel[0]]:
+                self.open_detail_window(self.breaker_names[sel[0]][0])
+
+        self.breaker_list.bind("<<ListboxSelect>>", on_breaker_click)
+
+    def fill_breaker_list(self):
+        names_by_channel = {}
+        for name, info in self.machines.items():
+            names_by_channel.setdefault(str(info["channel_id"]), []).append(name)
+
+        now = time.time()
+        self.breaker_list.delete(0, tk.END)
+        self.breaker_names = []
+        for channel_id, state, failures, trips, open_until, last_error, _ in load_tripped_breakers():
+            names = sorted(names_by_channel.get(channel_id, []))
+            # Probes are not written back, so an open breaker past its wait is being probed
+            retry = f"retry in {open_until - now:.0f}s" if open_until > now else "probing"
+            self.breaker_list.insert(
+                tk.END,
+                f"{', '.join(names) or '?'}  |  Channel {channel_id}  |  {retry}  |  "
+                f"{failures} failure(s), tripped {trips}x  |  {last_error or ''}",
+            )
+            self.breaker_names.append(names)
+
+    def update_fetch_label(self, cycle, totals):
+        # One "cycle" is the time between two collector publishes
+        unchanged = cycle["not_modified"] + cycle["same_body"] + cycle["ttl_hits"]
+        self.fetch_label.config(
+            text=(
+                f"Fetch: {cycle['requests']} request(s) | {unchanged} unchanged"
+                f" | {cycle['bytes_saved'] / 1024:.0f} KB saved | {cycle['skipped_decodes']} decode(s) skipped\n"
+                f"Total: {totals['bytes_received'] / 1048576:.1f} MB received,"
+                f" {totals['bytes_saved'] / 1048576:.1f} MB saved"
+            )
+        )
+
+    def update_collector_label(self):
+        status = self.live.status or {}
+        if self.collector is not None:
+            text, color = f"Collector: in this app ({self.live.stats.get('engine', '-')})", "gray"
+        elif self.live.alive:
+            text, color = f"Collector: {status.get('owner')} ({self.live.stats.get('engine', '-')})", "gray"
+        elif status.get("heartbeat"):
+            text, color = f"Collector: not running, last seen {time.time() - status['heartbeat']:.0f}s ago", "#F44336"
+        else:
+            text, color = "Collector: not running", "#F44336"
+        self.collector_label.config(text=text, fg=color)
+
+    def update_stale_label(self):
+        stale = self.snapshot.stale_count()
+        self.stale_label.config(
+            text=f"Stale: {stale} (last known values)" if stale else "Stale: 0",
+            fg="#FF9800" if stale else "gray",
+        )
+
     # ------------------------------------------------------------------
     #           Periodic Refresh Scheduling
     # ------------------------------------------------------------------
 
     def refresh_open_detail_windows(self):
         for machine_name, win in list(self.open_detail_windows.items()):
-            if win.winfo_exists():
-                self.rebuild_fault_detail_window(machine_name, win)
+            if win.exists():
+                win.refresh(self.snapshot.is_stale(machine_name))
             else:
                 self.open_detail_windows.pop(machine_name, None)
 
-    def schedule_refresh(self):
-        self.root.after(180_000, self.refresh_data)
-
     def refresh_data(self):
-        self.machines = load_machines()
-        self.fetch_all_machine_data()
-        self.schedule_refresh()
+        """Pick up machine changes; an in-app collector polls new machines on its next tick."""
+        self.machines = machine_registry.get_machines()
+        if self.collector is not None:
+            self.collector.refresh_machines()
+        # Only machines added, edited or deleted since the last refresh are reindexed
+        self.search_index.sync(machine_registry.by_id())
+
+    def on_close(self):
+        # An in-app collector flushes its logs and hands the lease to the next app or daemon
+        if self.collector is not None:
+            self.collector.stop()
+        report_jobs.shutdown()
+        self.root.destroy()
 
 
 if __name__ == "__main__":